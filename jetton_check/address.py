@@ -0,0 +1,133 @@
+import base64
+import binascii
+import re
+from enum import Enum
+from typing import Iterable
+
+from pydantic import BaseModel
+
+BOUNCEABLE_TAG = 0x11
+NON_BOUNCEABLE_TAG = 0x51
+TESTNET_FLAG = 0x80
+
+raw_address_regex = re.compile(r"^(-?\d+):([0-9a-fA-F]{64})$")
+friendly_address_regex = re.compile(r"^[A-Za-z0-9+/_-]{48}$")
+
+
+class AddressForm(str, Enum):
+    Raw = "Raw"
+    Bounceable = "Bounceable"
+    NonBounceable = "NonBounceable"
+
+
+class Address(BaseModel):
+    workchain: int
+    hash_part: bytes
+    bounceable: bool = True
+    testnet: bool = False
+
+    def to_raw(self) -> str:
+        return f"{self.workchain}:{self.hash_part.hex()}"
+
+    def to_friendly(
+        self,
+        bounceable: bool = True,
+        testnet: bool = False,
+        url_safe: bool = True,
+    ) -> str:
+        tag = BOUNCEABLE_TAG if bounceable else NON_BOUNCEABLE_TAG
+        if testnet:
+            tag |= TESTNET_FLAG
+        body = bytes([tag, self.workchain & 0xFF]) + self.hash_part
+        data = body + crc16(body)
+        if url_safe:
+            return base64.urlsafe_b64encode(data).decode()
+        return base64.b64encode(data).decode()
+
+    def to_form(self, form: AddressForm) -> str:
+        if form == AddressForm.Raw:
+            return self.to_raw()
+        return self.to_friendly(bounceable=form == AddressForm.Bounceable)
+
+
+def crc16(data: bytes) -> bytes:
+    return binascii.crc_hqx(data, 0).to_bytes(2, "big")
+
+
+def parse_address(address: str) -> Address:
+    address = address.strip()
+    if match := raw_address_regex.match(address):
+        workchain = int(match.group(1))
+        if not -128 <= workchain <= 127:
+            raise ValueError(f"Invalid workchain in address {address}")
+        return Address(
+            workchain=workchain, hash_part=bytes.fromhex(match.group(2))
+        )
+
+    if not friendly_address_regex.match(address):
+        raise ValueError(f"Invalid address {address}")
+
+    data = base64.urlsafe_b64decode(
+        address.replace("+", "-").replace("/", "_")
+    )
+    body, checksum = data[:34], data[34:]
+    if crc16(body) != checksum:
+        raise ValueError(f"Invalid checksum in address {address}")
+
+    tag = body[0]
+    testnet = bool(tag & TESTNET_FLAG)
+    tag &= ~TESTNET_FLAG
+    if tag not in (BOUNCEABLE_TAG, NON_BOUNCEABLE_TAG):
+        raise ValueError(f"Invalid tag in address {address}")
+
+    workchain = body[1] - 256 if body[1] > 127 else body[1]
+    return Address(
+        workchain=workchain,
+        hash_part=body[2:],
+        bounceable=tag == BOUNCEABLE_TAG,
+        testnet=testnet,
+    )
+
+
+def is_valid_address(address: str) -> bool:
+    try:
+        parse_address(address)
+    except ValueError:
+        return False
+    return True
+
+
+def to_raw(address: str) -> str:
+    return parse_address(address).to_raw()
+
+
+def address_key(address: str) -> str:
+    # Any form of one address maps to the same key, unparsable input is
+    # left as is.
+    try:
+        return to_raw(address)
+    except ValueError:
+        return address
+
+
+def to_bounceable(address: str) -> str:
+    return parse_address(address).to_friendly(bounceable=True)
+
+
+def to_non_bounceable(address: str) -> str:
+    return parse_address(address).to_friendly(bounceable=False)
+
+
+def convert_addresses(
+    addresses: Iterable[str],
+    form: AddressForm = AddressForm.Bounceable,
+    strict: bool = True,
+) -> list[str]:
+    result = []
+    for address in addresses:
+        try:
+            result.append(parse_address(address).to_form(form))
+        except ValueError:
+            if strict:
+                raise
+    return result
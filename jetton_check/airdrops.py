@@ -0,0 +1,96 @@
+from typing import Iterable
+
+from models import ActionType, Event, JettonMaster, Wallet
+
+# The default rules give no point once the airdrop exceeds this share.
+MAX_AIRDROP_PERCENT = 20.0
+
+# Transfers to DEX contracts provide liquidity, they are not airdrops.
+excluded_names = {"Dedust Vault", "Stonfi Router"}
+
+
+class AirdropAggregator:
+    # Consumes the creator's jetton history as it is paged in. Receiver
+    # totals, the holders' airdrop amounts and the filtered sum are all
+    # updated per transfer, holders are joined through an address index.
+    def __init__(
+        self,
+        jetton_master: JettonMaster,
+        receivers: dict[str, dict] | None = None,
+        after_lt: int = 0,
+        stop_percent: float | None = None,
+    ):
+        self.jetton_master = jetton_master
+        self.creator_address = jetton_master.creator.account.address
+        self.holders: dict[str, Wallet] = {
+            holder.account.address: holder for holder in jetton_master.holders
+        }
+        self.receivers: dict[str, dict] = {}
+        self.filtered: dict[str, dict] = {}
+        self.total = 0
+        self.after_lt = after_lt
+        self.newest_lt = after_lt
+        self.stop_percent = stop_percent
+        self.events = 0
+        self.stopped = False
+        for address, data in (receivers or {}).items():
+            self.add(address, data["name"], data["amount"])
+
+    def add(self, address: str, name: str | None, amount: int) -> None:
+        holder = self.holders.get(address)
+        data = self.receivers.get(address)
+        if data is None:
+            if holder is not None:
+                name = holder.account.name
+            data = self.receivers[address] = {"amount": 0, "name": name}
+            if name not in excluded_names:
+                self.filtered[address] = data
+        data["amount"] += amount
+        if address in self.filtered:
+            self.total += amount
+        if holder is not None:
+            holder.airdrop_amount = data["amount"]
+            self.jetton_master.invalidate_ranking()
+
+    def add_event(self, event: Event) -> bool:
+        # History comes newest first, a rescan ends at the newest event of
+        # the previous scan. Returns whether older events are still needed.
+        if self.after_lt and event.lt <= self.after_lt:
+            return False
+        self.events += 1
+        self.newest_lt = max(self.newest_lt, event.lt)
+        for action in event.actions:
+            if (
+                action.type == ActionType.JettonTransfer
+                and action.JettonTransfer.sender.address
+                == self.creator_address
+                and action.JettonTransfer.comment != "Call: DedustSwap"
+            ):
+                recipient = action.JettonTransfer.recipient
+                self.add(
+                    recipient.address,
+                    recipient.name,
+                    int(action.JettonTransfer.amount),
+                )
+        if (
+            self.stop_percent is not None
+            and self.percent() > self.stop_percent
+        ):
+            # Older transfers can only add to the sum.
+            self.stopped = True
+            return False
+        return True
+
+    def consume(self, events: Iterable[Event]) -> "AirdropAggregator":
+        for event in events:
+            if not self.add_event(event):
+                break
+        return self
+
+    def percent(self) -> float:
+        return round(
+            self.total / self.jetton_master.data.total_supply * 100, 2
+        )
+
+    def result(self) -> tuple[dict[str, dict], int]:
+        return self.filtered, self.total
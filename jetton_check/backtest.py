@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+
+import argparse
+import json
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from pydantic import BaseModel
+
+from features import load_features
+from rating import DEFAULT_RULES, RatingEngine, RuleSet, load_rule_set
+
+
+class BacktestResult(BaseModel):
+    name: str
+    rows: int
+    tokens: int
+    alerts: int
+    rule_matches: dict[str, int]
+    labeled_alerts: int = 0
+    hits: int = 0
+    hit_rate: float | None = None
+    recall: float | None = None
+    baseline_shared: int = 0
+    baseline_added: int = 0
+    baseline_dropped: int = 0
+    # Passing scans whose airdrop total stopped at a lower bound, their
+    # true total may fail an airdrop rule above the stop percent.
+    lower_bound_passes: int = 0
+    seconds: float = 0.0
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows / self.seconds if self.seconds else 0.0
+
+
+def load_labels(path: str) -> dict[str, bool]:
+    # {"<token address>": true | false}, tokens without a label are left
+    # out of the hit rate.
+    with open(path) as f:
+        return {
+            address: bool(label) for address, label in json.load(f).items()
+        }
+
+
+def alerted_tokens(passed: np.ndarray, token_index: np.ndarray) -> np.ndarray:
+    # A token alerts once, when any of its scans passes.
+    return np.bincount(token_index, weights=passed) > 0
+
+
+def prepare(
+    directory: str,
+    workdir: str,
+    baseline: RuleSet,
+    labels: dict[str, bool] | None,
+) -> None:
+    # Work shared by every rule set is done once and handed to the worker
+    # processes as memory-mapped arrays. The bot may append while workers
+    # run, the rows loaded here are the ones every worker evaluates.
+    features = load_features(directory)
+    tokens, token_index = np.unique(
+        features["token_address"], return_inverse=True
+    )
+    baseline_alerts = alerted_tokens(
+        RatingEngine(baseline).score(features).passed, token_index
+    )
+    token_labels = np.full(len(tokens), np.nan)
+    if labels:
+        for i, token in enumerate(tokens):
+            if (label := labels.get(token.decode())) is not None:
+                token_labels[i] = label
+    np.save(os.path.join(workdir, "token_index.npy"), token_index)
+    np.save(os.path.join(workdir, "baseline.npy"), baseline_alerts)
+    np.save(os.path.join(workdir, "labels.npy"), token_labels)
+
+
+def evaluate_rule_set(
+    directory: str, workdir: str, rule_set: RuleSet
+) -> BacktestResult:
+    start = time.perf_counter()
+    token_index = np.load(os.path.join(workdir, "token_index.npy"))
+    features = {
+        name: column[: len(token_index)]
+        for name, column in load_features(directory).items()
+    }
+    baseline = np.load(os.path.join(workdir, "baseline.npy"), mmap_mode="r")
+    labels = np.load(os.path.join(workdir, "labels.npy"), mmap_mode="r")
+
+    rating = RatingEngine(rule_set).score(features)
+    alerts = alerted_tokens(rating.passed, token_index)
+    labeled = alerts & ~np.isnan(labels)
+    hits = int(np.count_nonzero(labeled & (labels == 1)))
+    positives = int(np.count_nonzero(labels == 1))
+    return BacktestResult(
+        name=rule_set.name,
+        rows=len(token_index),
+        tokens=len(labels),
+        alerts=int(np.count_nonzero(alerts)),
+        rule_matches={
+            name: int(np.count_nonzero(points))
+            for name, points in rating.breakdown.items()
+        },
+        labeled_alerts=int(np.count_nonzero(labeled)),
+        hits=hits,
+        hit_rate=hits / np.count_nonzero(labeled) if labeled.any() else None,
+        recall=hits / positives if positives else None,
+        baseline_shared=int(np.count_nonzero(alerts & baseline)),
+        baseline_added=int(np.count_nonzero(alerts & ~baseline)),
+        baseline_dropped=int(np.count_nonzero(~alerts & baseline)),
+        lower_bound_passes=int(
+            np.count_nonzero(rating.passed & features["airdrop_stopped"])
+        ),
+        seconds=time.perf_counter() - start,
+    )
+
+
+def backtest(
+    directory: str,
+    rule_sets: list[RuleSet],
+    baseline: RuleSet = DEFAULT_RULES,
+    labels: dict[str, bool] | None = None,
+    workers: int | None = None,
+) -> list[BacktestResult]:
+    with tempfile.TemporaryDirectory() as workdir:
+        prepare(directory, workdir, baseline, labels)
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [
+                pool.submit(evaluate_rule_set, directory, workdir, rule_set)
+                for rule_set in rule_sets
+            ]
+            return [future.result() for future in futures]
+
+
+def print_result(result: BacktestResult) -> None:
+    print(f"Rule set {result.name}:")
+    print(
+        f"  {result.rows} scans of {result.tokens} tokens in "
+        f"{result.seconds:.3f}s, {result.rows_per_second:,.0f} scans/s"
+    )
+    print(
+        f"  Alerts: {result.alerts} "
+        f"({result.alerts / max(result.tokens, 1) * 100:.2f}% of tokens)"
+    )
+    if result.hit_rate is not None:
+        print(
+            f"  Hit rate: {result.hit_rate * 100:.1f}% "
+            f"({result.hits} of {result.labeled_alerts} labeled alerts)"
+        )
+    if result.recall is not None:
+        print(f"  Recall: {result.recall * 100:.1f}%")
+    print(
+        f"  Against baseline: {result.baseline_shared} shared, "
+        f"{result.baseline_added} added, {result.baseline_dropped} dropped"
+    )
+    if result.lower_bound_passes:
+        print(
+            f"  Warning: {result.lower_bound_passes} passing scans have "
+            f"airdrop totals that stopped early, rules allowing more than "
+            f"the scan's stop percent cannot be judged on them"
+        )
+    for name, matches in result.rule_matches.items():
+        print(f"  {name}: {matches} scans matched")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Backtest rating rule sets against stored scan features"
+    )
+    parser.add_argument(
+        "rules",
+        nargs="*",
+        help="Rule set JSON files, the default rules when none are given",
+    )
+    parser.add_argument(
+        "--features", default="features", help="Feature store directory"
+    )
+    parser.add_argument(
+        "--baseline", help="Rule set JSON file to compare alerts against"
+    )
+    parser.add_argument(
+        "--labels", help="JSON object of token address to outcome"
+    )
+    parser.add_argument(
+        "--workers", type=int, help="Worker processes, one per CPU default"
+    )
+    args = parser.parse_args()
+
+    rule_sets = [load_rule_set(path) for path in args.rules] or [DEFAULT_RULES]
+    start = time.perf_counter()
+    results = backtest(
+        args.features,
+        rule_sets,
+        baseline=(
+            load_rule_set(args.baseline) if args.baseline else DEFAULT_RULES
+        ),
+        labels=load_labels(args.labels) if args.labels else None,
+        workers=args.workers,
+    )
+    for result in results:
+        print_result(result)
+    print(
+        f"Backtested {len(results)} rule sets in "
+        f"{time.perf_counter() - start:.2f}s"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import statistics
+import tempfile
+import time
+
+from cache import ResponseCache
+from classes import AsyncTon
+from clients import AsyncGeckoTerminalClient, AsyncTonViewerClient
+from functions import get_jetton_info, process_new_pools
+from mock_api import MockApiServer
+from models import TokenReport
+from recording import load_fixtures
+from storage import ScanStore
+
+
+def percentile(values: list[float], percent: float) -> float:
+    if not values:
+        return 0.0
+    if len(values) == 1:
+        return values[0]
+    return statistics.quantiles(values, n=100, method="inclusive")[
+        int(percent) - 1
+    ]
+
+
+def find_service(server: MockApiServer, name: str) -> str:
+    for service in server.services:
+        if name in service:
+            return server.service_url(service)
+    raise ValueError(f"No recorded fixtures for {name}")
+
+
+def print_latencies(name: str, durations: list[float]) -> None:
+    print(
+        f"{name}: p50 {percentile(durations, 50):.3f}s, "
+        f"p95 {percentile(durations, 95):.3f}s over {len(durations)} jettons"
+    )
+
+
+async def run(args: argparse.Namespace, server: MockApiServer) -> None:
+    cache = ResponseCache() if args.cache else None
+    tv_client = AsyncTonViewerClient(
+        find_service(server, "tonapi"),
+        rate_limit=args.client_rps,
+        max_rate=args.client_max_rps,
+        cache=cache,
+    )
+    gt_client = AsyncGeckoTerminalClient(
+        find_service(server, "gecko"),
+        rate_limit=args.client_rps,
+        max_rate=args.client_max_rps,
+        cache=cache,
+    )
+    ton = AsyncTon(tv_client, gt_client)
+
+    with tempfile.TemporaryDirectory() as directory:
+        store = ScanStore(os.path.join(directory, "bench.db"))
+        start = time.perf_counter()
+        # Reports print jetton tables, keep the benchmark output readable.
+        with contextlib.redirect_stdout(io.StringIO()):
+            stats = await process_new_pools(
+                ton,
+                None,
+                None,
+                args.pages,
+                store,
+                report=TokenReport.ConsolePrint,
+                workers=args.workers,
+            )
+        elapsed = time.perf_counter() - start
+        store.close()
+
+    scan_requests = server.total_requests()
+    scanned = stats.analysed + stats.analysis_errors
+    print(f"Scan: {stats}")
+    print(
+        f"Scan: {scanned} pools in {elapsed:.2f}s, "
+        f"{scanned / elapsed * 60:.1f} pools/minute"
+    )
+    print_latencies("Scan latency", stats.durations)
+    print(
+        f"Scan: {scan_requests} requests, "
+        f"{scan_requests / max(scanned, 1):.1f} requests/jetton"
+    )
+
+    durations = []
+    errors = 0
+    for address in args.info:
+        start = time.perf_counter()
+        try:
+            await get_jetton_info(ton, address)
+        except Exception:
+            errors += 1
+        durations.append(time.perf_counter() - start)
+    if durations:
+        info_requests = server.total_requests() - scan_requests
+        print_latencies("Info latency", durations)
+        print(
+            f"Info: {info_requests} requests, "
+            f"{info_requests / len(durations):.1f} requests/jetton, "
+            f"{errors} errors"
+        )
+
+    print(
+        f"Mock API: throttled {sum(server.throttled.values())}, "
+        f"missing fixtures {sum(server.missing.values())}"
+    )
+    await tv_client.aclose()
+    await gt_client.aclose()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark the pool scan against recorded API responses"
+    )
+    parser.add_argument("fixtures", help="Directory with recorded fixtures")
+    parser.add_argument("--pages", default=1, type=int)
+    parser.add_argument("--workers", default=4, type=int)
+    parser.add_argument(
+        "--info",
+        nargs="*",
+        default=[],
+        help="Jetton addresses to benchmark get_jetton_info with",
+    )
+    parser.add_argument(
+        "--latency", default=0.05, type=float, help="Mock response latency"
+    )
+    parser.add_argument(
+        "--jitter", default=0.0, type=float, help="Random extra latency"
+    )
+    parser.add_argument(
+        "--rps", type=float, help="Mock API requests per second before 429"
+    )
+    parser.add_argument(
+        "--client-rps",
+        default=100.0,
+        type=float,
+        help="Client side rate limit",
+    )
+    parser.add_argument(
+        "--client-max-rps",
+        type=float,
+        help="Ceiling for the adaptive client rate limit",
+    )
+    parser.add_argument(
+        "--cache", action="store_true", help="Enable the response cache"
+    )
+    args = parser.parse_args()
+
+    server = MockApiServer(
+        load_fixtures(args.fixtures),
+        latency=args.latency,
+        jitter=args.jitter,
+        rate_limit=args.rps,
+    ).start()
+    try:
+        asyncio.run(run(args, server))
+    finally:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+
+import argparse
+import glob
+import json
+import time
+
+from models import ActionType, Event, decode_event
+
+
+def account_data(address: str, is_wallet: bool = True) -> dict:
+    return {"address": address, "is_scam": False, "is_wallet": is_wallet}
+
+
+def jetton_metadata(address: str) -> dict:
+    return {
+        "address": address,
+        "name": "Jetton",
+        "symbol": "JET",
+        "decimals": 9,
+        "description": "Community token https://t.me/jetton www.jetton.io",
+    }
+
+
+def synthetic_events(count: int) -> list[dict]:
+    master = "0:" + "a" * 64
+    events = []
+    for i in range(count):
+        sender = account_data(f"0:{i:064x}")
+        recipient = account_data(f"0:{i + 1:064x}")
+        events.append(
+            {
+                "event_id": f"{i:064x}",
+                "account": account_data(master, is_wallet=False),
+                "timestamp": 1700000000 - i,
+                "lt": 45000000000000 - i,
+                "is_scam": False,
+                "in_progress": False,
+                "actions": [
+                    {
+                        "type": "JettonTransfer",
+                        "status": "ok",
+                        "simple_preview": {"name": "Jetton Transfer"},
+                        "JettonTransfer": {
+                            "sender": sender,
+                            "recipient": recipient,
+                            "senders_wallet": f"0:{i + 2:064x}",
+                            "recipients_wallet": f"0:{i + 3:064x}",
+                            "amount": str(10**9 * i),
+                            "jetton": jetton_metadata(master),
+                        },
+                    },
+                    {
+                        "type": "JettonSwap",
+                        "status": "ok",
+                        "simple_preview": {"name": "Swap Tokens"},
+                        "JettonSwap": {
+                            "dex": "stonfi",
+                            "amount_in": str(10**9),
+                            "amount_out": str(10**8),
+                            "user_wallet": sender,
+                            "router": account_data(master, is_wallet=False),
+                            "jetton_master_in": jetton_metadata(master),
+                        },
+                    },
+                    {
+                        "type": "TonTransfer",
+                        "status": "ok",
+                        "simple_preview": {"name": "Ton Transfer"},
+                        "TonTransfer": {
+                            "sender": sender,
+                            "recipient": recipient,
+                            "amount": 10**8,
+                        },
+                    },
+                    {
+                        "type": "NftItemTransfer",
+                        "status": "ok",
+                        "simple_preview": {"name": "NFT Transfer"},
+                        "NftItemTransfer": {},
+                    },
+                ],
+            }
+        )
+    return events
+
+
+def load_events(paths: list[str]) -> list[dict]:
+    events = []
+    for pattern in paths:
+        for path in glob.glob(pattern, recursive=True):
+            with open(path) as file:
+                data = json.load(file)
+            # Recorded fixtures wrap the API response in a "body" key.
+            body = data.get("body", data)
+            if isinstance(body, dict) and "events" in body:
+                events += body["events"]
+    return events
+
+
+def measure(name: str, decode, events: list[dict], rounds: int) -> float:
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for event in events:
+            decode(event)
+    elapsed = time.perf_counter() - start
+    per_event = elapsed / (rounds * len(events)) * 1e6
+    print(f"{name:<32} {per_event:10.1f} us/event {elapsed:8.3f} s total")
+    return per_event
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark event decoding over TonAPI event payloads"
+    )
+    parser.add_argument(
+        "paths",
+        nargs="*",
+        help="Recorded /events or /history responses (globs allowed)",
+    )
+    parser.add_argument(
+        "--synthetic",
+        default=1000,
+        type=int,
+        help="Number of synthetic events when no recordings are given",
+    )
+    parser.add_argument("--rounds", default=5, type=int)
+    args = parser.parse_args()
+
+    events = load_events(args.paths)
+    source = "recorded"
+    if not events:
+        events = synthetic_events(args.synthetic)
+        source = "synthetic"
+    print(f"Decoding {len(events)} {source} events x {args.rounds} rounds")
+
+    for event in events:
+        expected = Event(**event).model_dump()
+        if decode_event(event).model_dump() != expected:
+            raise ValueError(f"Decoders disagree on {event['event_id']}")
+
+    baseline = measure(
+        "Event(**payload)", lambda e: Event(**e), events, args.rounds
+    )
+    fast = measure("decode_event", decode_event, events, args.rounds)
+    selective = measure(
+        "decode_event(JettonTransfer)",
+        lambda e: decode_event(e, [ActionType.JettonTransfer]),
+        events,
+        args.rounds,
+    )
+    print(
+        f"Speedup: {baseline / fast:.2f}x full, "
+        f"{baseline / selective:.2f}x selective"
+    )
+
+
+if __name__ == "__main__":
+    main()
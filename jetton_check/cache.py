@@ -0,0 +1,129 @@
+import copy
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable
+
+Ttl = float | Callable[[dict], float]
+
+FOREVER = 30 * 24 * 3600
+RESCAN_WINDOW = 2 * 3600
+ZERO_ADDRESS = (
+    "0:0000000000000000000000000000000000000000000000000000000000000000"
+)
+
+
+def jetton_admin_ttl(response: dict) -> float:
+    admin_address = response.get("decoded", {}).get("admin_address")
+    return FOREVER if admin_address in (None, ZERO_ADDRESS) else 60
+
+
+DEFAULT_TTLS: dict[str, Ttl] = {
+    "parse_account": FOREVER,
+    # Holders count changes even when the supply does not, so jetton data
+    # is only shared between lookups close together.
+    "jetton_data": 60,
+    "method_get_jetton_data": jetton_admin_ttl,
+    "account_info": RESCAN_WINDOW,
+    "jetton_pools": 300,
+}
+
+
+class ResponseCache:
+    def __init__(
+        self,
+        ttls: dict[str, Ttl] | None = None,
+        max_entries: int = 4096,
+        path: str | None = None,
+    ):
+        self.ttls = DEFAULT_TTLS if ttls is None else ttls
+        self.max_entries = max_entries
+        self.memory: OrderedDict[str, tuple[float, dict]] = OrderedDict()
+        self.counters: dict[str, dict[str, int]] = {}
+        self.lock = threading.Lock()
+        self.db: sqlite3.Connection | None = None
+        if path:
+            self.db = sqlite3.connect(path, check_same_thread=False)
+            self.db.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, endpoint TEXT, "
+                "expires_at REAL, body TEXT)"
+            )
+            self.db.execute(
+                "DELETE FROM responses WHERE expires_at < ?", (time.time(),)
+            )
+            self.db.commit()
+
+    def is_cached(self, endpoint: str | None) -> bool:
+        return endpoint in self.ttls
+
+    def ttl_for(self, endpoint: str, response: dict) -> float:
+        ttl = self.ttls.get(endpoint, 0)
+        return ttl(response) if callable(ttl) else ttl
+
+    def _count(self, endpoint: str, counter: str) -> None:
+        counters = self.counters.setdefault(
+            endpoint, {"hits": 0, "disk_hits": 0, "misses": 0}
+        )
+        counters[counter] += 1
+
+    def get(self, endpoint: str, key: str) -> dict | None:
+        now = time.time()
+        with self.lock:
+            if key in self.memory:
+                expires_at, response = self.memory[key]
+                if expires_at >= now:
+                    self.memory.move_to_end(key)
+                    self._count(endpoint, "hits")
+                    return copy.deepcopy(response)
+                del self.memory[key]
+
+            if self.db is not None:
+                row = self.db.execute(
+                    "SELECT expires_at, body FROM responses "
+                    "WHERE key = ? AND expires_at >= ?",
+                    (key, now),
+                ).fetchone()
+                if row:
+                    response = json.loads(row[1])
+                    self._remember(key, row[0], copy.deepcopy(response))
+                    self._count(endpoint, "disk_hits")
+                    return response
+
+            self._count(endpoint, "misses")
+            return None
+
+    def set(self, endpoint: str, key: str, response: dict) -> None:
+        ttl = self.ttl_for(endpoint, response)
+        if ttl <= 0:
+            return
+        expires_at = time.time() + ttl
+        with self.lock:
+            # Callers get and keep their own copies, a response changed
+            # after caching does not change later hits.
+            self._remember(key, expires_at, copy.deepcopy(response))
+            if self.db is not None:
+                self.db.execute(
+                    "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?)",
+                    (key, endpoint, expires_at, json.dumps(response)),
+                )
+                self.db.commit()
+
+    def _remember(self, key: str, expires_at: float, response: dict) -> None:
+        self.memory[key] = (expires_at, response)
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.max_entries:
+            self.memory.popitem(last=False)
+
+    def stats(self) -> dict[str, dict[str, int]]:
+        with self.lock:
+            return {
+                endpoint: dict(counters)
+                for endpoint, counters in self.counters.items()
+            }
+
+    def close(self) -> None:
+        if self.db is not None:
+            self.db.close()
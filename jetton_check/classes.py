@@ -1,23 +1,65 @@
+import asyncio
+import heapq
 from datetime import datetime, UTC
-
-from clients import TonViewerClient, GeckoTerminalClient
+from typing import Any, AsyncIterator, Awaitable, Callable, TypeVar
+
+from address import address_key, to_bounceable
+from airdrops import AirdropAggregator
+from cache import ZERO_ADDRESS
+from clients import (
+    AsyncTonViewerClient,
+    AsyncGeckoTerminalClient,
+)
 from models import (
     Event,
     ActionType,
     Account,
     Wallet,
+    JettonData,
     JettonMaster,
     AccountData,
     LiquidityState,
+    PoolWatermark,
+    JettonSnapshot,
 )
+from rating import RatingEngine, extract_features
+from singleflight import SingleFlight
+
+T = TypeVar("T")
+
+# Holders shown and rated, as in JettonMaster.get_top_ten.
+TOP_HOLDERS = 10
+
+
+async def gather_or_cancel(*aws: Awaitable) -> list[Any]:
+    tasks = [asyncio.ensure_future(aw) for aw in aws]
+    try:
+        return await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        raise
 
 
-class Ton:
+class AsyncTon:
+    rating_engine: RatingEngine = RatingEngine()
+
     def __init__(
-        self, tv_client: TonViewerClient, gt_client: GeckoTerminalClient
+        self,
+        tv_client: AsyncTonViewerClient,
+        gt_client: AsyncGeckoTerminalClient,
+        max_holders: int | None = None,
+        max_event_pages: int | None = 10,
+        flights: SingleFlight | None = None,
+        rating_engine: RatingEngine | None = None,
     ):
         self.tv_client = tv_client
         self.gt_client = gt_client
+        self.max_holders = max_holders
+        self.max_event_pages = max_event_pages
+        self.flights = flights
+        if rating_engine is not None:
+            self.rating_engine = rating_engine
 
     def check_liquidity_state(
         self,
@@ -39,85 +81,58 @@ class Ton:
 
         return LiquidityState.NotSafe
 
+    def jetton_features(
+        self,
+        jetton_master: JettonMaster,
+        liquidity_master: JettonMaster,
+        total_airdrop: float,
+    ) -> dict[str, float]:
+        return extract_features(
+            jetton_master,
+            liquidity_master,
+            self.check_liquidity_state(liquidity_master),
+            total_airdrop,
+        )
+
     def rate_jetton(
         self,
         jetton_master: JettonMaster,
         liquidity_master: JettonMaster,
         total_airdrop: float,
-    ) -> int:
-        rating = 0
-        if (
-            jetton_master.admin_address
-            == "0:0000000000000000000000000000000000000000000000000000000000000000"
-        ):
-            rating += 1
-
-        if self.check_liquidity_state(liquidity_master) in [
-            LiquidityState.Burned,
-            LiquidityState.TonInuLocked,
-            LiquidityState.Undefined,
-        ]:
-            rating += 1
-        if (
-            jetton_master.creator.balance / jetton_master.data.total_supply
-            <= 0.1
-        ):
-            rating += 1
+    ) -> float:
+        return self.rating_engine.score_one(
+            self.jetton_features(
+                jetton_master, liquidity_master, total_airdrop
+            )
+        )
 
-        if total_airdrop <= 20:
-            rating += 1
+    def passes_prefilter(self, new_pool_data: dict) -> bool:
+        fdv_usd = float(new_pool_data["attributes"]["fdv_usd"])
+        reserve_usd = float(new_pool_data["attributes"]["reserve_in_usd"])
+        return fdv_usd >= 2000 and reserve_usd / fdv_usd >= 0.05
 
-        return rating
+    def pool_key(self, new_pool_data: dict) -> tuple[str, str, str]:
+        creation = new_pool_data["attributes"]["pool_created_at"]
+        pool_address = new_pool_data["attributes"]["address"]
+        token_address = new_pool_data["relationships"]["base_token"]["data"][
+            "id"
+        ][4:]
+        return creation, pool_address, token_address
 
-    def get_new_pools_and_tokens_addresses(
-        self, pages: int
-    ) -> list[tuple[str, str, str]]:
-        new_pools_datas = []
-        for i in range(1, pages + 1):
-            new_pools_datas.extend(
-                self.gt_client.get_new_pools(page=i)["data"]
-            )
-        result = []
-        for new_pool_data in new_pools_datas:
-            fdv_usd = float(new_pool_data["attributes"]["fdv_usd"])
-            reserve_usd = float(new_pool_data["attributes"]["reserve_in_usd"])
-            if fdv_usd < 2000 or reserve_usd / fdv_usd < 0.05:
-                continue
-            creation = new_pool_data["attributes"]["pool_created_at"]
-            pool_address = new_pool_data["attributes"]["address"]
-            token_address = new_pool_data["relationships"]["base_token"][
-                "data"
-            ]["id"][4:]
-            result.append((creation, pool_address, token_address))
-        return result
-
-    def get_jetton_pools(
-        self, jetton_master_address_b64: str
-    ) -> list[JettonMaster]:
-        pools_datas = self.gt_client.get_jetton_pools(
-            jetton_master_address_b64
-        )["data"]
+    def sort_pools_addresses(self, pools_datas: list[dict]) -> list[str]:
         pools_datas_sorted = sorted(
             pools_datas,
             key=lambda x: x["attributes"]["fdv_usd"],
             reverse=True,
         )
-        pools_addresses = [
+        return [
             pool_data["attributes"]["address"]
             for pool_data in pools_datas_sorted
         ]
 
-        return [self.get_jetton_master(pa) for pa in pools_addresses]
-
-    def get_jetton_admin_address(self, address: str) -> str:
-        data = self.tv_client.execute_account_method(
-            address, "get_jetton_data"
-        )
-        return data["decoded"]["admin_address"]
-
-    def get_creator_wallet(
+    def find_creator_datas(
         self, jetton_master_events: list[Event]
-    ) -> Wallet | None:
+    ) -> tuple[AccountData | None, AccountData | None]:
         creator_jetton_wallet_data: AccountData = None
         creator_account_data: AccountData = None
         for event in jetton_master_events:
@@ -138,36 +153,11 @@ class Ton:
 
                 if creator_jetton_wallet_data and creator_account_data:
                     break
+        return creator_jetton_wallet_data, creator_account_data
 
-        if not creator_jetton_wallet_data or not creator_account_data:
-            return None
-
-        creator_account = self.tv_client.get_account(
-            creator_account_data.address
-        )
-        creator_account_events = self.tv_client.get_account_events(
-            creator_jetton_wallet_data.address,
-            int(datetime.now(UTC).timestamp()),
-        )
-        creator_account.events = creator_account_events
-        balance = self.tv_client.execute_account_method(
-            creator_jetton_wallet_data.address, "get_wallet_data"
-        )["decoded"]["balance"]
-        return Wallet(
-            account=creator_account,
-            balance=balance,
-            jetton_wallet=creator_jetton_wallet_data.address,
-        )
-
-    def get_holders(
-        self,
-        jetton_master_address_b64: str,
-        creator_address: str | None = None,
-    ) -> list[Wallet]:
-        holders_data = self.tv_client.get_jetton_holders(
-            jetton_master_address_b64
-        )
-
+    def split_holders(
+        self, holders_data: list[dict], creator_address: str | None = None
+    ) -> tuple[list[Wallet], list[dict]]:
         holders = []
         non_wallet_holder_datas = []
         for holder in holders_data:
@@ -192,67 +182,346 @@ class Ton:
                         balance=holder["balance"],
                     )
                 )
+        return holders, non_wallet_holder_datas
 
-        non_wallet_accounts: list[Account] = []
-        for start in range(0, len(non_wallet_holder_datas), 100):
-            end = (
-                start + 100
-                if start + 100 < len(non_wallet_holder_datas)
-                else len(non_wallet_holder_datas)
-            )
-            addresses = [
-                holder["owner"]["address"]
-                for holder in non_wallet_holder_datas[start:end]
-            ]
-            non_wallet_accounts += self.tv_client.get_accounts_bulk(addresses)
+    def name_creator(
+        self, holders: list[Wallet], creator_address: str
+    ) -> list[Wallet]:
+        for holder in holders:
+            if (
+                holder.account.is_wallet
+                and not holder.account.name
+                and holder.account.address == creator_address
+            ):
+                holder.account.name = "Creator"
+        return holders
 
+    def merge_non_wallet_holders(
+        self,
+        holders: list[Wallet],
+        non_wallet_holder_datas: list[dict],
+        non_wallet_accounts: list[Account],
+    ) -> list[Wallet]:
+        holder_datas = {
+            data["owner"]["address"]: data for data in non_wallet_holder_datas
+        }
         for account in non_wallet_accounts:
             if account.address == LiquidityState.TonInuLocked.value:
                 account.name = "TON Inu Locker"
 
-            balance: str
-            jetton_wallet: str
-            for data in non_wallet_holder_datas:
-                if data["owner"]["address"] == account.address:
-                    balance = data["balance"]
-                    jetton_wallet = data["address"]
-
+            data = holder_datas[account.address]
             holders.append(
                 Wallet(
                     account=account,
-                    jetton_wallet=jetton_wallet,
-                    balance=balance,
+                    jetton_wallet=data["address"],
+                    balance=data["balance"],
                 )
             )
 
         return holders
 
-    def get_jetton_master(
-        self, jetton_master_address_b64: str, type="jetton"
-    ) -> JettonMaster:
-        data = self.tv_client.get_jetton_data(jetton_master_address_b64)
-        admin_address = (
-            self.get_jetton_admin_address(jetton_master_address_b64)
-            if type == "jetton"
-            else "None"
+    async def _single_flight(
+        self, key: tuple, call: Callable[[], Awaitable[T]]
+    ) -> T:
+        if self.flights is None:
+            return await call()
+        return await self.flights.do(key, call)
+
+    async def iter_new_pools(
+        self,
+        pages: int,
+        watermark: PoolWatermark | None = None,
+        concurrency: int = 4,
+        rejected: list[tuple[str, str, str]] | None = None,
+    ) -> AsyncIterator[tuple[str, str, str]]:
+        # New pools come newest first. Paging stops at the first page that
+        # reaches the watermark, pools above it advance the watermark.
+        # Pools failing the prefilter go to `rejected`, the watermark
+        # passes them too, so callers have to check them again.
+        known = watermark.model_copy(deep=True) if watermark else None
+        page, window = 1, 1
+        while page <= pages:
+            responses = await gather_or_cancel(
+                *[
+                    self.gt_client.get_new_pools(page=i)
+                    for i in range(page, min(page + window, pages + 1))
+                ]
+            )
+            for response in responses:
+                reached_known = False
+                for new_pool_data in response["data"]:
+                    attributes = new_pool_data["attributes"]
+                    created_at = attributes["pool_created_at"]
+                    pool_address = attributes["address"]
+                    if known and known.is_known(created_at, pool_address):
+                        reached_known = True
+                        continue
+                    if watermark is not None:
+                        watermark.advance(created_at, pool_address)
+                    if self.passes_prefilter(new_pool_data):
+                        yield self.pool_key(new_pool_data)
+                    elif rejected is not None:
+                        rejected.append(self.pool_key(new_pool_data))
+                if reached_known or not response["data"]:
+                    return
+            page += len(responses)
+            # The first page was all new, fetch the backlog concurrently.
+            window = concurrency
+
+    async def recheck_pools(
+        self, pools: list[tuple[str, str, str]], batch: int = 30
+    ) -> list[tuple[str, str, str]]:
+        # Pools of `pools` that pass the prefilter with current fdv and
+        # reserve.
+        responses = await gather_or_cancel(
+            *[
+                self.gt_client.get_pools(
+                    [
+                        pool_address
+                        for _, pool_address, _ in pools[i : i + batch]
+                    ]
+                )
+                for i in range(0, len(pools), batch)
+            ]
+        )
+        passing = {
+            pool_data["attributes"]["address"]
+            for response in responses
+            for pool_data in response["data"]
+            if self.passes_prefilter(pool_data)
+        }
+        return [pool for pool in pools if pool[1] in passing]
+
+    async def get_new_pools_and_tokens_addresses(
+        self, pages: int
+    ) -> list[tuple[str, str, str]]:
+        return [pool async for pool in self.iter_new_pools(pages)]
+
+    async def get_jetton_pools(
+        self, jetton_master_address_b64: str
+    ) -> list[JettonMaster]:
+        pools_datas = (
+            await self.gt_client.get_jetton_pools(jetton_master_address_b64)
+        )["data"]
+        pools_addresses = self.sort_pools_addresses(pools_datas)
+
+        return await gather_or_cancel(
+            *[self.get_jetton_master(pa) for pa in pools_addresses]
+        )
+
+    async def get_jetton_admin_address(self, address: str) -> str:
+        data = await self.tv_client.execute_account_method(
+            address, "get_jetton_data"
         )
-        events = self.tv_client.get_account_events(
+        return data["decoded"]["admin_address"]
+
+    async def get_creator_wallet(
+        self, jetton_master_events: list[Event]
+    ) -> Wallet | None:
+        return await self.get_creator_wallet_from_datas(
+            *self.find_creator_datas(jetton_master_events)
+        )
+
+    async def get_creator_wallet_from_datas(
+        self,
+        creator_jetton_wallet_data: AccountData | None,
+        creator_account_data: AccountData | None,
+    ) -> Wallet | None:
+        if not creator_jetton_wallet_data or not creator_account_data:
+            return None
+
+        (
+            creator_account,
+            creator_account_events,
+            wallet_data,
+        ) = await gather_or_cancel(
+            self.tv_client.get_account(creator_account_data.address),
+            self.tv_client.get_account_events(
+                creator_jetton_wallet_data.address,
+                int(datetime.now(UTC).timestamp()),
+            ),
+            self.tv_client.execute_account_method(
+                creator_jetton_wallet_data.address, "get_wallet_data"
+            ),
+        )
+        creator_account.events = creator_account_events
+        balance = wallet_data["decoded"]["balance"]
+        return Wallet(
+            account=creator_account,
+            balance=balance,
+            jetton_wallet=creator_jetton_wallet_data.address,
+        )
+
+    async def get_creator_wallet_by_master(
+        self, jetton_master_address_b64: str
+    ) -> Wallet | None:
+        creator_jetton_wallet_data: AccountData = None
+        creator_account_data: AccountData = None
+        async for event in self.tv_client.iter_account_events(
             jetton_master_address_b64,
             int(datetime.now(UTC).timestamp()),
+            max_pages=self.max_event_pages,
+            action_types=[ActionType.SmartContractExec],
+        ):
+            jetton_wallet_data, account_data = self.find_creator_datas([event])
+            creator_jetton_wallet_data = (
+                jetton_wallet_data or creator_jetton_wallet_data
+            )
+            creator_account_data = account_data or creator_account_data
+            if creator_jetton_wallet_data and creator_account_data:
+                break
+
+        return await self.get_creator_wallet_from_datas(
+            creator_jetton_wallet_data, creator_account_data
         )
-        account = self.tv_client.get_account(jetton_master_address_b64)
-        creator = self.get_creator_wallet(events)
-        holders = self.get_holders(
-            jetton_master_address_b64,
-            creator_address=creator.account.address if creator else None,
+
+    async def iter_holder_pages(
+        self,
+        jetton_master_address_b64: str,
+        page_size: int = 1000,
+        max_holders: int | None = None,
+        jetton_data: Awaitable[JettonData] | None = None,
+    ) -> AsyncIterator[list[dict]]:
+        offset = 0
+        supply_left: int | None = None
+        top: list[int] = []
+        while max_holders is None or offset < max_holders:
+            limit = (
+                page_size
+                if max_holders is None
+                else min(page_size, max_holders - offset)
+            )
+            page = await self.tv_client.get_jetton_holders(
+                jetton_master_address_b64, limit=limit, offset=offset
+            )
+            if page:
+                yield page
+            if len(page) < limit:
+                return
+            offset += len(page)
+            if jetton_data is None:
+                continue
+            # Once the supply not paged in yet is below the smallest top-N
+            # balance, no remaining holder can enter the top-N.
+            if supply_left is None:
+                supply_left = (await jetton_data).total_supply
+            balances = [int(holder["balance"]) for holder in page]
+            supply_left -= sum(balances)
+            top = heapq.nlargest(TOP_HOLDERS, top + balances)
+            if len(top) == TOP_HOLDERS and supply_left < top[-1]:
+                return
+
+    async def get_non_wallet_holders(
+        self,
+        non_wallet_holder_datas: list[dict],
+        known_accounts: dict[str, Account] | None = None,
+    ) -> list[Wallet]:
+        known_accounts = known_accounts or {}
+        accounts = [
+            known_accounts[holder["owner"]["address"]].model_copy()
+            for holder in non_wallet_holder_datas
+            if holder["owner"]["address"] in known_accounts
+        ]
+        unknown = [
+            holder["owner"]["address"]
+            for holder in non_wallet_holder_datas
+            if holder["owner"]["address"] not in known_accounts
+        ]
+        if unknown:
+            accounts += await self.tv_client.get_accounts_bulk(unknown)
+        return self.merge_non_wallet_holders(
+            [], non_wallet_holder_datas, accounts
+        )
+
+    async def get_holders(
+        self,
+        jetton_master_address_b64: str,
+        creator_address: str | None = None,
+        max_holders: int | None = None,
+        known_accounts: dict[str, Account] | None = None,
+        jetton_data: Awaitable[JettonData] | None = None,
+    ) -> list[Wallet]:
+        # Holders come sorted by balance, so a cap keeps the top-N exact.
+        # Bulk account lookups for a page start while the next page loads.
+        holders: list[Wallet] = []
+        bulk_tasks: list[asyncio.Task] = []
+        try:
+            async for page in self.iter_holder_pages(
+                jetton_master_address_b64,
+                max_holders=(
+                    self.max_holders if max_holders is None else max_holders
+                ),
+                jetton_data=jetton_data,
+            ):
+                page_holders, non_wallet_holder_datas = self.split_holders(
+                    page, creator_address
+                )
+                holders += page_holders
+                for start in range(0, len(non_wallet_holder_datas), 100):
+                    bulk_tasks.append(
+                        asyncio.ensure_future(
+                            self.get_non_wallet_holders(
+                                non_wallet_holder_datas[start : start + 100],
+                                known_accounts,
+                            )
+                        )
+                    )
+            for non_wallet_holders in await gather_or_cancel(*bulk_tasks):
+                holders += non_wallet_holders
+        except BaseException:
+            for task in bulk_tasks:
+                task.cancel()
+            raise
+
+        return holders
+
+    async def get_jetton_master(
+        self, jetton_master_address_b64: str, type="jetton"
+    ) -> JettonMaster:
+        # Concurrent analyses of one address, e.g. from several chats and
+        # the scheduler, share a single set of requests.
+        jetton_master = await self._single_flight(
+            ("jetton_master", address_key(jetton_master_address_b64), type),
+            lambda: self._get_jetton_master(jetton_master_address_b64, type),
+        )
+        if self.flights is None:
+            return jetton_master
+        # The shared master is kept for the flight TTL and read from the
+        # chat and scan threads, callers set airdrop amounts on a copy.
+        return jetton_master.model_copy(deep=True)
+
+    async def _get_jetton_master(
+        self, jetton_master_address_b64: str, type="jetton"
+    ) -> JettonMaster:
+        # Everything below only needs the master address, so it is issued
+        # at once; the creator is only needed afterwards to name holders.
+        data = asyncio.ensure_future(
+            self.tv_client.get_jetton_data(jetton_master_address_b64)
         )
-        address_b64 = self.tv_client.parse_account(account.address)[
-            "bounceable"
-        ]["b64url"]
-        account.address_b64 = address_b64
-        used_cells = self.tv_client.low_level_account_info(account.address)[
-            "storage"
-        ]["used_cells"]
+        requests = [
+            data,
+            self.tv_client.get_account(jetton_master_address_b64),
+            self.get_creator_wallet_by_master(jetton_master_address_b64),
+            self.get_holders(jetton_master_address_b64, jetton_data=data),
+            self.tv_client.low_level_account_info(jetton_master_address_b64),
+        ]
+        if type == "jetton":
+            requests.append(
+                self.get_jetton_admin_address(jetton_master_address_b64)
+            )
+        (
+            data,
+            account,
+            creator,
+            holders,
+            account_info,
+            *admin,
+        ) = await gather_or_cancel(*requests)
+        admin_address = admin[0] if admin else "None"
+        if creator:
+            self.name_creator(holders, creator.account.address)
+        account.address_b64 = to_bounceable(account.address)
+        used_cells = account_info["storage"]["used_cells"]
 
         return JettonMaster(
             account=account,
@@ -261,55 +530,119 @@ class Ton:
             used_cells=used_cells,
             creator=creator,
             holders=holders,
-            events=events,
         )
 
-    def process_airdrops(
+    async def process_airdrops(
         self, jetton_master: JettonMaster
     ) -> tuple[dict[str, dict], int]:
-        creator_jetton_events: list[
-            Event
-        ] = self.tv_client.get_account_jetton_event_history(
+        # The creator's history is read once per address, the shared
+        # receivers are applied to each caller's own master.
+        receivers = await self._single_flight(
+            (
+                "airdrops",
+                jetton_master.account.address,
+                self.max_event_pages,
+            ),
+            lambda: self._scan_airdrop_receivers(jetton_master),
+        )
+        return AirdropAggregator(jetton_master, receivers).result()
+
+    async def _scan_airdrop_receivers(
+        self, jetton_master: JettonMaster
+    ) -> dict[str, dict]:
+        return (await self.scan_airdrops(jetton_master)).receivers
+
+    async def scan_airdrops(
+        self,
+        jetton_master: JettonMaster,
+        airdrop_receivers: dict[str, dict] | None = None,
+        after_lt: int = 0,
+        stop_percent: float | None = None,
+    ) -> AirdropAggregator:
+        # Pages are requested lazily, leaving the loop early saves the
+        # requests for the remaining history.
+        aggregator = AirdropAggregator(
+            jetton_master, airdrop_receivers, after_lt, stop_percent
+        )
+        async for event in self.tv_client.iter_account_jetton_event_history(
             jetton_master.creator.account.address,
             jetton_master.data.metadata.address,
             int(datetime.now(UTC).timestamp()),
+            max_pages=self.max_event_pages,
+            action_types=[ActionType.JettonTransfer],
+        ):
+            if not aggregator.add_event(event):
+                break
+        return aggregator
+
+    async def refresh_jetton_master(
+        self, stored: JettonMaster, type: str = "jetton"
+    ) -> JettonMaster:
+        # Account, contract size and creator do not change after a scan;
+        # supply, holder balances and a not yet revoked admin are fetched
+        # again, accounts of known holders are reused.
+        address = stored.account.address
+        known_accounts = {
+            holder.account.address: holder.account
+            for holder in stored.holders
+            if not holder.account.is_wallet
+        }
+        creator = stored.creator.model_copy() if stored.creator else None
+        refresh_admin = (
+            type == "jetton" and stored.admin_address != ZERO_ADDRESS
         )
-        airdrop_receivers: dict[str, dict] = {}
-        for event in creator_jetton_events:
-            for action in event.actions:
-                if (
-                    action.type == ActionType.JettonTransfer
-                    and action.JettonTransfer.sender.address
-                    == jetton_master.creator.account.address
-                    and action.JettonTransfer.comment != "Call: DedustSwap"
-                ):
-                    key = action.JettonTransfer.recipient.address
-                    if key not in airdrop_receivers:
-                        airdrop_receivers[key] = {
-                            "amount": 0,
-                            "name": action.JettonTransfer.recipient.name
-                            if action.JettonTransfer.recipient
-                            else None,
-                        }
-
-                    airdrop_receivers[key]["amount"] += int(
-                        action.JettonTransfer.amount
-                    )
+        # Only the jetton creator's balance is used for rating.
+        refresh_creator = type == "jetton" and creator is not None
+        data = asyncio.ensure_future(self.tv_client.get_jetton_data(address))
+        requests = [
+            data,
+            self.get_holders(
+                address,
+                creator.account.address if creator else None,
+                known_accounts=known_accounts,
+                jetton_data=data,
+            ),
+        ]
+        if refresh_admin:
+            requests.append(self.get_jetton_admin_address(address))
+        if refresh_creator:
+            requests.append(
+                self.tv_client.execute_account_method(
+                    creator.jetton_wallet, "get_wallet_data"
+                )
+            )
+        data, holders, *results = await gather_or_cancel(*requests)
 
-        for holder in jetton_master.holders:
-            if holder.account.address in airdrop_receivers:
-                airdrop_receivers[holder.account.address][
-                    "name"
-                ] = holder.account.name
-                holder.airdrop_amount = airdrop_receivers[
-                    holder.account.address
-                ]["amount"]
-
-        filtered_receivers = {}
-        airdrop_sum = 0
-        for key, data in airdrop_receivers.items():
-            if data["name"] not in ["Dedust Vault", "Stonfi Router"]:
-                filtered_receivers[key] = data
-                airdrop_sum += data["amount"]
-
-        return filtered_receivers, airdrop_sum
+        admin_address = stored.admin_address
+        if refresh_admin:
+            admin_address = results.pop(0)
+        if refresh_creator:
+            creator.balance = int(results.pop(0)["decoded"]["balance"])
+            self.name_creator(holders, creator.account.address)
+
+        return JettonMaster(
+            account=stored.account,
+            admin_address=admin_address,
+            data=data,
+            used_cells=stored.used_cells,
+            creator=creator,
+            holders=holders,
+        )
+
+    async def rescan_pool(
+        self, snapshot: JettonSnapshot, stop_percent: float | None = None
+    ) -> tuple[JettonMaster, JettonMaster, AirdropAggregator]:
+        jetton_master, liquidity_master = await gather_or_cancel(
+            self.refresh_jetton_master(snapshot.jetton_master),
+            self.refresh_jetton_master(snapshot.liquidity_master, type="pool"),
+        )
+        aggregator = await self.scan_airdrops(
+            jetton_master,
+            snapshot.airdrop_receivers,
+            snapshot.history_lt,
+            stop_percent,
+        )
+        # Newer transfers are added to a truncated total, it stays a lower
+        # bound.
+        aggregator.stopped |= snapshot.airdrop_stopped
+        return jetton_master, liquidity_master, aggregator
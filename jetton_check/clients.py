@@ -1,119 +1,433 @@
-import threading
+import asyncio
+import email.utils
+import json
+import logging
+import random
 import time
+from typing import AsyncIterator, Iterable
 
 import httpx
 
+from address import to_raw
+from cache import ResponseCache
+from coalescer import BulkCoalescer
+from limiter import get_bucket
+from metrics import metrics
 from models import (
     Event,
     Account,
+    ActionType,
     JettonData,
+    decode_event,
 )
+from recording import Recorder
 
+logger = logging.getLogger(__name__)
 
-class ApiClient:
-    def __init__(self, url: str, auth: str = None, pause_seconds: int = 1):
+
+def build_headers(auth: str | None = None) -> dict[str, str]:
+    headers = {"Accept": "application/json"}
+    if auth:
+        headers["Authorization"] = f"Bearer {auth}"
+    return headers
+
+
+def cache_key(method: str, url: str, data: dict | None = None) -> str:
+    if data is None:
+        return f"{method} {url}"
+    return f"{method} {url} {json.dumps(data, sort_keys=True)}"
+
+
+class ApiError(Exception):
+    def __init__(
+        self,
+        status_code: int,
+        payload: dict | str,
+        retry_after: float | None = None,
+    ):
+        super().__init__(payload)
+        self.status_code = status_code
+        self.payload = payload
+        self.retry_after = retry_after
+
+    @property
+    def throttled(self) -> bool:
+        return self.status_code == 429
+
+    @property
+    def retryable(self) -> bool:
+        return self.throttled or self.status_code >= 500
+
+
+def parse_retry_after(headers: httpx.Headers) -> float | None:
+    if value := headers.get("retry-after"):
+        try:
+            return max(float(value), 0.0)
+        except ValueError:
+            pass
+        try:
+            retry_at = email.utils.parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+        return max(retry_at.timestamp() - time.time(), 0.0)
+
+    if headers.get("x-ratelimit-remaining") == "0":
+        try:
+            reset = float(headers.get("x-ratelimit-reset", ""))
+        except ValueError:
+            return None
+        # Some APIs send an epoch timestamp instead of seconds to wait.
+        if reset > 1e9:
+            reset -= time.time()
+        return max(reset, 0.0)
+    return None
+
+
+def backoff_delay(attempt: int, base: float = 0.5, cap: float = 30.0) -> float:
+    return random.uniform(0, min(cap, base * 2**attempt))
+
+
+def read_payload(response: httpx.Response) -> dict | str:
+    try:
+        return response.json()
+    except ValueError:
+        return response.text
+
+
+class AsyncApiClient:
+    def __init__(
+        self,
+        url: str,
+        auth: str = None,
+        rate_limit: float = 1.0,
+        burst: float | None = None,
+        cache: ResponseCache | None = None,
+        recorder: Recorder | None = None,
+        max_rate: float | None = None,
+        max_retries: int = 4,
+    ):
         self.url = url
-        headers = {"Accept": "application/json"}
-        if auth:
-            headers["Authorization"] = f"Bearer {auth}"
-        self.client = httpx.Client(headers=headers)
-        self.last_exec: float = 0.0
-        self.pause_seconds = pause_seconds
-        self.semaphore = threading.Semaphore(pause_seconds)
-
-    def _request(
-        self, method: str, url: str, data: dict | None = None
+        self.service = httpx.URL(url).host
+        self.bucket = get_bucket(self.service, rate_limit, burst, max_rate)
+        self.cache = cache
+        self.recorder = recorder
+        self.max_retries = max_retries
+        self.client = httpx.AsyncClient(headers=build_headers(auth))
+
+    def _cached(
+        self, method: str, url: str, data: dict | None, endpoint: str | None
+    ) -> tuple[str | None, dict | None]:
+        if self.cache is None or not self.cache.is_cached(endpoint):
+            return None, None
+        key = cache_key(method, url, data)
+        if (result := self.cache.get(endpoint, key)) is not None:
+            metrics.observe_cache_hit(self.service, endpoint)
+        return key, result
+
+    def _read_response(
+        self,
+        method: str,
+        url: str,
+        data: dict | None,
+        endpoint: str | None,
+        response: httpx.Response,
+        latency: float,
+        wait: float,
+    ) -> dict:
+        metrics.observe_request(
+            self.service,
+            endpoint,
+            response.status_code,
+            latency,
+            len(response.content),
+            wait,
+        )
+        if self.recorder is not None:
+            self.recorder.record_response(
+                self.url, method, url, data, response
+            )
+
+        retry_after = parse_retry_after(response.headers)
+        if response.status_code > 299:
+            raise ApiError(
+                response.status_code, read_payload(response), retry_after
+            )
+
+        self.bucket.on_success()
+        if retry_after:
+            # The quota is used up even though this request got through.
+            self.bucket.pause(retry_after)
+        return response.json()
+
+    def _retry_delay(
+        self, error: Exception, attempt: int, endpoint: str | None
+    ) -> float | None:
+        if attempt >= self.max_retries:
+            return None
+        if isinstance(error, ApiError):
+            if not error.retryable:
+                return None
+            delay = error.retry_after or backoff_delay(attempt)
+            if error.throttled:
+                # The bucket pauses every request to this host, not only
+                # the one being retried.
+                self.bucket.on_throttle(delay)
+                delay = 0.0
+        elif isinstance(error, httpx.TransportError):
+            delay = backoff_delay(attempt)
+        else:
+            return None
+        logger.warning(
+            f"Retrying {self.service} {endpoint} after {error!r} "
+            f"(attempt {attempt + 1}/{self.max_retries}, "
+            f"rate {self.bucket.rate:.2f} req/s)"
+        )
+        return delay
+
+    def _observe_error(
+        self, endpoint: str | None, latency: float, wait: float
+    ) -> None:
+        metrics.observe_request(
+            self.service, endpoint, "error", latency, wait=wait
+        )
+
+    async def _request(
+        self,
+        method: str,
+        url: str,
+        data: dict | None = None,
+        endpoint: str | None = None,
     ) -> dict:
-        with self.semaphore:
-            time.sleep(self.pause_seconds)
-            response = self.client.request(method, url, json=data)
+        key, result = self._cached(method, url, data, endpoint)
+        if result is not None:
+            return result
+
+        for attempt in range(self.max_retries + 1):
+            wait = await self.bucket.acquire()
+            start = time.perf_counter()
+            try:
+                response = await self.client.request(method, url, json=data)
+                result = self._read_response(
+                    method,
+                    url,
+                    data,
+                    endpoint,
+                    response,
+                    time.perf_counter() - start,
+                    wait,
+                )
+                break
+            except (ApiError, httpx.HTTPError) as e:
+                if isinstance(e, httpx.HTTPError):
+                    self._observe_error(
+                        endpoint, time.perf_counter() - start, wait
+                    )
+                delay = self._retry_delay(e, attempt, endpoint)
+                if delay is None:
+                    raise
+                if delay > 0:
+                    await asyncio.sleep(delay)
+
+        if key is not None:
+            self.cache.set(endpoint, key, result)
+        return result
 
-            if response.status_code > 299:
-                raise Exception(response.json())
+    async def aclose(self) -> None:
+        await self.client.aclose()
 
-            return response.json()
 
+class AsyncTonViewerClient(AsyncApiClient):
+    def __init__(self, *args, coalesce_window: float | None = 0.05, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Single account lookups issued within the window from concurrent
+        # tasks are sent as one /accounts/_bulk request.
+        self.account_coalescer: BulkCoalescer[Account] | None = (
+            BulkCoalescer(self.get_accounts_by_address, coalesce_window)
+            if coalesce_window
+            else None
+        )
 
-class TonViewerClient(ApiClient):
-    def get_jetton_holders(
+    async def get_jetton_holders(
         self, address: str, limit: int = 1000, offset: int = 0
     ) -> list[dict]:
-        response = self._request(
+        response = await self._request(
             "GET",
             f"{self.url}/jettons/{address}/holders?limit={limit}&offset={offset}",
+            endpoint="jetton_holders",
         )
         return response["addresses"]
 
-    def get_jetton_data(self, address: str) -> JettonData:
+    async def get_jetton_data(self, address: str) -> JettonData:
         return JettonData(
-            **self._request("GET", f"{self.url}/jettons/{address}")
+            **await self._request(
+                "GET", f"{self.url}/jettons/{address}", endpoint="jetton_data"
+            )
         )
 
-    def get_account(self, address: str) -> Account:
+    async def get_account(self, address: str) -> Account:
+        if self.account_coalescer is not None:
+            try:
+                key = to_raw(address)
+            except ValueError:
+                key = None
+            if key is not None:
+                account = await self.account_coalescer.get(key)
+                return account.model_copy()
+
         return Account(
-            **self._request("GET", f"{self.url}/accounts/{address}")
+            **await self._request(
+                "GET", f"{self.url}/accounts/{address}", endpoint="account"
+            )
         )
 
-    def get_accounts_bulk(self, addresses: list[str]) -> list[Account]:
-        accounts = self._request(
+    async def get_accounts_by_address(
+        self, addresses: list[str]
+    ) -> dict[str, Account]:
+        accounts = await self.get_accounts_bulk(addresses)
+        return {account.address: account for account in accounts}
+
+    async def get_accounts_bulk(self, addresses: list[str]) -> list[Account]:
+        response = await self._request(
             "POST",
             f"{self.url}/accounts/_bulk",
             data={"account_ids": addresses},
-        )["accounts"]
-        return [Account(**a) for a in accounts]
+            endpoint="accounts_bulk",
+        )
+        return [Account(**a) for a in response["accounts"]]
 
-    def get_account_events(
+    async def get_account_events(
         self, address: str, end_timestamp: int, limit: int = 100
-    ) -> dict:
-        response = self._request(
+    ) -> list[Event]:
+        response = await self._request(
             "GET",
             f"{self.url}/accounts/{address}/events?initiator=false&subject_only=false&limit={limit}&end_date={end_timestamp}",
+            endpoint="account_events",
         )
-        return [Event(**e) for e in response["events"]]
+        return [decode_event(e) for e in response["events"]]
 
-    def get_account_jetton_event_history(
+    async def get_account_jetton_event_history(
         self,
         account_address: str,
-        jetton_address: int,
+        jetton_address: str,
         end_timestamp: int,
         limit: int = 100,
-    ) -> dict:
-        response = self._request(
+    ) -> list[Event]:
+        response = await self._request(
             "GET",
             f"{self.url}/accounts/{account_address}/jettons/{jetton_address}/history?initiator=false&subject_only=false&limit={limit}&end_date={end_timestamp}",
+            endpoint="jetton_history",
         )
-        return [Event(**e) for e in response["events"]]
+        return [decode_event(e) for e in response["events"]]
 
-    def parse_account(self, address: str) -> str:
-        return self._request("GET", f"{self.url}/address/{address}/parse")
+    async def iter_events(
+        self,
+        url: str,
+        endpoint: str,
+        end_timestamp: int | None = None,
+        limit: int = 100,
+        max_pages: int | None = None,
+        action_types: Iterable[ActionType] | None = None,
+    ) -> AsyncIterator[Event]:
+        pages = 0
+        cursor = f"&end_date={end_timestamp}" if end_timestamp else ""
+        while max_pages is None or pages < max_pages:
+            response = await self._request(
+                "GET",
+                f"{url}?initiator=false&subject_only=false&limit={limit}{cursor}",
+                endpoint=endpoint,
+            )
+            pages += 1
+            for e in response["events"]:
+                yield decode_event(e, action_types)
+            next_from = response.get("next_from")
+            if not response["events"] or not next_from:
+                return
+            cursor = f"&before_lt={next_from}"
 
-    def get_account_jettons(self, address: str) -> list[str]:
-        response = self._request(
-            "GET", f"{self.url}/accounts/{address}/jettons"
+    def iter_account_events(
+        self,
+        address: str,
+        end_timestamp: int | None = None,
+        limit: int = 100,
+        max_pages: int | None = None,
+        action_types: Iterable[ActionType] | None = None,
+    ) -> AsyncIterator[Event]:
+        return self.iter_events(
+            f"{self.url}/accounts/{address}/events",
+            "account_events",
+            end_timestamp=end_timestamp,
+            limit=limit,
+            max_pages=max_pages,
+            action_types=action_types,
+        )
+
+    def iter_account_jetton_event_history(
+        self,
+        account_address: str,
+        jetton_address: str,
+        end_timestamp: int | None = None,
+        limit: int = 100,
+        max_pages: int | None = None,
+        action_types: Iterable[ActionType] | None = None,
+    ) -> AsyncIterator[Event]:
+        return self.iter_events(
+            f"{self.url}/accounts/{account_address}/jettons/{jetton_address}/history",
+            "jetton_history",
+            end_timestamp=end_timestamp,
+            limit=limit,
+            max_pages=max_pages,
+            action_types=action_types,
+        )
+
+    async def parse_account(self, address: str) -> dict:
+        return await self._request(
+            "GET",
+            f"{self.url}/address/{address}/parse",
+            endpoint="parse_account",
+        )
+
+    async def get_account_jettons(self, address: str) -> list[dict]:
+        response = await self._request(
+            "GET",
+            f"{self.url}/accounts/{address}/jettons",
+            endpoint="account_jettons",
         )
         return response["balances"]
 
-    def execute_account_method(self, address: str, method: str) -> dict:
-        return self._request(
+    async def execute_account_method(self, address: str, method: str) -> dict:
+        return await self._request(
             "GET",
             f"{self.url}/blockchain/accounts/{address}/methods/{method}",
+            endpoint=f"method_{method}",
         )
 
-    def low_level_account_info(self, address: str) -> dict:
-        return self._request(
+    async def low_level_account_info(self, address: str) -> dict:
+        return await self._request(
             "GET",
             f"{self.url}/blockchain/accounts/{address}",
+            endpoint="account_info",
         )
 
 
-class GeckoTerminalClient(ApiClient):
-    def get_jetton_pools(self, jetton_address: str):
-        return self._request(
+class AsyncGeckoTerminalClient(AsyncApiClient):
+    async def get_jetton_pools(self, jetton_address: str) -> dict:
+        return await self._request(
             "GET",
             f"{self.url}/networks/ton/tokens/{jetton_address}/pools",
+            endpoint="jetton_pools",
         )
 
-    def get_new_pools(self, page: int = 1):
-        return self._request(
-            "GET", f"{self.url}/networks/ton/new_pools?page={page}"
+    async def get_new_pools(self, page: int = 1) -> dict:
+        return await self._request(
+            "GET",
+            f"{self.url}/networks/ton/new_pools?page={page}",
+            endpoint="new_pools",
+        )
+
+    async def get_pools(self, pool_addresses: list[str]) -> dict:
+        # Up to 30 addresses per request.
+        return await self._request(
+            "GET",
+            f"{self.url}/networks/ton/pools/multi/{','.join(pool_addresses)}",
+            endpoint="pools_multi",
         )
@@ -0,0 +1,167 @@
+import json
+import os
+import threading
+import time
+from typing import Any, Iterable
+
+import numpy as np
+
+from models import JettonMaster, PoolScan
+from storage import parse_created_at
+
+# Supplies and balances do not fit int64, they are kept as float64 like
+# the rating features.
+columns: dict[str, str] = {
+    "scanned_ts": "float64",
+    "created_ts": "float64",
+    "token_address": "S66",
+    "total_supply": "float64",
+    "creator_balance": "float64",
+    "creator_share": "float64",
+    "airdrop_percent": "float64",
+    # Set when airdrop_percent and airdrop_receivers are lower bounds.
+    "airdrop_stopped": "bool",
+    "airdrop_receivers": "int32",
+    "top_ten_percent": "float64",
+    "liquidity_state": "int8",
+    "liquidity_holder": "int8",
+    "liquidity_share": "float64",
+    "admin_revoked": "bool",
+    "mintable": "bool",
+    "used_cells": "int32",
+    "holders_count": "int32",
+    "rating": "float64",
+    "incremental": "bool",
+}
+
+
+def scan_features(scan: PoolScan, scanned_ts: float) -> dict[str, Any]:
+    jetton_master: JettonMaster = scan.jetton_master
+    return {
+        "scanned_ts": scanned_ts,
+        "created_ts": parse_created_at(scan.created_at).timestamp(),
+        "token_address": scan.token_address.encode(),
+        "total_supply": jetton_master.data.total_supply,
+        "creator_balance": jetton_master.creator.balance,
+        "creator_share": scan.features["creator_share"],
+        "airdrop_percent": scan.total_airdrop_percent,
+        "airdrop_stopped": scan.airdrop_stopped,
+        "airdrop_receivers": len(scan.airdrop_receivers),
+        "top_ten_percent": jetton_master.calculate_top_ten_percent(),
+        "liquidity_state": scan.features["liquidity_state"],
+        "liquidity_holder": scan.features["liquidity_holder"],
+        "liquidity_share": scan.features["liquidity_share"],
+        "admin_revoked": scan.features["admin_revoked"],
+        "mintable": jetton_master.data.mintable,
+        "used_cells": jetton_master.used_cells,
+        "holders_count": jetton_master.data.holders_count,
+        "rating": scan.rating,
+        "incremental": scan.incremental,
+    }
+
+
+def column_path(directory: str, name: str) -> str:
+    return os.path.join(directory, f"{name}.bin")
+
+
+def complete_rows(directory: str, schema: dict[str, str] = columns) -> int:
+    # A crash or a concurrent writer between column writes leaves some
+    # columns longer, only rows present in every column count.
+    counts = []
+    for name, dtype in schema.items():
+        path = column_path(directory, name)
+        size = os.path.getsize(path) if os.path.exists(path) else 0
+        counts.append(size // np.dtype(dtype).itemsize)
+    return min(counts)
+
+
+# One append-only file of fixed width values per column. Readers map the
+# files instead of loading them, so a query touches only the pages of the
+# columns it reads.
+class FeatureStore:
+    def __init__(self, directory: str = "features"):
+        self.directory = directory
+        self.lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self._check_schema()
+        self.rows = self._repair()
+        self.files = {
+            name: open(column_path(directory, name), "ab") for name in columns
+        }
+
+    def _check_schema(self) -> None:
+        path = os.path.join(self.directory, "schema.json")
+        if not os.path.exists(path):
+            with open(path, "w") as f:
+                json.dump(columns, f)
+            return
+        with open(path) as f:
+            schema = json.load(f)
+        if schema == columns:
+            return
+        if any(columns.get(name) != dtype for name, dtype in schema.items()):
+            raise ValueError(
+                f"Feature store {self.directory} has a different schema"
+            )
+        # Columns added since the store was created start zero filled for
+        # the rows already stored.
+        rows = complete_rows(self.directory, schema)
+        for name, dtype in columns.items():
+            if name not in schema:
+                with open(column_path(self.directory, name), "wb") as f:
+                    f.truncate(rows * np.dtype(dtype).itemsize)
+        with open(path, "w") as f:
+            json.dump(columns, f)
+
+    def _repair(self) -> int:
+        rows = complete_rows(self.directory)
+        for name, dtype in columns.items():
+            path = column_path(self.directory, name)
+            if os.path.exists(path):
+                os.truncate(path, rows * np.dtype(dtype).itemsize)
+        return rows
+
+    def __len__(self) -> int:
+        return self.rows
+
+    def append(self, rows: Iterable[dict[str, Any]]) -> int:
+        rows = list(rows)
+        if not rows:
+            return 0
+        with self.lock:
+            for name, dtype in columns.items():
+                values = np.array([row[name] for row in rows], dtype=dtype)
+                self.files[name].write(values.tobytes())
+                self.files[name].flush()
+            self.rows += len(rows)
+        return len(rows)
+
+    def append_scan(
+        self, scan: PoolScan, scanned_ts: float | None = None
+    ) -> None:
+        if scanned_ts is None:
+            scanned_ts = time.time()
+        self.append([scan_features(scan, scanned_ts)])
+
+    def close(self) -> None:
+        with self.lock:
+            for file in self.files.values():
+                file.close()
+
+
+def load_features(
+    directory: str = "features", names: Iterable[str] | None = None
+) -> dict[str, np.ndarray]:
+    rows = complete_rows(directory)
+    result = {}
+    for name in columns if names is None else names:
+        if rows == 0:
+            result[name] = np.empty(0, dtype=columns[name])
+        else:
+            result[name] = np.memmap(
+                column_path(directory, name),
+                dtype=columns[name],
+                mode="r",
+                shape=(rows,),
+            )
+    return result
@@ -1,38 +1,34 @@
-import csv
-import os
+import asyncio
+import json
 import logging
 import argparse
-from datetime import datetime, timedelta, UTC, timezone
+import time
+from typing import AsyncIterator
 
+import httpx
 from aiogram import Bot
+from aiogram.types import MessageEntity
 from aiogram.utils.formatting import Code, Text
 from tqdm import tqdm
 
-from classes import Ton
-from models import JettonMaster, LiquidityState, TokenReport
+from classes import AsyncTon, gather_or_cancel
+from clients import ApiError
+from features import FeatureStore
+from storage import ScanStore
+from work_queue import Job, WorkQueue
+from models import (
+    JettonMaster,
+    JettonSnapshot,
+    LiquidityState,
+    PoolWatermark,
+    TokenReport,
+    PoolScan,
+    ScanStats,
+)
 
 logger = logging.getLogger(__name__)
 
 
-def read_csv(file_path) -> list[list[str]]:
-    data = []
-    if os.path.exists(file_path):
-        with open(file_path, mode="r", newline="") as file:
-            reader = csv.reader(file)
-            data = list(reader)
-    else:
-        with open(file_path, mode="w", newline="") as file:
-            writer = csv.writer(file)
-            writer.writerows(data)
-    return data
-
-
-def append_csv(file_path, data: list[list[str | int]]):
-    with open(file_path, mode="w", newline="") as file:
-        writer = csv.writer(file)
-        writer.writerows(data)
-
-
 def build_cli_jetton_info(
     jetton_master: JettonMaster,
     pools_masters: list[JettonMaster],
@@ -67,12 +63,14 @@ def build_cli_jetton_info(
         print(pool_master.build_top_ten_message())
 
 
-def get_jetton_info(ton: Ton, jetton_master_address_b64: str):
-    jetton_master = ton.get_jetton_master(jetton_master_address_b64)
-    pools_masters = ton.get_jetton_pools(jetton_master_address_b64)
+async def get_jetton_info(ton: AsyncTon, jetton_master_address_b64: str):
+    jetton_master, pools_masters = await gather_or_cancel(
+        ton.get_jetton_master(jetton_master_address_b64),
+        ton.get_jetton_pools(jetton_master_address_b64),
+    )
 
     # Processing airdrops
-    airdrop_receivers, airdrop_sum = ton.process_airdrops(jetton_master)
+    airdrop_receivers, airdrop_sum = await ton.process_airdrops(jetton_master)
     total_airdrop = round(
         airdrop_sum / jetton_master.data.total_supply * 100,
         2,
@@ -114,107 +112,459 @@ def build_telegram_jetton_message(
     return Text(*message).as_kwargs()
 
 
-def is_token_to_process(
-    token_address: str, scanned_tokens: list[list[str | int]]
+def load_snapshot(
+    store: ScanStore | None, token_address: str
+) -> JettonSnapshot | None:
+    if store is None:
+        return None
+    try:
+        return store.load_snapshot(token_address)
+    except Exception as e:
+        # A snapshot that no longer loads is a cache miss, the token gets
+        # a full scan and the row is replaced by its result.
+        logger.warning(f"Dropping snapshot of {token_address}: {e}")
+        store.delete_snapshot(token_address)
+        return None
+
+
+async def evaluate_pool(
+    ton: AsyncTon,
+    created_at: str,
+    pool_address: str,
+    token_address: str,
+    store: ScanStore | None = None,
+    full_history: bool = False,
+) -> PoolScan:
+    scan = PoolScan(
+        created_at=created_at,
+        pool_address=pool_address,
+        token_address=token_address,
+    )
+    start = time.perf_counter()
+    try:
+        # Scheduled scans only report well rated tokens, so the history
+        # is not read further once the airdrop alone fails the rating.
+        # Scans kept as backtest features need the full airdrop total.
+        stop_percent = (
+            None if full_history else ton.rating_engine.stop_airdrop_percent()
+        )
+        snapshot = load_snapshot(store, token_address)
+        if (
+            snapshot is not None
+            and snapshot.pool_address == pool_address
+            and not (full_history and snapshot.airdrop_stopped)
+        ):
+            # Rescan inside the window: only what changed since the last
+            # scan is fetched and applied to the stored analysis.
+            jetton_master, liquidity_master, aggregator = (
+                await ton.rescan_pool(snapshot, stop_percent=stop_percent)
+            )
+            scan.incremental = True
+        else:
+            jetton_master, liquidity_master = await gather_or_cancel(
+                ton.get_jetton_master(token_address),
+                ton.get_jetton_master(pool_address, type="pool"),
+            )
+            aggregator = await ton.scan_airdrops(
+                jetton_master, stop_percent=stop_percent
+            )
+        scan.snapshot = JettonSnapshot(
+            pool_address=pool_address,
+            jetton_master=jetton_master,
+            liquidity_master=liquidity_master,
+            airdrop_receivers=aggregator.receivers,
+            history_lt=aggregator.newest_lt,
+            airdrop_stopped=aggregator.stopped,
+        )
+        airdrop_receivers, _ = aggregator.result()
+        scan.total_airdrop_percent = aggregator.percent()
+        scan.airdrop_stopped = aggregator.stopped
+        scan.features = ton.jetton_features(
+            jetton_master, liquidity_master, scan.total_airdrop_percent
+        )
+        scan.rating = ton.rating_engine.score_one(scan.features)
+        scan.jetton_master = jetton_master
+        scan.liquidity_master = liquidity_master
+        scan.airdrop_receivers = airdrop_receivers
+    except Exception as e:
+        scan.error = str(e)
+        scan.retryable = isinstance(e, httpx.TransportError) or (
+            isinstance(e, ApiError) and e.retryable
+        )
+    scan.duration = time.perf_counter() - start
+    return scan
+
+
+def build_scan_message(ton: AsyncTon, scan: PoolScan) -> dict:
+    return build_telegram_jetton_message(
+        scan.jetton_master,
+        ton.check_liquidity_state(scan.liquidity_master),
+        scan.liquidity_master.account.address_b64,
+        airdrop_receivers=scan.airdrop_receivers,
+        total_airdrop_percent=scan.total_airdrop_percent,
+    )
+
+
+async def report_pool(
+    ton: AsyncTon,
+    bot: Bot,
+    chat_id: str,
+    scan: PoolScan,
+    report: TokenReport,
+):
+    if report == TokenReport.ConsolePrint:
+        build_cli_jetton_info(
+            scan.jetton_master,
+            [scan.liquidity_master],
+            airdrop_receivers=scan.airdrop_receivers,
+            total_airdrop=scan.total_airdrop_percent,
+        )
+    elif report == TokenReport.TelegramMessage:
+        logger.info(f"Sending message for pool {scan.pool_address}")
+        await bot.send_message(chat_id, **build_scan_message(ton, scan))
+
+
+async def iter_pools_to_scan(
+    ton: AsyncTon,
+    pages: int,
+    store: ScanStore,
+    watermark: PoolWatermark,
+    stats: ScanStats,
+    rescan_tokens: set[str] | None = None,
+) -> AsyncIterator[tuple[str, str, str]]:
+    discovered_tokens: set[str] = set()
+    rejected: list[tuple[str, str, str]] = []
+    async for pool in ton.iter_new_pools(pages, watermark, rejected=rejected):
+        stats.discovered += 1
+        discovered_tokens.add(pool[2])
+        if store.is_token_to_process(pool[2]):
+            yield pool
+        else:
+            stats.skipped += 1
+    logger.info(f"Found {stats.discovered} new pools")
+    # The watermark is past prefiltered pools, their fdv and reserve are
+    # checked again every recheck interval until they pass or leave the
+    # rescan window.
+    candidates = store.due_candidates() if rescan_tokens is None else []
+    store.add_candidates(rejected)
+    passing = []
+    if candidates:
+        try:
+            passing = await ton.recheck_pools(candidates)
+        except Exception as e:
+            logger.warning(f"Error checking prefiltered pools again: {e}")
+    for pool in passing:
+        if pool[2] not in discovered_tokens and store.is_token_to_process(
+            pool[2]
+        ):
+            stats.candidates += 1
+            discovered_tokens.add(pool[2])
+            yield pool
+    # Pools below the watermark are no longer paged through, rescans of
+    # recent not good tokens come from the store instead. Event driven
+    # cycles rescan only tokens with new activity.
+    for pool in store.pending_rescans():
+        if rescan_tokens is not None and pool[2] not in rescan_tokens:
+            continue
+        if pool[2] not in discovered_tokens:
+            stats.rescans += 1
+            yield pool
+
+
+def record_scan(
+    ton: AsyncTon,
+    stats: ScanStats,
+    scan: PoolScan,
+    features: FeatureStore | None = None,
 ) -> bool:
-    clone_tokens = [token[:] for token in scanned_tokens]
-    for token in clone_tokens:
-        if token[2] == token_address:
-            created_at, _, token_address, is_good = token
-            created_at_dt = datetime.strptime(
-                created_at, "%Y-%m-%dT%H:%M:%SZ"
-            ).replace(tzinfo=timezone.utc)
-            if int(is_good) == 1 or created_at_dt < datetime.now(
-                UTC
-            ) - timedelta(hours=2):
-                return False
-            else:
-                scanned_tokens.remove(token)
-                return True
-    return True
+    # Counts and logs a finished scan, True when the token should be
+    # reported.
+    stats.durations.append(scan.duration)
+    if scan.error is not None and scan.retryable:
+        # Throttled or failed upstream, stored as not good so the next
+        # cycle rescans the token.
+        stats.deferred += 1
+        logger.warning(f"Deferring pool {scan.pool_address}: {scan.error}")
+        return False
+    if scan.error is not None:
+        stats.analysis_errors += 1
+        logger.error(
+            f"Error processing pool {scan.pool_address}: {scan.error}"
+        )
+        return False
+    stats.analysed += 1
+    stats.incremental += scan.incremental
+    if features is not None:
+        features.append_scan(scan)
+    if ton.rating_engine.passes(scan.rating):
+        stats.good += 1
+        return True
+    return False
+
+
+def store_scan(store: ScanStore, scan: PoolScan, is_good: int) -> None:
+    store.upsert(
+        scan.created_at, scan.pool_address, scan.token_address, is_good
+    )
+    if is_good or (scan.error is not None and not scan.retryable):
+        store.delete_snapshot(scan.token_address)
+    elif scan.snapshot is not None:
+        store.save_snapshot(scan.token_address, scan.created_at, scan.snapshot)
 
 
 async def process_new_pools(
-    ton: Ton,
+    ton: AsyncTon,
     bot: Bot,
     chat_id: str,
     pages: int,
+    store: ScanStore,
     report: TokenReport = TokenReport.ConsolePrint,
-) -> str:
-    logger.info(f"Processing {pages} pages of new pools")
-    addresses = ton.get_new_pools_and_tokens_addresses(pages)
-    logger.info(f"Found {len(addresses)} new pools")
-    scanned_tokens = read_csv("scanned_tokens.csv")
-    logger.info("Processing pools")
-    pbar = tqdm(addresses)
-    for created_at, pool_address, token_address in addresses:
+    workers: int = 1,
+    features: FeatureStore | None = None,
+    rescan_tokens: set[str] | None = None,
+) -> ScanStats:
+    logger.info(f"Processing up to {pages} pages of new pools")
+    logger.info(f"Expired {store.expire()} snapshots and candidates")
+    watermark = store.load_watermark()
+    stats = ScanStats()
+
+    # Workers resolve the futures in any order, the sink below awaits them
+    # in discovery order so stored rows and alerts keep the pool ordering.
+    queue: asyncio.Queue[tuple[asyncio.Future, tuple[str, str, str]]] = (
+        asyncio.Queue()
+    )
+    results: asyncio.Queue[asyncio.Future[PoolScan] | None] = asyncio.Queue()
+    loop = asyncio.get_running_loop()
+    pbar = tqdm(total=0)
+
+    async def discover():
+        # Pools are queued as pages arrive, so analysis starts before the
+        # last page is fetched.
         try:
+            async for pool in iter_pools_to_scan(
+                ton, pages, store, watermark, stats, rescan_tokens
+            ):
+                pbar.total += 1
+                pbar.refresh()
+                future = loop.create_future()
+                results.put_nowait(future)
+                queue.put_nowait((future, pool))
+                stats.queued += 1
+            logger.info(
+                f"Processing {stats.queued} pools with {workers} workers"
+            )
+        finally:
+            results.put_nowait(None)
+
+    async def worker():
+        while True:
+            future, pool = await queue.get()
+            scan = await evaluate_pool(
+                ton, *pool, store, full_history=features is not None
+            )
+            if not future.done():
+                future.set_result(scan)
+            queue.task_done()
+
+    tasks = [asyncio.create_task(worker()) for _ in range(max(workers, 1))]
+    discovery = asyncio.create_task(discover())
+    reported_tokens: set[str] = set()
+    try:
+        while (future := await results.get()) is not None:
+            scan = await future
             is_good: int = 0
             pbar.set_description(
-                f"Processing pool {pool_address} with token {token_address}"
+                f"Processed pool {scan.pool_address} with token {scan.token_address}"
             )
-            if not is_token_to_process(token_address, scanned_tokens):
-                pbar.update(1)
-                continue
-
-            try:
-                jetton_master = ton.get_jetton_master(token_address)
-                liquidity_master = ton.get_jetton_master(
-                    pool_address, type="pool"
-                )
-                airdrop_receivers, airdrop_sum = ton.process_airdrops(
-                    jetton_master
-                )
-                total_airdrop_percent = round(
-                    airdrop_sum / jetton_master.data.total_supply * 100,
-                    2,
-                )
-                rating = ton.rate_jetton(
-                    jetton_master, liquidity_master, total_airdrop_percent
-                )
-                if rating >= 4:
-                    if report == TokenReport.ConsolePrint:
-                        build_cli_jetton_info(
-                            jetton_master,
-                            [liquidity_master],
-                            airdrop_receivers=airdrop_receivers,
-                            total_airdrop=total_airdrop_percent,
-                        )
-                    elif report == TokenReport.TelegramMessage:
-                        liquidity_state = ton.check_liquidity_state(
-                            liquidity_master
-                        )
-                        logger.info(f"Sending message for pool {pool_address}")
-                        liquidity_state = ton.check_liquidity_state(
-                            liquidity_master
-                        )
-
-                        await bot.send_message(
-                            chat_id,
-                            **build_telegram_jetton_message(
-                                jetton_master,
-                                liquidity_state,
-                                liquidity_master.account.address_b64,
-                                airdrop_receivers=airdrop_receivers,
-                                total_airdrop_percent=total_airdrop_percent,
-                            ),
-                        )
+            if record_scan(ton, stats, scan, features):
+                try:
+                    if scan.token_address not in reported_tokens:
+                        await report_pool(ton, bot, chat_id, scan, report)
+                        reported_tokens.add(scan.token_address)
+                        stats.reported += 1
                     is_good = 1
-                del jetton_master, liquidity_master
+                except Exception as e:
+                    stats.report_errors += 1
+                    logger.error(
+                        f"Error reporting pool {scan.pool_address}: {e}"
+                    )
+            store_scan(store, scan, is_good)
+            pbar.update(1)
+        await discovery
+    finally:
+        discovery.cancel()
+        for task in tasks:
+            task.cancel()
+        pbar.close()
+    store.save_watermark(watermark)
+    logger.info(f"Finished processing pools: {stats}")
+    if ton.tv_client.cache is not None:
+        logger.info(f"Response cache: {ton.tv_client.cache.stats()}")
+    return stats
+
+
+def encode_message(kwargs: dict) -> str:
+    # Message kwargs as stored in the work queue outbox.
+    return json.dumps(
+        {
+            **kwargs,
+            "entities": [
+                entity.model_dump(exclude_none=True)
+                for entity in kwargs.get("entities") or []
+            ],
+        }
+    )
+
+
+def decode_message(message: str) -> dict:
+    kwargs = json.loads(message)
+    kwargs["entities"] = [
+        MessageEntity.model_validate(entity) for entity in kwargs["entities"]
+    ]
+    return kwargs
+
+
+async def distribute_new_pools(
+    ton: AsyncTon,
+    pages: int,
+    store: ScanStore,
+    queue: WorkQueue,
+    rescan_tokens: set[str] | None = None,
+) -> ScanStats:
+    # Coordinator side of a sharded scan: discovered pools become jobs for
+    # the worker processes, results are applied by apply_results.
+    logger.info(f"Distributing up to {pages} pages of new pools")
+    logger.info(f"Expired {store.expire()} snapshots and candidates")
+    logger.info(f"Purged {queue.purge()} finished jobs")
+    watermark = store.load_watermark()
+    stats = ScanStats()
+    pools = [
+        pool
+        async for pool in iter_pools_to_scan(
+            ton, pages, store, watermark, stats, rescan_tokens
+        )
+    ]
+    # Tokens with a job waiting or running are not queued twice.
+    stats.queued = queue.enqueue(pools)
+    store.save_watermark(watermark)
+    logger.info(
+        f"Queued {stats.queued} of {len(pools)} pools: {queue.counts()}"
+    )
+    return stats
+
+
+async def apply_results(
+    ton: AsyncTon,
+    store: ScanStore,
+    queue: WorkQueue,
+    features: FeatureStore | None = None,
+) -> ScanStats:
+    stats = ScanStats()
+    for job, result in queue.finished():
+        scan = PoolScan.model_validate_json(result)
+        is_good = record_scan(ton, stats, scan, features)
+        message = (
+            encode_message(build_scan_message(ton, scan)) if is_good else None
+        )
+        # Store writes are idempotent, a crash before the job is marked
+        # applied only repeats them.
+        store_scan(store, scan, int(is_good))
+        if queue.apply(job.id, message):
+            stats.reported += message is not None
+    # The watermark is past pools whose jobs were given up, they go back
+    # to the candidates checked again every cycle inside the rescan
+    # window. A crash before removing the jobs only adds them again.
+    if failed := queue.failed():
+        logger.warning(
+            f"Scanning failed {queue.max_attempts} times for pools "
+            f"{', '.join(job.pool_address for job in failed)}, "
+            "checking them again as candidates"
+        )
+        store.add_candidates(
+            [
+                (job.created_at, job.pool_address, job.token_address)
+                for job in failed
+            ]
+        )
+        queue.remove([job.id for job in failed])
+        stats.analysis_errors += len(failed)
+    return stats
+
+
+async def send_messages(bot: Bot, chat_id: str, queue: WorkQueue) -> int:
+    # The only Telegram sender of a sharded scan. A crash between sending
+    # and marking a message sends it again on restart.
+    sent = 0
+    for message_id, message in queue.pending_messages():
+        await bot.send_message(chat_id, **decode_message(message))
+        queue.mark_sent(message_id)
+        sent += 1
+    return sent
 
-            except Exception as e:
-                logger.error(f"Error processing pool {pool_address}: {e}")
 
-            scanned_tokens.append(
-                [created_at, pool_address, token_address, is_good]
+async def run_worker(
+    ton: AsyncTon,
+    store: ScanStore,
+    queue: WorkQueue,
+    name: str,
+    concurrency: int = 4,
+    poll_interval: float = 1.0,
+    full_history: bool = False,
+) -> None:
+    # Worker side of a sharded scan, claims pool jobs and writes the scans
+    # back. The lease is renewed while a pool is analysed, so only jobs of
+    # a dead worker are claimed again.
+    async def renew(job: Job, owner: str):
+        while True:
+            await asyncio.sleep(queue.lease_seconds / 3)
+            if not queue.renew(job.id, owner):
+                return
+
+    async def scan_job(job: Job, owner: str) -> PoolScan:
+        renewal = asyncio.create_task(renew(job, owner))
+        try:
+            return await evaluate_pool(
+                ton,
+                job.created_at,
+                job.pool_address,
+                job.token_address,
+                store,
+                full_history,
             )
-            pbar.update(1)
-        except KeyboardInterrupt:
-            break
-    pbar.close()
-    logger.info("Saving scanned tokens")
-    append_csv("scanned_tokens.csv", scanned_tokens)
-    logger.info("Finished processing pools")
+        except asyncio.CancelledError:
+            # Shutdown, the job goes back to the queue for another worker.
+            queue.release(job.id, owner)
+            raise
+        except Exception as e:
+            # Completed as a failed analysis, a job that raises would
+            # otherwise take the worker down on every claim.
+            return PoolScan(
+                created_at=job.created_at,
+                pool_address=job.pool_address,
+                token_address=job.token_address,
+                error=str(e),
+            )
+        finally:
+            renewal.cancel()
+
+    async def claim_loop(slot: int):
+        owner = f"{name}/{slot}"
+        while True:
+            job = queue.claim(owner)
+            if job is None:
+                await asyncio.sleep(poll_interval)
+                continue
+            logger.info(
+                f"Scanning pool {job.pool_address} "
+                f"(job {job.id}, attempt {job.attempts})"
+            )
+            scan = await scan_job(job, owner)
+            if not queue.complete(job.id, owner, scan.model_dump_json()):
+                logger.warning(f"Lost the lease of job {job.id}")
+
+    await asyncio.gather(
+        *(claim_loop(slot) for slot in range(max(concurrency, 1)))
+    )
 
 
 def collect_arguments():
@@ -228,6 +578,24 @@ def collect_arguments():
     parser.add_argument(
         "--schedule", type=int, help="Number of minutes to wait between scans"
     )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Scan on TonAPI transaction stream events, --schedule minutes "
+        "(10 by default) is the polling fallback",
+    )
+    parser.add_argument(
+        "--workers",
+        default=4,
+        type=int,
+        help="Number of pools analysed concurrently during a scan",
+    )
+    parser.add_argument(
+        "--shards",
+        type=int,
+        help="Number of worker processes scanning pools from the shared "
+        "work queue, each analysing --workers pools concurrently",
+    )
 
     group = parser.add_mutually_exclusive_group(required=True)
     group.add_argument(
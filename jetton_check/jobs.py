@@ -0,0 +1,85 @@
+import asyncio
+import concurrent.futures
+import logging
+import threading
+from typing import Any, Awaitable, Callable, Generic, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+# Runs coroutine jobs on their own event loop thread. The context (an
+# AsyncTon) is built inside that loop so its HTTP clients never run on the
+# bot's loop, and at most `workers` jobs run at once.
+class JobQueue(Generic[T]):
+    def __init__(
+        self,
+        build_context: Callable[[], T],
+        workers: int = 1,
+        name: str = "jobs",
+    ):
+        self.build_context = build_context
+        self.workers = workers
+        self.name = name
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(
+            target=self._run, name=name, daemon=True
+        )
+        self.ready = threading.Event()
+        self.context: T | None = None
+        self.semaphore: asyncio.Semaphore | None = None
+
+    def _run(self) -> None:
+        asyncio.set_event_loop(self.loop)
+        self.context = self.build_context()
+        self.semaphore = asyncio.Semaphore(self.workers)
+        self.ready.set()
+        self.loop.run_forever()
+
+    def start(self) -> "JobQueue[T]":
+        self.thread.start()
+        self.ready.wait()
+        logger.info(f"Started {self.name} queue with {self.workers} workers")
+        return self
+
+    async def _execute(
+        self, job: Callable[..., Awaitable[Any]], args, kwargs
+    ) -> Any:
+        async with self.semaphore:
+            return await job(self.context, *args, **kwargs)
+
+    def submit(
+        self, job: Callable[..., Awaitable[Any]], *args, **kwargs
+    ) -> concurrent.futures.Future:
+        return asyncio.run_coroutine_threadsafe(
+            self._execute(job, args, kwargs), self.loop
+        )
+
+    async def run(
+        self, job: Callable[..., Awaitable[Any]], *args, **kwargs
+    ) -> Any:
+        return await asyncio.wrap_future(self.submit(job, *args, **kwargs))
+
+    def stop(
+        self, close: Callable[[T], Awaitable[None]] | None = None
+    ) -> None:
+        if close is not None and self.context is not None:
+            asyncio.run_coroutine_threadsafe(
+                close(self.context), self.loop
+            ).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+
+
+# Jobs send Telegram messages through the loop that owns the bot session.
+class BotProxy:
+    def __init__(self, bot, loop: asyncio.AbstractEventLoop):
+        self.bot = bot
+        self.loop = loop
+
+    async def send_message(self, *args, **kwargs):
+        future = asyncio.run_coroutine_threadsafe(
+            self.bot.send_message(*args, **kwargs), self.loop
+        )
+        return await asyncio.wrap_future(future)
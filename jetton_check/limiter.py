@@ -0,0 +1,109 @@
+import asyncio
+import threading
+import time
+
+
+class TokenBucket:
+    def __init__(
+        self,
+        rate: float,
+        capacity: float | None = None,
+        max_rate: float | None = None,
+        min_rate: float | None = None,
+        increase: float = 0.5,
+        decrease: float = 0.5,
+    ):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(rate, 1.0)
+        self.max_rate = max(max_rate or rate, rate)
+        self.min_rate = min(min_rate or rate / 10, rate)
+        self.increase = increase
+        self.decrease = decrease
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self.throttled_until = 0.0
+        self.pauses = 0
+        self.lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        elapsed = now - self.updated_at
+        self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+        self.updated_at = now
+
+    def reserve(self, tokens: float = 1.0) -> float:
+        with self.lock:
+            self._refill(time.monotonic())
+            self.tokens -= tokens
+            if self.tokens >= 0:
+                return 0.0
+            return -self.tokens / self.rate
+
+    def try_acquire(self, tokens: float = 1.0) -> bool:
+        with self.lock:
+            self._refill(time.monotonic())
+            if self.tokens < tokens:
+                return False
+            self.tokens -= tokens
+            return True
+
+    def retry_after(self, tokens: float = 1.0) -> float:
+        with self.lock:
+            self._refill(time.monotonic())
+            return max(tokens - self.tokens, 0.0) / self.rate
+
+    def on_success(self) -> None:
+        with self.lock:
+            # Additive increase: roughly +increase req/s per second of
+            # successful requests, capped at max_rate.
+            self.rate = min(
+                self.max_rate, self.rate + self.increase / self.rate
+            )
+
+    def on_throttle(self, retry_after: float | None = None) -> None:
+        with self.lock:
+            now = time.monotonic()
+            self._refill(now)
+            # Requests already in flight get throttled too, only back off
+            # once per throttling window.
+            if now >= self.throttled_until:
+                self.rate = max(self.min_rate, self.rate * self.decrease)
+                self.throttled_until = now + max(retry_after or 0, 1.0)
+        if retry_after:
+            self.pause(retry_after)
+
+    def pause(self, seconds: float) -> None:
+        # Puts the bucket in debt so every caller of this host waits until
+        # the server accepts requests again. Callers already sleeping on an
+        # older reservation reserve again, so their debt is dropped here.
+        with self.lock:
+            self._refill(time.monotonic())
+            self.tokens = -seconds * self.rate
+            self.pauses += 1
+
+    async def acquire(self, tokens: float = 1.0) -> float:
+        waited = 0.0
+        while True:
+            pauses = self.pauses
+            delay = self.reserve(tokens)
+            if delay <= 0:
+                return waited
+            await asyncio.sleep(delay)
+            waited += delay
+            if self.pauses == pauses:
+                return waited
+
+
+_buckets: dict[str, TokenBucket] = {}
+_buckets_lock = threading.Lock()
+
+
+def get_bucket(
+    host: str,
+    rate: float,
+    capacity: float | None = None,
+    max_rate: float | None = None,
+) -> TokenBucket:
+    with _buckets_lock:
+        if host not in _buckets:
+            _buckets[host] = TokenBucket(rate, capacity, max_rate)
+        return _buckets[host]
@@ -1,9 +1,10 @@
 #!/usr/bin/env python3
 
 import os
-import re
 import logging
 import asyncio
+import subprocess
+import sys
 
 from aiogram import Bot, Dispatcher
 from aiogram.client.default import DefaultBotProperties
@@ -14,25 +15,78 @@ from aiogram.types import Message
 
 from dotenv import load_dotenv
 
-from clients import TonViewerClient, GeckoTerminalClient
-from classes import Ton
+from address import is_valid_address, to_bounceable
+from cache import ResponseCache
+from clients import AsyncTonViewerClient, AsyncGeckoTerminalClient
+from classes import AsyncTon
+from rating import RatingEngine, load_rule_set
+from recording import Recorder
+from report_cache import ReportCache, report_size, with_age
+from singleflight import SingleFlight
+from storage import ScanStore
+from streaming import (
+    DEX_ACCOUNTS,
+    StreamScanner,
+    TransactionStream,
+    watched_accounts,
+)
+from features import FeatureStore
 from functions import (
+    apply_results,
     collect_arguments,
+    distribute_new_pools,
     get_jetton_info,
     process_new_pools,
+    send_messages,
     build_cli_jetton_info,
     build_telegram_jetton_message,
 )
+from jobs import BotProxy, JobQueue
+from metrics import serve_metrics
 from models import TokenReport
+from work_queue import WorkQueue
 
 
 load_dotenv()
 
 TELEGRAM_BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
-TON_VIEWER_API_KEY = os.getenv("TON_VIEWER_API_KEY")
+TON_VIEWER_API_KEY = os.getenv(
+    "TON_VIEWER_API_KEY",
+    "AEY3CRGXLSSUGQIAAAAEFEU3GVXEWZFOORXSKXOIJKOYAJ5IGM2GCSLWPFBORPY26WM5DUI",
+)
 TELEGRAM_CHAT_ID = os.getenv("TELEGRAM_CHAT_ID")
-
-address_regex = r"^[EU]Q[A-Za-z0-9_-]{46}$"
+TON_VIEWER_RPS = float(os.getenv("TON_VIEWER_RPS", 1))
+GECKO_TERMINAL_RPS = float(os.getenv("GECKO_TERMINAL_RPS", 0.5))
+TON_VIEWER_MAX_RPS = float(os.getenv("TON_VIEWER_MAX_RPS", TON_VIEWER_RPS))
+GECKO_TERMINAL_MAX_RPS = float(
+    os.getenv("GECKO_TERMINAL_MAX_RPS", GECKO_TERMINAL_RPS)
+)
+RESPONSE_CACHE_PATH = os.getenv("RESPONSE_CACHE_PATH")
+SCAN_STORE_PATH = os.getenv("SCAN_STORE_PATH", "scanned_tokens.db")
+SCANNED_TOKENS_CSV = os.getenv("SCANNED_TOKENS_CSV", "scanned_tokens.csv")
+RECORD_FIXTURES_DIR = os.getenv("RECORD_FIXTURES_DIR")
+TON_VIEWER_URL = os.getenv("TON_VIEWER_URL", "https://tonapi.io/v2")
+GECKO_TERMINAL_URL = os.getenv(
+    "GECKO_TERMINAL_URL", "https://api.geckoterminal.com/api/v2"
+)
+METRICS_PORT = os.getenv("METRICS_PORT")
+CHAT_WORKERS = int(os.getenv("CHAT_WORKERS", 4))
+ANALYSIS_TTL = float(os.getenv("ANALYSIS_TTL", 30))
+REPORT_CACHE_MB = float(os.getenv("REPORT_CACHE_MB", 64))
+REPORT_STALE_SECONDS = float(os.getenv("REPORT_STALE_SECONDS", 300))
+REPORT_MAX_AGE_SECONDS = float(os.getenv("REPORT_MAX_AGE_SECONDS", 3600))
+RATING_RULES_PATH = os.getenv("RATING_RULES_PATH")
+# Holders are read largest first until the top 10 cannot change, a
+# positive value caps how many are read.
+MAX_HOLDERS = int(os.getenv("MAX_HOLDERS", 0))
+FEATURE_STORE_DIR = os.getenv("FEATURE_STORE_DIR", "features")
+STREAM_ACCOUNTS = os.getenv("STREAM_ACCOUNTS")
+TON_VIEWER_STREAM_URL = os.getenv("TON_VIEWER_STREAM_URL", TON_VIEWER_URL)
+# Comma separated, worker processes take the keys in turn.
+TON_VIEWER_API_KEYS = os.getenv("TON_VIEWER_API_KEYS")
+WORK_QUEUE_PATH = os.getenv("WORK_QUEUE_PATH", "work_queue.db")
+WORK_LEASE_SECONDS = float(os.getenv("WORK_LEASE_SECONDS", 120))
+WORKER_PATH = os.path.join(os.path.dirname(__file__), "worker.py")
 
 logging.basicConfig(
     level=logging.INFO,
@@ -47,12 +101,57 @@ bot = Bot(
     default=DefaultBotProperties(parse_mode=ParseMode.HTML),
 )
 
-tv_client = TonViewerClient(
-    "https://tonapi.io/v2",
-    auth="AEY3CRGXLSSUGQIAAAAEFEU3GVXEWZFOORXSKXOIJKOYAJ5IGM2GCSLWPFBORPY26WM5DUI",
+response_cache = ResponseCache(path=RESPONSE_CACHE_PATH)
+recorder = Recorder(RECORD_FIXTURES_DIR) if RECORD_FIXTURES_DIR else None
+analysis_flights = SingleFlight(ttl=ANALYSIS_TTL)
+rating_engine = (
+    RatingEngine(load_rule_set(RATING_RULES_PATH))
+    if RATING_RULES_PATH
+    else RatingEngine()
+)
+report_cache = ReportCache(
+    max_bytes=int(REPORT_CACHE_MB * 1024 * 1024),
+    stale_after=REPORT_STALE_SECONDS,
+    max_age=REPORT_MAX_AGE_SECONDS,
 )
-gt_client = GeckoTerminalClient("https://api.geckoterminal.com/api/v2")
-ton = Ton(tv_client, gt_client)
+
+
+# Processes sharing the TonAPI key, set in main once worker shards are
+# started with it.
+ton_viewer_sharing = 1
+
+
+def build_ton() -> AsyncTon:
+    tv_client = AsyncTonViewerClient(
+        TON_VIEWER_URL,
+        auth=TON_VIEWER_API_KEY,
+        rate_limit=TON_VIEWER_RPS / ton_viewer_sharing,
+        max_rate=TON_VIEWER_MAX_RPS / ton_viewer_sharing,
+        cache=response_cache,
+        recorder=recorder,
+    )
+    gt_client = AsyncGeckoTerminalClient(
+        GECKO_TERMINAL_URL,
+        rate_limit=GECKO_TERMINAL_RPS,
+        max_rate=GECKO_TERMINAL_MAX_RPS,
+        cache=response_cache,
+        recorder=recorder,
+    )
+    return AsyncTon(
+        tv_client,
+        gt_client,
+        max_holders=MAX_HOLDERS or None,
+        flights=analysis_flights,
+        rating_engine=rating_engine,
+    )
+
+
+# Chat lookups and scheduled scans each get their own loop thread, so
+# neither blocks the bot nor waits behind the other.
+chat_jobs = JobQueue(build_ton, workers=CHAT_WORKERS, name="chat")
+scan_jobs = JobQueue(build_ton, workers=1, name="scan")
+scan_store = ScanStore(SCAN_STORE_PATH)
+feature_store = FeatureStore(FEATURE_STORE_DIR) if FEATURE_STORE_DIR else None
 # telegram_client = TelegramBotClient(TELEGRAM_BOT_TOKEN)
 
 
@@ -61,59 +160,212 @@ async def command_start_handler(message: Message) -> None:
     await message.answer("Hello, add me to your chat!")
 
 
+async def analyse_token(ton: AsyncTon, address: str):
+    (
+        jetton_master,
+        pools_masters,
+        airdrop_receivers,
+        total_airdrop,
+    ) = await get_jetton_info(ton, address)
+    liquidity_state = (
+        ton.check_liquidity_state(pools_masters[0]) if pools_masters else None
+    )
+    return (
+        jetton_master,
+        pools_masters,
+        airdrop_receivers,
+        total_airdrop,
+        liquidity_state,
+    )
+
+
+async def render_report(address: str) -> tuple[dict, tuple, int]:
+    snapshot = await chat_jobs.run(analyse_token, address)
+    (
+        jetton_master,
+        pools_masters,
+        airdrop_receivers,
+        total_airdrop,
+        liquidity_state,
+    ) = snapshot
+    if not pools_masters:
+        text = {"text": f"No liquidity pools found for token {address}"}
+    else:
+        text = build_telegram_jetton_message(
+            jetton_master,
+            liquidity_state,
+            pools_masters[0].account.address_b64,
+            airdrop_receivers=airdrop_receivers,
+            total_airdrop_percent=total_airdrop,
+        )
+    return text, snapshot, await asyncio.to_thread(report_size, text, snapshot)
+
+
 @dp.message()
 async def token_handler(message: Message) -> None:
     if not isinstance(message.text, str):
         return
 
-    addresses = re.findall(address_regex, message.text)
-    if not addresses:
+    if not is_valid_address(message.text):
         return
+    addresses = [to_bounceable(message.text)]
     logging.info(f"Got addresses to scan: {addresses}")
     for address in addresses:
-        try:
-            (
-                jetton_master,
-                pools_masters,
-                airdrop_receivers,
-                total_airdrop,
-            ) = get_jetton_info(ton, address)
-
-            if not pools_masters:
-                await message.answer(
-                    f"No liquidity pools found for token {address}"
+        if (report := report_cache.get(address)) is not None:
+            await message.answer(**with_age(report))
+            if report_cache.is_stale(report):
+                report_cache.refresh(
+                    address, lambda address=address: render_report(address)
                 )
-                return
+            continue
 
-            liquidity_state = ton.check_liquidity_state(pools_masters[0])
-            text = build_telegram_jetton_message(
-                jetton_master,
-                liquidity_state,
-                pools_masters[0].account.address_b64,
-                airdrop_receivers=airdrop_receivers,
-                total_airdrop_percent=total_airdrop,
-            )
-            await message.answer(**text)
+        reply = await message.answer(f"Scanning token {address}…")
+        try:
+            report = report_cache.set(address, *await render_report(address))
+            await reply.edit_text(**report.kwargs)
         except Exception as e:
             logging.error(f"Error while processing token {address}: {e}")
-            await message.answer(
+            await reply.edit_text(
                 f"Error while processing token {address}: {e}"
             )
 
 
-async def run_scheduler(ton, bot, chat_id, schedule_minutes, pages):
-    while True:
-        await process_new_pools(
-            ton, bot, chat_id, pages, TokenReport.TelegramMessage
+def build_run_cycle(
+    jobs, bot, chat_id, pages, workers, store, features, queue=None
+):
+    bot = BotProxy(bot, asyncio.get_running_loop())
+
+    async def run_cycle(rescan_tokens: set[str] | None = None):
+        if queue is not None:
+            return await jobs.run(
+                distribute_new_pools,
+                pages,
+                store,
+                queue,
+                rescan_tokens=rescan_tokens,
+            )
+        return await jobs.run(
+            process_new_pools,
+            bot,
+            chat_id,
+            pages,
+            store,
+            TokenReport.TelegramMessage,
+            workers=workers,
+            features=features,
+            rescan_tokens=rescan_tokens,
         )
+
+    return run_cycle
+
+
+async def run_scheduler(run_cycle, schedule_minutes):
+    while True:
+        try:
+            await run_cycle()
+        except Exception as e:
+            logging.error(f"Error while processing new pools: {e}")
         await asyncio.sleep(schedule_minutes * 60)
 
 
+async def run_stream_scanner(run_cycle, poll_minutes, store):
+    stream = TransactionStream(TON_VIEWER_STREAM_URL, auth=TON_VIEWER_API_KEY)
+    scanner = StreamScanner(
+        stream,
+        run_cycle,
+        lambda: watched_accounts(store),
+        dex_accounts=(
+            STREAM_ACCOUNTS.split(",") if STREAM_ACCOUNTS else DEX_ACCOUNTS
+        ),
+        poll_interval=poll_minutes * 60,
+    )
+    try:
+        await scanner.run()
+    finally:
+        await stream.aclose()
+
+
+def worker_keys() -> list[str]:
+    if TON_VIEWER_API_KEYS:
+        return TON_VIEWER_API_KEYS.split(",")
+    return [TON_VIEWER_API_KEY]
+
+
+def key_sharing(key: str, shards: int) -> int:
+    # Shards using the key, plus the coordinator's chat lookups and
+    # discovery when it uses the same key.
+    keys = worker_keys()
+    workers = sum(keys[shard % len(keys)] == key for shard in range(shards))
+    return workers + (key == TON_VIEWER_API_KEY)
+
+
+def start_worker(shard, shards, concurrency) -> subprocess.Popen:
+    keys = worker_keys()
+    key = keys[shard % len(keys)]
+    # Processes sharing a key split its rate.
+    sharing = key_sharing(key, shards)
+    env = {
+        **os.environ,
+        "TON_VIEWER_API_KEY": key,
+        "TON_VIEWER_RPS": str(TON_VIEWER_RPS / sharing),
+        "TON_VIEWER_MAX_RPS": str(TON_VIEWER_MAX_RPS / sharing),
+        "SCAN_STORE_PATH": SCAN_STORE_PATH,
+        "WORK_QUEUE_PATH": WORK_QUEUE_PATH,
+        "WORK_LEASE_SECONDS": str(WORK_LEASE_SECONDS),
+        "MAX_HOLDERS": str(MAX_HOLDERS),
+        "FULL_AIRDROP_HISTORY": str(int(feature_store is not None)),
+    }
+    return subprocess.Popen(
+        [
+            sys.executable,
+            WORKER_PATH,
+            "--name",
+            f"shard-{shard}",
+            "--concurrency",
+            str(concurrency),
+        ],
+        env=env,
+    )
+
+
+async def run_workers(shards, concurrency):
+    # A crashed worker is started again, the jobs it held are claimed
+    # again once their leases run out.
+    processes = [
+        start_worker(shard, shards, concurrency) for shard in range(shards)
+    ]
+    try:
+        while True:
+            await asyncio.sleep(5)
+            for shard, process in enumerate(processes):
+                if (code := process.poll()) is not None:
+                    logging.warning(
+                        f"Worker shard-{shard} exited with {code}, restarting"
+                    )
+                    processes[shard] = start_worker(shard, shards, concurrency)
+    finally:
+        for process in processes:
+            process.terminate()
+
+
+async def run_result_sender(jobs, bot, chat_id, queue, store, features):
+    # Scans finished by the workers are applied on the scan loop, their
+    # messages are sent from here only.
+    while True:
+        try:
+            await jobs.run(apply_results, store, queue, features)
+            await send_messages(bot, chat_id, queue)
+        except Exception as e:
+            logging.error(f"Error while applying scan results: {e}")
+        await asyncio.sleep(1)
+
+
 async def run_bot():
     await dp.start_polling(bot)
 
 
 async def main():
+    global ton_viewer_sharing
     cli_args = collect_arguments()
     if cli_args.info is not None:
         logging.info(f"Getting info for jetton {cli_args.info}")
@@ -122,7 +374,7 @@ async def main():
             pools_masters,
             airdrop_receivers,
             total_airdrop,
-        ) = get_jetton_info(ton, cli_args.info)
+        ) = await get_jetton_info(build_ton(), cli_args.info)
         print(
             build_cli_jetton_info(
                 jetton_master,
@@ -132,16 +384,60 @@ async def main():
             )
         )
     elif cli_args.new:
-        if cli_args.schedule:
-            asyncio.create_task(
-                run_scheduler(
-                    ton,
-                    bot,
-                    TELEGRAM_CHAT_ID,
-                    cli_args.schedule,
-                    cli_args.pages,
+        # Tokens scanned before the store existed, imported into an empty
+        # store only.
+        if scan_store.is_empty() and os.path.exists(SCANNED_TOKENS_CSV):
+            imported = scan_store.import_csv(SCANNED_TOKENS_CSV)
+            logging.info(
+                f"Imported {imported} scanned tokens from {SCANNED_TOKENS_CSV}"
+            )
+        if cli_args.shards:
+            ton_viewer_sharing = key_sharing(
+                TON_VIEWER_API_KEY, cli_args.shards
+            )
+        if METRICS_PORT:
+            await serve_metrics(int(METRICS_PORT))
+        chat_jobs.start()
+        if cli_args.stream or cli_args.schedule:
+            scan_jobs.start()
+            work_queue = None
+            if cli_args.shards:
+                work_queue = WorkQueue(
+                    WORK_QUEUE_PATH, lease_seconds=WORK_LEASE_SECONDS
+                )
+                asyncio.create_task(
+                    run_workers(cli_args.shards, cli_args.workers)
                 )
+                asyncio.create_task(
+                    run_result_sender(
+                        scan_jobs,
+                        bot,
+                        TELEGRAM_CHAT_ID,
+                        work_queue,
+                        scan_store,
+                        feature_store,
+                    )
+                )
+            run_cycle = build_run_cycle(
+                scan_jobs,
+                bot,
+                TELEGRAM_CHAT_ID,
+                cli_args.pages,
+                cli_args.workers,
+                scan_store,
+                feature_store,
+                work_queue,
             )
+            if cli_args.stream:
+                asyncio.create_task(
+                    run_stream_scanner(
+                        run_cycle, cli_args.schedule or 10, scan_store
+                    )
+                )
+            else:
+                asyncio.create_task(
+                    run_scheduler(run_cycle, cli_args.schedule)
+                )
         await run_bot()
 
 
@@ -0,0 +1,140 @@
+import asyncio
+import bisect
+import logging
+import threading
+from collections import defaultdict
+
+logger = logging.getLogger(__name__)
+
+latency_buckets = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+wait_buckets = (0.0, 0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+class Histogram:
+    def __init__(self, buckets: tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def render(self, name: str, labels: str) -> list[str]:
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            lines.append(
+                f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}'
+            )
+        lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {self.count}')
+        lines.append(f"{name}_sum{{{labels}}} {self.sum:.6f}")
+        lines.append(f"{name}_count{{{labels}}} {self.count}")
+        return lines
+
+
+class Metrics:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests: defaultdict[tuple[str, str, str], int] = defaultdict(
+            int
+        )
+        self.cache_hits: defaultdict[tuple[str, str], int] = defaultdict(int)
+        self.bytes: defaultdict[tuple[str, str], int] = defaultdict(int)
+        self.latency: dict[tuple[str, str], Histogram] = {}
+        self.wait: dict[tuple[str, str], Histogram] = {}
+
+    def observe_request(
+        self,
+        service: str,
+        endpoint: str | None,
+        status: int | str,
+        latency: float,
+        size: int = 0,
+        wait: float = 0.0,
+    ) -> None:
+        key = (service, endpoint or "unknown")
+        with self.lock:
+            self.requests[(*key, str(status))] += 1
+            self.bytes[key] += size
+            if key not in self.latency:
+                self.latency[key] = Histogram(latency_buckets)
+                self.wait[key] = Histogram(wait_buckets)
+            self.latency[key].observe(latency)
+            self.wait[key].observe(wait)
+        logger.debug(
+            f"{key[0]} {key[1]} status={status} latency={latency:.3f}s "
+            f"wait={wait:.3f}s bytes={size}"
+        )
+
+    def observe_cache_hit(self, service: str, endpoint: str | None) -> None:
+        with self.lock:
+            self.cache_hits[(service, endpoint or "unknown")] += 1
+
+    def render(self) -> str:
+        lines = []
+        with self.lock:
+            lines.append("# TYPE api_requests_total counter")
+            for (service, endpoint, status), count in self.requests.items():
+                lines.append(
+                    f'api_requests_total{{service="{service}",'
+                    f'endpoint="{endpoint}",status="{status}"}} {count}'
+                )
+            lines.append("# TYPE api_cache_hits_total counter")
+            for (service, endpoint), count in self.cache_hits.items():
+                lines.append(
+                    f'api_cache_hits_total{{service="{service}",'
+                    f'endpoint="{endpoint}"}} {count}'
+                )
+            lines.append("# TYPE api_response_bytes_total counter")
+            for (service, endpoint), size in self.bytes.items():
+                lines.append(
+                    f'api_response_bytes_total{{service="{service}",'
+                    f'endpoint="{endpoint}"}} {size}'
+                )
+            for name, histograms in (
+                ("api_request_duration_seconds", self.latency),
+                ("api_rate_limit_wait_seconds", self.wait),
+            ):
+                lines.append(f"# TYPE {name} histogram")
+                for (service, endpoint), histogram in histograms.items():
+                    labels = f'service="{service}",endpoint="{endpoint}"'
+                    lines += histogram.render(name, labels)
+        return "\n".join(lines) + "\n"
+
+
+metrics = Metrics()
+
+
+async def serve_metrics(
+    port: int, host: str = "127.0.0.1", registry: Metrics = metrics
+) -> asyncio.Server:
+    async def handle(
+        reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        try:
+            request_line = await reader.readline()
+            while await reader.readline() not in (b"\r\n", b"\n", b""):
+                pass
+            parts = request_line.decode(errors="replace").split()
+            if len(parts) >= 2 and parts[1] == "/metrics":
+                status, body = "200 OK", registry.render()
+            else:
+                status, body = "404 Not Found", "Not found\n"
+            payload = body.encode()
+            writer.write(
+                f"HTTP/1.1 {status}\r\n"
+                "Content-Type: text/plain; version=0.0.4\r\n"
+                f"Content-Length: {len(payload)}\r\n"
+                "Connection: close\r\n\r\n".encode() + payload
+            )
+            await writer.drain()
+        finally:
+            writer.close()
+
+    server = await asyncio.start_server(handle, host, port)
+    logger.info(f"Serving metrics on http://{host}:{port}/metrics")
+    return server
@@ -0,0 +1,298 @@
+#!/usr/bin/env python3
+
+import argparse
+import json
+import math
+import queue
+import random
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from address import address_key
+from limiter import TokenBucket
+from recording import fixture_key, load_fixtures
+
+
+class MockApiServer:
+    def __init__(
+        self,
+        fixtures: dict[str, dict],
+        host: str = "127.0.0.1",
+        port: int = 0,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        rate_limit: float | None = None,
+        burst: float | None = None,
+    ):
+        self.fixtures = fixtures
+        self.accounts = {
+            account["address"]: account
+            for fixture in fixtures.values()
+            if fixture["path"] == "/accounts/_bulk"
+            and fixture["status_code"] == 200
+            for account in fixture["body"]["accounts"]
+        }
+        self.services = sorted(
+            {fixture["service"] for fixture in fixtures.values()},
+            key=len,
+            reverse=True,
+        )
+        self.latency = latency
+        self.jitter = jitter
+        self.buckets = {
+            service: TokenBucket(rate_limit, burst)
+            for service in self.services
+            if rate_limit
+        }
+        self.requests: Counter[str] = Counter()
+        self.throttled: Counter[str] = Counter()
+        self.missing: Counter[str] = Counter()
+        self.lock = threading.Lock()
+        self.server = ThreadingHTTPServer((host, port), self._handler())
+        self.server.daemon_threads = True
+        self.thread: threading.Thread | None = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def service_url(self, service: str) -> str:
+        return f"{self.url}/{service}"
+
+    def start(self) -> "MockApiServer":
+        self.thread = threading.Thread(
+            target=self.server.serve_forever, daemon=True
+        )
+        self.thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+    def total_requests(self) -> int:
+        with self.lock:
+            return sum(self.requests.values())
+
+    def respond(
+        self, method: str, path: str, data: dict | None
+    ) -> tuple[int, dict, dict[str, str]]:
+        path = path.lstrip("/")
+        service = next(
+            (s for s in self.services if path.startswith(f"{s}/")), None
+        )
+        if service is None:
+            return 404, {"error": f"Unknown service for {path}"}, {}
+
+        relative_path = path.removeprefix(service)
+        with self.lock:
+            self.requests[service] += 1
+
+        bucket = self.buckets.get(service)
+        if bucket is not None and not bucket.try_acquire():
+            with self.lock:
+                self.throttled[service] += 1
+            retry_after = str(max(math.ceil(bucket.retry_after()), 1))
+            return (
+                429,
+                {"error": "rate limit exceeded"},
+                {"Retry-After": retry_after},
+            )
+
+        if self.latency or self.jitter:
+            time.sleep(self.latency + random.uniform(0, self.jitter))
+
+        key = fixture_key(service, method, relative_path, data)
+        fixture = self.fixtures.get(key)
+        if fixture is None and relative_path == "/accounts/_bulk":
+            fixture = self.bulk_accounts(data["account_ids"])
+        if fixture is None:
+            with self.lock:
+                self.missing[key] += 1
+            return 404, {"error": f"No fixture for {key}"}, {}
+        return fixture["status_code"], fixture["body"], fixture["headers"]
+
+    def bulk_accounts(self, addresses: list[str]) -> dict | None:
+        # Coalesced batches depend on timing, so rebuild them from the
+        # accounts seen in any recorded batch.
+        if not all(address in self.accounts for address in addresses):
+            return None
+        body = {"accounts": [self.accounts[a] for a in addresses]}
+        return {"status_code": 200, "body": body, "headers": {}}
+
+    def _handler(self) -> type[BaseHTTPRequestHandler]:
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def _serve(self, method: str):
+                length = int(self.headers.get("Content-Length") or 0)
+                data = json.loads(self.rfile.read(length)) if length else None
+                status_code, body, headers = mock.respond(
+                    method, self.path, data
+                )
+                payload = json.dumps(body).encode()
+                self.send_response(status_code)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.end_headers()
+                try:
+                    self.wfile.write(payload)
+                except (BrokenPipeError, ConnectionResetError):
+                    # Cancelled requests close the socket before the reply.
+                    pass
+
+            def do_GET(self):
+                self._serve("GET")
+
+            def do_POST(self):
+                self._serve("POST")
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+# Stands in for TonAPI's /sse/accounts/transactions stream. Transactions
+# given to publish are sent to every subscriber watching the account.
+class MockStreamServer:
+    def __init__(
+        self, host: str = "127.0.0.1", port: int = 0, heartbeat: float = 5.0
+    ):
+        self.heartbeat = heartbeat
+        self.lock = threading.Lock()
+        self.subscribers: list[tuple[set[str], queue.Queue]] = []
+        self.connections = 0
+        self.server = ThreadingHTTPServer((host, port), self._handler())
+        self.server.daemon_threads = True
+        self.thread: threading.Thread | None = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/v2"
+
+    def start(self) -> "MockStreamServer":
+        self.thread = threading.Thread(
+            target=self.server.serve_forever, daemon=True
+        )
+        self.thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.disconnect()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def publish(self, account_id: str, lt: int, tx_hash: str) -> int:
+        message = {"account_id": account_id, "lt": lt, "tx_hash": tx_hash}
+        delivered = 0
+        with self.lock:
+            for accounts, messages in self.subscribers:
+                if address_key(account_id) in accounts:
+                    messages.put(message)
+                    delivered += 1
+        return delivered
+
+    def disconnect(self) -> None:
+        # Ends every open stream, clients see the server going away.
+        with self.lock:
+            for _, messages in self.subscribers:
+                messages.put(None)
+
+    def _handler(self) -> type[BaseHTTPRequestHandler]:
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                url = urlparse(self.path)
+                if not url.path.endswith("/sse/accounts/transactions"):
+                    self.send_error(404)
+                    return
+                accounts = {
+                    address_key(account)
+                    for value in parse_qs(url.query).get("accounts", [])
+                    for account in value.split(",")
+                }
+                messages: queue.Queue = queue.Queue()
+                subscriber = (accounts, messages)
+                with mock.lock:
+                    mock.subscribers.append(subscriber)
+                    mock.connections += 1
+                try:
+                    self.send_response(200)
+                    self.send_header("Content-Type", "text/event-stream")
+                    self.send_header("Cache-Control", "no-cache")
+                    self.end_headers()
+                    while True:
+                        try:
+                            message = messages.get(timeout=mock.heartbeat)
+                        except queue.Empty:
+                            self.wfile.write(b": heartbeat\n\n")
+                            self.wfile.flush()
+                            continue
+                        if message is None:
+                            return
+                        self.wfile.write(
+                            f"event: message\ndata: {json.dumps(message)}"
+                            "\n\n".encode()
+                        )
+                        self.wfile.flush()
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+                finally:
+                    with mock.lock:
+                        mock.subscribers.remove(subscriber)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Replay recorded TonAPI/GeckoTerminal responses"
+    )
+    parser.add_argument("fixtures", help="Directory with recorded fixtures")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", default=8080, type=int)
+    parser.add_argument(
+        "--latency", default=0.0, type=float, help="Seconds per response"
+    )
+    parser.add_argument(
+        "--jitter", default=0.0, type=float, help="Random extra latency"
+    )
+    parser.add_argument(
+        "--rps",
+        type=float,
+        help="Requests per second per service before answering 429",
+    )
+    args = parser.parse_args()
+
+    server = MockApiServer(
+        load_fixtures(args.fixtures),
+        host=args.host,
+        port=args.port,
+        latency=args.latency,
+        jitter=args.jitter,
+        rate_limit=args.rps,
+    )
+    for service in server.services:
+        print(f"Serving {service} at {server.service_url(service)}")
+    try:
+        server.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server.server_close()
+
+
+if __name__ == "__main__":
+    main()
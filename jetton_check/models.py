@@ -1,6 +1,13 @@
 import re
+import heapq
 from enum import Enum
-from pydantic import BaseModel, model_validator
+from typing import Any, Iterable
+
+from pydantic import BaseModel, Field, PrivateAttr, model_validator
+
+socials_regex = re.compile(
+    r"(https?:\/\/(?:www\.|(?!www))[a-zA-Z0-9][a-zA-Z0-9-]+[a-zA-Z0-9]\.[^\s]{2,}|www\.[a-zA-Z0-9][a-zA-Z0-9-]+[a-zA-Z0-9]\.[^\s]{2,}|https?:\/\/(?:www\.|(?!www))[a-zA-Z0-9]+\.[^\s]{2,}|www\.[a-zA-Z0-9]+\.[^\s]{2,})"
+)
 
 
 class AccountData(BaseModel):
@@ -21,16 +28,17 @@ class JettonMetadata(BaseModel):
     @model_validator(mode="before")
     @classmethod
     def validate_fields(cls, values: dict):
-        regex = r"(https?:\/\/(?:www\.|(?!www))[a-zA-Z0-9][a-zA-Z0-9-]+[a-zA-Z0-9]\.[^\s]{2,}|www\.[a-zA-Z0-9][a-zA-Z0-9-]+[a-zA-Z0-9]\.[^\s]{2,}|https?:\/\/(?:www\.|(?!www))[a-zA-Z0-9]+\.[^\s]{2,}|www\.[a-zA-Z0-9]+\.[^\s]{2,})"
         if (description := values.get("description")) is None:
             return values
-        socials: list[str] = values.get("socials", [])
-        matches = re.findall(regex, description)
-        if matches:
-            socials += matches
+        socials: list[str] = list(values.get("socials") or [])
+        if "http" in description or "www." in description:
+            # Already parsed socials are kept when a dumped model is
+            # validated again, add only links not seen yet.
+            for link in socials_regex.findall(description):
+                if link not in socials:
+                    socials.append(link)
 
-        values["socials"] = socials
-        return values
+        return {**values, "socials": socials}
 
 
 class ActionType(str, Enum):
@@ -134,6 +142,7 @@ class Event(BaseModel):
     event_id: str
     account: AccountData
     timestamp: int
+    lt: int = 0
     actions: list[
         SmartContractExecAction
         | ContractDeployAction
@@ -168,6 +177,42 @@ class Event(BaseModel):
         return values
 
 
+action_models: dict[str, type[Action]] = {
+    ActionType.SmartContractExec: SmartContractExecAction,
+    ActionType.ContractDeploy: ContractDeployAction,
+    ActionType.JettonSwap: JettonSwapAction,
+    ActionType.JettonTransfer: JettonTransferAction,
+    ActionType.TonTransfer: TonTransferAction,
+    ActionType.JettonMint: JettonMintAction,
+}
+
+
+def decode_event(
+    payload: dict, action_types: Iterable[ActionType] | None = None
+) -> Event:
+    # Validates every field once instead of building the actions in the
+    # before-validator and re-validating them against the Event union.
+    # Actions outside action_types are never decoded.
+    wanted = None if action_types is None else set(action_types)
+    actions = []
+    for action in payload.get("actions", []):
+        action_type = action.get("type")
+        if action_type not in action_models:
+            continue
+        if wanted is not None and action_type not in wanted:
+            continue
+        actions.append(action_models[action_type].model_validate(action))
+    return Event.model_construct(
+        event_id=payload["event_id"],
+        account=AccountData.model_validate(payload["account"]),
+        timestamp=payload["timestamp"],
+        lt=payload.get("lt", 0),
+        actions=actions,
+        is_scam=payload["is_scam"],
+        in_progress=payload["in_progress"],
+    )
+
+
 class Account(BaseModel):
     address: str
     is_wallet: bool
@@ -219,6 +264,29 @@ class JettonMaster(BaseModel):
     creator: Wallet | None
     holders: list[Wallet] = []
 
+    # Rankings are cached per holders list; anything that changes holder
+    # balances or airdrop amounts in place must call invalidate_ranking.
+    _ranking_key: tuple[int, int] | None = PrivateAttr(default=None)
+    _top: dict[int, list[Wallet]] = PrivateAttr(default_factory=dict)
+    _top_sums: dict[int, int] = PrivateAttr(default_factory=dict)
+    _messages: dict[bool, str] = PrivateAttr(default_factory=dict)
+
+    def __setattr__(self, name: str, value: Any):
+        super().__setattr__(name, value)
+        if name == "holders":
+            self.invalidate_ranking()
+
+    def invalidate_ranking(self):
+        self._ranking_key = None
+
+    def _check_ranking(self):
+        key = (id(self.holders), len(self.holders))
+        if self._ranking_key != key:
+            self._ranking_key = key
+            self._top.clear()
+            self._top_sums.clear()
+            self._messages.clear()
+
     def calculate_holding(self, balance: int) -> float:
         return round(balance / self.data.total_supply * 100, 2)
 
@@ -235,16 +303,110 @@ class JettonMaster(BaseModel):
             string += f" {holder.account.name}"
         return string
 
+    def get_top(self, n: int) -> list[Wallet]:
+        self._check_ranking()
+        if n not in self._top:
+            self._top[n] = heapq.nlargest(
+                n, self.holders, key=lambda x: x.balance
+            )
+        return self._top[n]
+
     def get_top_ten(self):
-        return sorted(self.holders, key=lambda x: x.balance, reverse=True)[:10]
+        return self.get_top(10)
+
+    def calculate_top_percent(self, n: int) -> float:
+        self._check_ranking()
+        if n not in self._top_sums:
+            self._top_sums[n] = sum(
+                holder.balance for holder in self.get_top(n)
+            )
+        return self.calculate_holding(self._top_sums[n])
 
     def calculate_top_ten_percent(self):
-        total = sum(holder.balance for holder in self.get_top_ten())
-        return self.calculate_holding(total)
+        return self.calculate_top_percent(10)
 
     def build_top_ten_message(self, with_address: bool = False):
-        top_ten = self.get_top_ten()
-        message = f"\nTop 10 - {self.calculate_top_ten_percent()}%\n"
-        for i, holder in enumerate(top_ten):
-            message += f"{i+1}. \t {self.get_holder_string(holder, with_address=with_address)}\n"
-        return message
+        self._check_ranking()
+        if with_address not in self._messages:
+            top_ten = self.get_top_ten()
+            message = f"\nTop 10 - {self.calculate_top_ten_percent()}%\n"
+            for i, holder in enumerate(top_ten):
+                message += f"{i+1}. \t {self.get_holder_string(holder, with_address=with_address)}\n"
+            self._messages[with_address] = message
+        return self._messages[with_address]
+
+
+class AccountTransaction(BaseModel):
+    account_id: str
+    lt: int
+    tx_hash: str
+
+
+class PoolWatermark(BaseModel):
+    # pool_created_at uses a fixed "%Y-%m-%dT%H:%M:%SZ" format, so the
+    # timestamps compare correctly as strings.
+    created_at: str | None = None
+    pool_addresses: set[str] = set()
+
+    def is_known(self, created_at: str, pool_address: str) -> bool:
+        if self.created_at is None:
+            return False
+        return created_at < self.created_at or (
+            created_at == self.created_at
+            and pool_address in self.pool_addresses
+        )
+
+    def advance(self, created_at: str, pool_address: str) -> None:
+        if self.created_at is None or created_at > self.created_at:
+            self.created_at = created_at
+            self.pool_addresses = {pool_address}
+        elif created_at == self.created_at:
+            self.pool_addresses.add(pool_address)
+
+
+class JettonSnapshot(BaseModel):
+    pool_address: str
+    jetton_master: JettonMaster
+    liquidity_master: JettonMaster
+    # Unfiltered receivers, filtering by name happens on every rating.
+    airdrop_receivers: dict[str, dict] = {}
+    history_lt: int = 0
+    # The history was not read past the stop percent, receivers and the
+    # total are a lower bound.
+    airdrop_stopped: bool = False
+
+
+class PoolScan(BaseModel):
+    created_at: str
+    pool_address: str
+    token_address: str
+    jetton_master: JettonMaster | None = None
+    liquidity_master: JettonMaster | None = None
+    airdrop_receivers: dict[str, dict] = {}
+    total_airdrop_percent: float = 0.0
+    airdrop_stopped: bool = False
+    rating: float = 0.0
+    features: dict[str, float] = {}
+    error: str | None = None
+    retryable: bool = False
+    duration: float = 0.0
+    incremental: bool = False
+    snapshot: JettonSnapshot | None = Field(default=None, repr=False)
+
+
+class ScanStats(BaseModel):
+    discovered: int = 0
+    skipped: int = 0
+    queued: int = 0
+    analysed: int = 0
+    rescans: int = 0
+    # Pools that failed the fdv and reserve prefilter on an earlier cycle
+    # and pass it now.
+    candidates: int = 0
+    incremental: int = 0
+    analysis_errors: int = 0
+    deferred: int = 0
+    good: int = 0
+    reported: int = 0
+    report_errors: int = 0
+    durations: list[float] = Field(default_factory=list, repr=False)
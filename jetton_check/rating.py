@@ -0,0 +1,201 @@
+from typing import Iterable, Literal
+
+import numpy as np
+from pydantic import BaseModel, ConfigDict
+
+from airdrops import MAX_AIRDROP_PERCENT
+from cache import ZERO_ADDRESS
+from models import JettonMaster, LiquidityState
+
+# Features are float64 columns, liquidity states are stored by their
+# position in the enum.
+liquidity_codes: dict[LiquidityState, int] = {
+    state: i for i, state in enumerate(LiquidityState)
+}
+
+feature_names = (
+    "admin_revoked",
+    "liquidity_state",
+    "liquidity_holder",
+    "liquidity_share",
+    "creator_share",
+    "airdrop_percent",
+    "used_cells",
+)
+
+operators = {
+    "eq": np.equal,
+    "ne": np.not_equal,
+    "lt": np.less,
+    "le": np.less_equal,
+    "gt": np.greater,
+    "ge": np.greater_equal,
+    "in": np.isin,
+}
+
+
+class Condition(BaseModel):
+    feature: str
+    op: Literal["eq", "ne", "lt", "le", "gt", "ge", "in"]
+    value: float | list[float]
+
+    def evaluate(self, features: dict[str, np.ndarray]) -> np.ndarray:
+        values = np.asarray(features[self.feature], dtype=np.float64)
+        return operators[self.op](values, self.value)
+
+
+class Rule(Condition):
+    name: str
+    weight: float = 1.0
+    # Conditions on other features that must hold as well.
+    also: list[Condition] = []
+
+    def evaluate(self, features: dict[str, np.ndarray]) -> np.ndarray:
+        matched = super().evaluate(features)
+        for condition in self.also:
+            matched &= condition.evaluate(features)
+        return matched
+
+
+class RuleSet(BaseModel):
+    name: str
+    threshold: float
+    rules: list[Rule]
+
+
+class RatingResult(BaseModel):
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    scores: np.ndarray
+    breakdown: dict[str, np.ndarray]
+    passed: np.ndarray
+
+
+DEFAULT_RULES = RuleSet(
+    name="default",
+    threshold=4,
+    rules=[
+        Rule(
+            name="admin_revoked",
+            feature="admin_revoked",
+            op="eq",
+            value=1,
+        ),
+        Rule(
+            name="liquidity_locked",
+            feature="liquidity_state",
+            op="in",
+            value=[
+                liquidity_codes[LiquidityState.Burned],
+                liquidity_codes[LiquidityState.TonInuLocked],
+                liquidity_codes[LiquidityState.Undefined],
+            ],
+        ),
+        Rule(
+            name="creator_share",
+            feature="creator_share",
+            op="le",
+            value=0.1,
+        ),
+        Rule(
+            name="airdrop",
+            feature="airdrop_percent",
+            op="le",
+            value=MAX_AIRDROP_PERCENT,
+        ),
+    ],
+)
+
+
+def load_rule_set(path: str) -> RuleSet:
+    with open(path) as f:
+        return RuleSet.model_validate_json(f.read())
+
+
+def top_liquidity_holder(
+    liquidity_master: JettonMaster,
+) -> tuple[LiquidityState, float]:
+    # The lock kind and share of the largest LP holder, separately from
+    # the 0.7 share check_liquidity_state applies.
+    top_ten = liquidity_master.get_top_ten()
+    if not top_ten:
+        return LiquidityState.NoHolders, 0.0
+    holder = top_ten[0]
+    share = holder.balance / liquidity_master.data.total_supply
+    for state in (LiquidityState.Burned, LiquidityState.TonInuLocked):
+        if holder.account.address == state.value:
+            return state, share
+    return LiquidityState.NotSafe, share
+
+
+def extract_features(
+    jetton_master: JettonMaster,
+    liquidity_master: JettonMaster,
+    liquidity_state: LiquidityState,
+    total_airdrop: float,
+) -> dict[str, float]:
+    # Shares are divided as Python ints, balances above 2**53 would lose
+    # precision as float64 columns.
+    liquidity_holder, liquidity_share = top_liquidity_holder(liquidity_master)
+    return {
+        "admin_revoked": float(jetton_master.admin_address == ZERO_ADDRESS),
+        "liquidity_state": float(liquidity_codes[liquidity_state]),
+        "liquidity_holder": float(liquidity_codes[liquidity_holder]),
+        "liquidity_share": liquidity_share,
+        "creator_share": jetton_master.creator.balance
+        / jetton_master.data.total_supply,
+        "airdrop_percent": float(total_airdrop),
+        "used_cells": float(jetton_master.used_cells),
+    }
+
+
+def stack_features(rows: Iterable[dict[str, float]]) -> dict[str, np.ndarray]:
+    rows = list(rows)
+    return {
+        name: np.fromiter(
+            (row[name] for row in rows), dtype=np.float64, count=len(rows)
+        )
+        for name in feature_names
+    }
+
+
+class RatingEngine:
+    def __init__(self, rule_set: RuleSet = DEFAULT_RULES):
+        self.rule_set = rule_set
+
+    def score(self, features: dict[str, np.ndarray]) -> RatingResult:
+        # Columns may be memory-mapped, only those the rules use are read.
+        size = len(next(iter(features.values()))) if features else 0
+        scores = np.zeros(size, dtype=np.float64)
+        breakdown = {}
+        for rule in self.rule_set.rules:
+            points = rule.evaluate(features) * rule.weight
+            breakdown[rule.name] = points
+            scores += points
+        return RatingResult(
+            scores=scores,
+            breakdown=breakdown,
+            passed=scores >= self.rule_set.threshold,
+        )
+
+    def score_one(self, features: dict[str, float]) -> float:
+        return float(self.score(stack_features([features])).scores[0])
+
+    def passes(self, score: float) -> bool:
+        return score >= self.rule_set.threshold
+
+    def stop_airdrop_percent(self) -> float | None:
+        # Reading airdrop history can stop early only at a bound that no
+        # token can pass the threshold without.
+        best = sum(
+            rule.weight for rule in self.rule_set.rules if rule.weight > 0
+        )
+        for rule in self.rule_set.rules:
+            if (
+                rule.feature == "airdrop_percent"
+                and rule.op == "le"
+                and rule.weight > 0
+                and best - rule.weight < self.rule_set.threshold
+            ):
+                return rule.value
+        return None
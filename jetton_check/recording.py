@@ -0,0 +1,112 @@
+import glob
+import hashlib
+import json
+import os
+import threading
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+import httpx
+
+volatile_params = {"end_date"}
+recorded_headers = {"retry-after", "x-ratelimit-remaining"}
+
+
+def service_name(base_url: str) -> str:
+    parts = urlsplit(base_url)
+    return f"{parts.netloc}{parts.path}".rstrip("/")
+
+
+def normalize_path(path: str) -> str:
+    parts = urlsplit(path)
+    params = sorted(
+        (key, value)
+        for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if key not in volatile_params
+    )
+    if not params:
+        return parts.path
+    return f"{parts.path}?{urlencode(params)}"
+
+
+def fixture_key(
+    service: str, method: str, path: str, data: dict | None = None
+) -> str:
+    key = f"{service} {method.upper()} {normalize_path(path)}"
+    if data is not None:
+        key += f" {json.dumps(data, sort_keys=True)}"
+    return key
+
+
+class Recorder:
+    def __init__(self, directory: str = "fixtures"):
+        self.directory = directory
+        self.lock = threading.Lock()
+
+    def record(
+        self,
+        base_url: str,
+        method: str,
+        url: str,
+        data: dict | None,
+        status_code: int,
+        body: dict,
+        headers: dict[str, str] | None = None,
+    ) -> str:
+        service = service_name(base_url)
+        path = url.removeprefix(base_url)
+        key = fixture_key(service, method, path, data)
+        file_name = hashlib.sha1(key.encode()).hexdigest() + ".json"
+        directory = os.path.join(self.directory, service.replace("/", "_"))
+        fixture = {
+            "key": key,
+            "service": service,
+            "method": method.upper(),
+            "path": normalize_path(path),
+            "data": data,
+            "status_code": status_code,
+            "headers": headers or {},
+            "body": body,
+        }
+        with self.lock:
+            os.makedirs(directory, exist_ok=True)
+            with open(os.path.join(directory, file_name), "w") as file:
+                json.dump(fixture, file)
+        return key
+
+    def record_response(
+        self,
+        base_url: str,
+        method: str,
+        url: str,
+        data: dict | None,
+        response: httpx.Response,
+    ) -> str:
+        headers = {
+            name: value
+            for name, value in response.headers.items()
+            if name.lower() in recorded_headers
+        }
+        # Error pages from proxies and rate limiters are often plain text.
+        try:
+            body = response.json()
+        except ValueError:
+            body = {"text": response.text}
+        return self.record(
+            base_url,
+            method,
+            url,
+            data,
+            response.status_code,
+            body,
+            headers,
+        )
+
+
+def load_fixtures(directory: str) -> dict[str, dict]:
+    fixtures = {}
+    pattern = os.path.join(directory, "**", "*.json")
+    for path in glob.glob(pattern, recursive=True):
+        with open(path) as file:
+            fixture = json.load(file)
+        fixtures[fixture["key"]] = fixture
+    return fixtures
@@ -0,0 +1,136 @@
+import asyncio
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable
+
+from pydantic import BaseModel
+
+logger = logging.getLogger(__name__)
+
+
+class CachedReport(BaseModel):
+    kwargs: dict[str, Any]
+    snapshot: Any
+    created_at: float
+    size: int
+
+    def age(self) -> float:
+        return time.time() - self.created_at
+
+
+def format_age(seconds: float) -> str:
+    if seconds < 60:
+        return "just now"
+    if seconds < 3600:
+        return f"{int(seconds // 60)} min ago"
+    return f"{int(seconds // 3600)} h {int(seconds % 3600 // 60)} min ago"
+
+
+def with_age(report: CachedReport) -> dict[str, Any]:
+    # Appending keeps the offsets of the existing entities valid.
+    return {
+        **report.kwargs,
+        "text": f"{report.kwargs['text']}\n\nData from "
+        f"{format_age(report.age())}",
+    }
+
+
+def report_size(kwargs: dict[str, Any], snapshot: Any) -> int:
+    # Serialized length of the rendered message and the analysis behind
+    # it. Every holder is dumped, so callers run it off the bot's loop.
+    size = 0
+    pending = [kwargs, snapshot]
+    while pending:
+        item = pending.pop()
+        if isinstance(item, BaseModel):
+            size += len(item.model_dump_json())
+        elif isinstance(item, dict):
+            pending.extend(item.items())
+        elif isinstance(item, (list, tuple)):
+            pending.extend(item)
+        else:
+            size += len(str(item).encode())
+    return size
+
+
+class ReportCache:
+    def __init__(
+        self,
+        max_bytes: int = 64 * 1024 * 1024,
+        stale_after: float = 300.0,
+        max_age: float = 3600.0,
+    ):
+        self.max_bytes = max_bytes
+        self.stale_after = stale_after
+        self.max_age = max_age
+        self.lock = threading.Lock()
+        self.reports: OrderedDict[str, CachedReport] = OrderedDict()
+        self.size = 0
+        self.refreshing: dict[str, asyncio.Task] = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: str) -> CachedReport | None:
+        with self.lock:
+            report = self.reports.get(key)
+            if report is None or report.age() > self.max_age:
+                self.misses += 1
+                return None
+            self.reports.move_to_end(key)
+            self.hits += 1
+            return report
+
+    def is_stale(self, report: CachedReport) -> bool:
+        return report.age() > self.stale_after
+
+    def set(
+        self, key: str, kwargs: dict[str, Any], snapshot: Any, size: int
+    ) -> CachedReport:
+        report = CachedReport(
+            kwargs=kwargs, snapshot=snapshot, created_at=time.time(), size=size
+        )
+        with self.lock:
+            if (old := self.reports.pop(key, None)) is not None:
+                self.size -= old.size
+            if report.size > self.max_bytes:
+                return report
+            self.reports[key] = report
+            self.size += report.size
+            while self.size > self.max_bytes:
+                _, evicted = self.reports.popitem(last=False)
+                self.size -= evicted.size
+                self.evictions += 1
+        return report
+
+    def refresh(
+        self,
+        key: str,
+        render: Callable[[], Awaitable[tuple[dict[str, Any], Any, int]]],
+    ) -> asyncio.Task:
+        if (task := self.refreshing.get(key)) is not None:
+            return task
+
+        async def run() -> None:
+            try:
+                self.set(key, *(await render()))
+            except Exception as e:
+                logger.error(f"Error refreshing report for {key}: {e}")
+            finally:
+                self.refreshing.pop(key, None)
+
+        task = asyncio.create_task(run())
+        self.refreshing[key] = task
+        return task
+
+    def stats(self) -> dict[str, int]:
+        with self.lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self.reports),
+                "bytes": self.size,
+            }
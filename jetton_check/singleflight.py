@@ -0,0 +1,93 @@
+import asyncio
+import concurrent.futures
+import threading
+import time
+from typing import Awaitable, Callable, Hashable, TypeVar
+
+T = TypeVar("T")
+
+
+class LeaderCancelled(Exception):
+    pass
+
+
+class SingleFlight:
+    # Flights are concurrent futures, so callers on different event loops
+    # (the chat and scan job queues) share them too.
+    def __init__(self, ttl: float = 30.0):
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.flights: dict[
+            Hashable, tuple[concurrent.futures.Future, float | None]
+        ] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def _join(self, key: Hashable) -> tuple[concurrent.futures.Future, bool]:
+        now = time.monotonic()
+        with self.lock:
+            if key in self.flights:
+                future, expires_at = self.flights[key]
+                if expires_at is None or expires_at > now:
+                    self.hits += 1
+                    return future, False
+            future = concurrent.futures.Future()
+            self.flights[key] = (future, None)
+            self.misses += 1
+            if len(self.flights) > 1024:
+                self._evict(now)
+            return future, True
+
+    def _evict(self, now: float) -> None:
+        for key, (_, expires_at) in list(self.flights.items()):
+            if expires_at is not None and expires_at <= now:
+                del self.flights[key]
+
+    def _land(
+        self, key: Hashable, future: concurrent.futures.Future, keep: bool
+    ) -> None:
+        with self.lock:
+            if self.flights.get(key, (None,))[0] is not future:
+                return
+            if keep and self.ttl > 0:
+                self.flights[key] = (future, time.monotonic() + self.ttl)
+            else:
+                del self.flights[key]
+
+    async def do(self, key: Hashable, call: Callable[[], Awaitable[T]]) -> T:
+        while True:
+            future, leader = self._join(key)
+            if not leader:
+                try:
+                    return await asyncio.wrap_future(future)
+                except LeaderCancelled:
+                    # The caller that ran the flight went away, try again.
+                    continue
+
+            try:
+                result = await call()
+            except asyncio.CancelledError:
+                self._land(key, future, keep=False)
+                future.set_exception(LeaderCancelled())
+                raise
+            except Exception as e:
+                # Failures are shared with callers already waiting but are
+                # never cached.
+                self._land(key, future, keep=False)
+                future.set_exception(e)
+                raise
+            self._land(key, future, keep=True)
+            future.set_result(result)
+            return result
+
+    def forget(self, key: Hashable) -> None:
+        with self.lock:
+            self.flights.pop(key, None)
+
+    def stats(self) -> dict[str, int]:
+        with self.lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "entries": len(self.flights),
+            }
@@ -0,0 +1,316 @@
+import csv
+import json
+import logging
+import sqlite3
+import threading
+from datetime import datetime, timedelta, UTC, timezone
+
+from models import JettonSnapshot, PoolWatermark
+
+logger = logging.getLogger(__name__)
+
+
+def parse_created_at(created_at: str) -> datetime:
+    return datetime.strptime(created_at, "%Y-%m-%dT%H:%M:%SZ").replace(
+        tzinfo=timezone.utc
+    )
+
+
+class ScanStore:
+    def __init__(
+        self,
+        path: str = "scanned_tokens.db",
+        rescan_window: timedelta = timedelta(hours=2),
+        recheck_interval: timedelta = timedelta(minutes=10),
+        recheck_limit: int = 90,
+    ):
+        self.rescan_window = rescan_window
+        self.recheck_interval = recheck_interval
+        self.recheck_limit = recheck_limit
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS scanned_tokens ("
+            "token_address TEXT PRIMARY KEY, "
+            "created_at TEXT NOT NULL, "
+            "created_ts REAL NOT NULL, "
+            "pool_address TEXT NOT NULL, "
+            "is_good INTEGER NOT NULL)"
+        )
+        self.db.execute(
+            "CREATE INDEX IF NOT EXISTS scanned_tokens_created_ts "
+            "ON scanned_tokens (created_ts)"
+        )
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS snapshots ("
+            "token_address TEXT PRIMARY KEY, "
+            "created_ts REAL NOT NULL, "
+            "snapshot TEXT NOT NULL)"
+        )
+        # Pools that failed the fdv and reserve prefilter, checked again
+        # every recheck interval while inside the rescan window.
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS candidates ("
+            "pool_address TEXT PRIMARY KEY, "
+            "created_at TEXT NOT NULL, "
+            "created_ts REAL NOT NULL, "
+            "token_address TEXT NOT NULL, "
+            "checked_ts REAL NOT NULL DEFAULT 0)"
+        )
+        columns = {
+            row[1] for row in self.db.execute("PRAGMA table_info(candidates)")
+        }
+        if "checked_ts" not in columns:
+            self.db.execute(
+                "ALTER TABLE candidates "
+                "ADD COLUMN checked_ts REAL NOT NULL DEFAULT 0"
+            )
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS watermarks ("
+            "name TEXT PRIMARY KEY, "
+            "created_at TEXT NOT NULL, "
+            "pool_addresses TEXT NOT NULL)"
+        )
+        self.db.commit()
+
+    def is_empty(self) -> bool:
+        with self.lock:
+            row = self.db.execute(
+                "SELECT 1 FROM scanned_tokens LIMIT 1"
+            ).fetchone()
+        return row is None
+
+    def is_token_to_process(self, token_address: str) -> bool:
+        with self.lock:
+            row = self.db.execute(
+                "SELECT created_ts, is_good FROM scanned_tokens "
+                "WHERE token_address = ?",
+                (token_address,),
+            ).fetchone()
+        if row is None:
+            return True
+        created_ts, is_good = row
+        window_start = datetime.now(UTC) - self.rescan_window
+        return not is_good and created_ts >= window_start.timestamp()
+
+    def pending_rescans(self) -> list[tuple[str, str, str]]:
+        window_start = datetime.now(UTC) - self.rescan_window
+        with self.lock:
+            rows = self.db.execute(
+                "SELECT created_at, pool_address, token_address "
+                "FROM scanned_tokens WHERE is_good = 0 AND created_ts >= ? "
+                "ORDER BY created_ts DESC",
+                (window_start.timestamp(),),
+            ).fetchall()
+        return [tuple(row) for row in rows]
+
+    def add_candidates(self, pools: list[tuple[str, str, str]]) -> None:
+        # A new candidate was just checked, it is due after the interval.
+        now = datetime.now(UTC).timestamp()
+        with self.lock:
+            self.db.executemany(
+                "INSERT OR IGNORE INTO candidates VALUES (?, ?, ?, ?, ?)",
+                [
+                    (
+                        pool_address,
+                        created_at,
+                        parse_created_at(created_at).timestamp(),
+                        token_address,
+                        now,
+                    )
+                    for created_at, pool_address, token_address in pools
+                ],
+            )
+            self.db.commit()
+
+    def pending_candidates(self) -> list[tuple[str, str, str]]:
+        window_start = datetime.now(UTC) - self.rescan_window
+        with self.lock:
+            rows = self.db.execute(
+                "SELECT created_at, pool_address, token_address "
+                "FROM candidates WHERE created_ts >= ? "
+                "ORDER BY created_ts DESC",
+                (window_start.timestamp(),),
+            ).fetchall()
+        return [tuple(row) for row in rows]
+
+    def due_candidates(self) -> list[tuple[str, str, str]]:
+        # Candidates not checked within the recheck interval, least
+        # recently checked first. They count as checked once returned.
+        now = datetime.now(UTC)
+        window_start = now - self.rescan_window
+        checked_before = now - self.recheck_interval
+        with self.lock:
+            rows = self.db.execute(
+                "SELECT created_at, pool_address, token_address "
+                "FROM candidates WHERE created_ts >= ? AND checked_ts <= ? "
+                "ORDER BY checked_ts, created_ts DESC LIMIT ?",
+                (
+                    window_start.timestamp(),
+                    checked_before.timestamp(),
+                    self.recheck_limit,
+                ),
+            ).fetchall()
+            self.db.executemany(
+                "UPDATE candidates SET checked_ts = ? WHERE pool_address = ?",
+                [(now.timestamp(), row[1]) for row in rows],
+            )
+            self.db.commit()
+        return [tuple(row) for row in rows]
+
+    def save_snapshot(
+        self, token_address: str, created_at: str, snapshot: JettonSnapshot
+    ) -> None:
+        data = snapshot.model_dump_json()
+        with self.lock:
+            self.db.execute(
+                "INSERT INTO snapshots VALUES (?, ?, ?) "
+                "ON CONFLICT (token_address) DO UPDATE SET "
+                "created_ts = excluded.created_ts, "
+                "snapshot = excluded.snapshot",
+                (
+                    token_address,
+                    parse_created_at(created_at).timestamp(),
+                    data,
+                ),
+            )
+            self.db.commit()
+
+    def load_snapshot(self, token_address: str) -> JettonSnapshot | None:
+        with self.lock:
+            row = self.db.execute(
+                "SELECT snapshot FROM snapshots WHERE token_address = ?",
+                (token_address,),
+            ).fetchone()
+        if row is None:
+            return None
+        return JettonSnapshot.model_validate_json(row[0])
+
+    def delete_snapshot(self, token_address: str) -> None:
+        with self.lock:
+            self.db.execute(
+                "DELETE FROM snapshots WHERE token_address = ?",
+                (token_address,),
+            )
+            self.db.commit()
+
+    def load_watermark(self, name: str = "new_pools") -> PoolWatermark:
+        with self.lock:
+            row = self.db.execute(
+                "SELECT created_at, pool_addresses FROM watermarks "
+                "WHERE name = ?",
+                (name,),
+            ).fetchone()
+        if row is None:
+            return PoolWatermark()
+        return PoolWatermark(
+            created_at=row[0], pool_addresses=set(json.loads(row[1]))
+        )
+
+    def save_watermark(
+        self, watermark: PoolWatermark, name: str = "new_pools"
+    ) -> None:
+        if watermark.created_at is None:
+            return
+        with self.lock:
+            self.db.execute(
+                "INSERT INTO watermarks VALUES (?, ?, ?) "
+                "ON CONFLICT (name) DO UPDATE SET "
+                "created_at = excluded.created_at, "
+                "pool_addresses = excluded.pool_addresses",
+                (
+                    name,
+                    watermark.created_at,
+                    json.dumps(sorted(watermark.pool_addresses)),
+                ),
+            )
+            self.db.commit()
+
+    def upsert(
+        self,
+        created_at: str,
+        pool_address: str,
+        token_address: str,
+        is_good: int,
+    ) -> None:
+        with self.lock:
+            self._upsert(created_at, pool_address, token_address, is_good)
+            self.db.commit()
+
+    def _upsert(
+        self,
+        created_at: str,
+        pool_address: str,
+        token_address: str,
+        is_good: int,
+    ) -> None:
+        self.db.execute(
+            "INSERT INTO scanned_tokens VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT (token_address) DO UPDATE SET "
+            "created_at = excluded.created_at, "
+            "created_ts = excluded.created_ts, "
+            "pool_address = excluded.pool_address, "
+            "is_good = excluded.is_good",
+            (
+                token_address,
+                created_at,
+                parse_created_at(created_at).timestamp(),
+                pool_address,
+                int(is_good),
+            ),
+        )
+        # A scanned pool is no longer a candidate.
+        self.db.execute(
+            "DELETE FROM candidates WHERE pool_address = ?",
+            (pool_address,),
+        )
+
+    def expire(self) -> int:
+        # Scanned tokens are kept for good, a token whose row was deleted
+        # would be alerted again. Snapshots and candidates are only used
+        # inside the rescan window.
+        window_start = datetime.now(UTC) - self.rescan_window
+        expired = 0
+        with self.lock:
+            for table in ("snapshots", "candidates"):
+                cursor = self.db.execute(
+                    f"DELETE FROM {table} WHERE created_ts < ?",
+                    (window_start.timestamp(),),
+                )
+                expired += cursor.rowcount
+            self.db.commit()
+        return expired
+
+    def import_csv(self, file_path: str) -> int:
+        # One-off migration from the csv file used before the store, bad
+        # rows are skipped and the import is kept or rolled back as a
+        # whole.
+        with open(file_path, mode="r", newline="") as file:
+            rows = list(csv.reader(file))
+        imported = 0
+        with self.lock:
+            try:
+                for line, row in enumerate(rows, start=1):
+                    try:
+                        created_at, pool_address, token_address, is_good = row
+                        self._upsert(
+                            created_at,
+                            pool_address,
+                            token_address,
+                            int(is_good),
+                        )
+                    except ValueError as e:
+                        logger.warning(
+                            f"Skipping line {line} of {file_path}: {e}"
+                        )
+                        continue
+                    imported += 1
+                self.db.commit()
+            except BaseException:
+                self.db.rollback()
+                raise
+        return imported
+
+    def close(self) -> None:
+        self.db.close()
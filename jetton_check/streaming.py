@@ -0,0 +1,228 @@
+import asyncio
+import logging
+import time
+from typing import AsyncIterator, Awaitable, Callable
+
+import httpx
+
+from address import address_key
+from clients import (
+    ApiError,
+    backoff_delay,
+    build_headers,
+    parse_retry_after,
+    read_payload,
+)
+from models import AccountTransaction, ScanStats
+from storage import ScanStore
+
+logger = logging.getLogger(__name__)
+
+# New pools are deployed through the StonFi router and the DeDust factory.
+DEX_ACCOUNTS = [
+    "EQB3ncyBUTjZUA5EnFKR5_EnOMI9V1tTEAAPaiU71gc4TiUt",
+    "EQBfBWT7X2BHg9tXAxzhz2aKiNTU1tpt5NsiK0uSDW_YAJ67",
+]
+
+
+async def iter_sse(
+    lines: AsyncIterator[str],
+) -> AsyncIterator[tuple[str, str]]:
+    event, data = "message", []
+    async for line in lines:
+        if not line:
+            if data:
+                yield event, "\n".join(data)
+            event, data = "message", []
+        elif not line.startswith(":"):
+            field, _, value = line.partition(":")
+            value = value.removeprefix(" ")
+            if field == "event":
+                event = value
+            elif field == "data":
+                data.append(value)
+
+
+def watched_accounts(store: ScanStore) -> dict[str, str]:
+    # Pools and masters of tokens that may still turn good, newest first.
+    watched = {}
+    for _, pool_address, token_address in store.pending_rescans():
+        watched[pool_address] = token_address
+        watched[token_address] = token_address
+    return watched
+
+
+class TransactionStream:
+    def __init__(self, url: str, auth: str | None = None):
+        self.url = url
+        # The stream stays open, only connecting is bounded.
+        self.client = httpx.AsyncClient(
+            headers=build_headers(auth),
+            timeout=httpx.Timeout(10.0, read=None),
+        )
+
+    async def subscribe(
+        self, accounts: list[str]
+    ) -> AsyncIterator[AccountTransaction]:
+        async with self.client.stream(
+            "GET",
+            f"{self.url}/sse/accounts/transactions",
+            params={"accounts": ",".join(accounts)},
+        ) as response:
+            if response.status_code != 200:
+                await response.aread()
+                raise ApiError(
+                    response.status_code,
+                    read_payload(response),
+                    parse_retry_after(response.headers),
+                )
+            async for event, data in iter_sse(response.aiter_lines()):
+                if event == "message":
+                    yield AccountTransaction.model_validate_json(data)
+
+    async def aclose(self) -> None:
+        await self.client.aclose()
+
+
+# Runs scan cycles when watched accounts see transactions: a DEX account
+# means a pool may have been created, a pool or jetton master of a token
+# inside the rescan window means its liquidity or supply changed. A full
+# cycle still runs every poll_interval in case the stream misses events.
+class StreamScanner:
+    def __init__(
+        self,
+        stream: TransactionStream,
+        run_cycle: Callable[[set[str] | None], Awaitable[ScanStats]],
+        load_watched: Callable[[], dict[str, str]],
+        dex_accounts: list[str] = DEX_ACCOUNTS,
+        poll_interval: float = 600.0,
+        min_interval: float = 10.0,
+        discovery_retries: int = 3,
+        max_watched: int = 100,
+    ):
+        self.stream = stream
+        self.run_cycle = run_cycle
+        self.load_watched = load_watched
+        self.dex_accounts = {address_key(a): a for a in dex_accounts}
+        self.poll_interval = poll_interval
+        self.min_interval = min_interval
+        self.discovery_retries = discovery_retries
+        self.max_watched = max_watched
+        self.watched: dict[str, str] = {}
+        self.wake = asyncio.Event()
+        self.resubscribe = asyncio.Event()
+        self.discover = False
+        self.rescans: set[str] = set()
+        self.triggered_at: float | None = None
+        self.failures = 0
+        self.events = 0
+
+    def accounts(self) -> list[str]:
+        # Accounts go into the query string, which servers limit in size.
+        watched = list(self.watched)[: self.max_watched]
+        return list(self.dex_accounts.values()) + watched
+
+    def refresh_watched(self) -> None:
+        watched = {
+            address_key(account): token
+            for account, token in self.load_watched().items()
+        }
+        if watched.keys() != self.watched.keys():
+            self.resubscribe.set()
+        self.watched = watched
+
+    def on_transaction(self, transaction: AccountTransaction) -> None:
+        self.events += 1
+        account = address_key(transaction.account_id)
+        if account in self.dex_accounts:
+            self.discover = True
+        elif (token := self.watched.get(account)) is not None:
+            self.rescans.add(token)
+        else:
+            return
+        if self.triggered_at is None:
+            self.triggered_at = time.monotonic()
+        self.wake.set()
+
+    async def consume(self, accounts: list[str]) -> None:
+        async for transaction in self.stream.subscribe(accounts):
+            self.failures = 0
+            self.on_transaction(transaction)
+
+    async def listen(self) -> None:
+        while True:
+            self.resubscribe.clear()
+            accounts = self.accounts()
+            logger.info(f"Subscribing to {len(accounts)} accounts")
+            consume = asyncio.create_task(self.consume(accounts))
+            changed = asyncio.create_task(self.resubscribe.wait())
+            try:
+                done, _ = await asyncio.wait(
+                    {consume, changed}, return_when=asyncio.FIRST_COMPLETED
+                )
+            except asyncio.CancelledError:
+                consume.cancel()
+                changed.cancel()
+                raise
+            changed.cancel()
+            if consume not in done:
+                consume.cancel()
+                continue
+            if (error := consume.exception()) is not None:
+                logger.warning(f"Transaction stream failed: {error}")
+            else:
+                logger.warning("Transaction stream closed")
+            # Polling keeps scanning while the stream reconnects.
+            self.failures += 1
+            await asyncio.sleep(backoff_delay(self.failures, base=1.0))
+
+    def retry_discovery(self) -> None:
+        self.discover = True
+        self.wake.set()
+
+    async def run(self) -> None:
+        self.refresh_watched()
+        listener = asyncio.create_task(self.listen())
+        loop = asyncio.get_running_loop()
+        next_poll = time.monotonic()
+        retries = 0
+        try:
+            while True:
+                timeout = next_poll - time.monotonic()
+                if timeout > 0 and not self.wake.is_set():
+                    try:
+                        await asyncio.wait_for(self.wake.wait(), timeout)
+                    except TimeoutError:
+                        pass
+                self.wake.clear()
+                full = time.monotonic() >= next_poll
+                discover, self.discover = self.discover, False
+                rescans, self.rescans = self.rescans, set()
+                if self.triggered_at is not None:
+                    logger.info(
+                        f"Scanning {time.monotonic() - self.triggered_at:.1f}s "
+                        f"after stream activity, {len(rescans)} rescans"
+                    )
+                    self.triggered_at = None
+                try:
+                    stats = await self.run_cycle(None if full else rescans)
+                except Exception as e:
+                    logger.error(f"Error while processing new pools: {e}")
+                    stats = None
+                if full:
+                    next_poll = time.monotonic() + self.poll_interval
+                # GeckoTerminal lists a new pool some seconds after it is
+                # deployed, a DEX event without a new pool is retried.
+                if discover and stats is not None and not stats.discovered:
+                    if retries < self.discovery_retries:
+                        retries += 1
+                        loop.call_later(
+                            self.min_interval * retries, self.retry_discovery
+                        )
+                elif discover:
+                    retries = 0
+                self.refresh_watched()
+                # Busy DEX accounts would otherwise run cycles back to back.
+                await asyncio.sleep(self.min_interval)
+        finally:
+            listener.cancel()
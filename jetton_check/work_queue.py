@@ -0,0 +1,319 @@
+import sqlite3
+import threading
+import time
+from enum import Enum
+from typing import Iterable
+
+from pydantic import BaseModel
+
+
+class JobStatus(str, Enum):
+    Pending = "pending"
+    Leased = "leased"
+    Done = "done"
+    Applied = "applied"
+    Failed = "failed"
+
+
+class Job(BaseModel):
+    id: int
+    created_at: str
+    pool_address: str
+    token_address: str
+    attempts: int
+
+
+# Pool jobs shared by the coordinator and worker processes through one
+# SQLite file. Workers claim jobs with a lease they keep renewing, a job
+# whose worker died is claimed again once the lease runs out. Results are
+# only accepted from the current lease holder, and messages enter the
+# outbox in the same transaction that applies a result.
+class WorkQueue:
+    def __init__(
+        self,
+        path: str = "work_queue.db",
+        lease_seconds: float = 120.0,
+        max_attempts: int = 3,
+    ):
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(
+            path, timeout=30, isolation_level=None, check_same_thread=False
+        )
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, "
+            "created_at TEXT NOT NULL, "
+            "pool_address TEXT NOT NULL, "
+            "token_address TEXT NOT NULL, "
+            "status TEXT NOT NULL, "
+            "owner TEXT, "
+            "lease_expires REAL, "
+            "attempts INTEGER NOT NULL DEFAULT 0, "
+            "result TEXT, "
+            "updated_ts REAL NOT NULL)"
+        )
+        # A token has at most one job waiting, running or with a result
+        # not applied yet.
+        self.db.execute(
+            "CREATE UNIQUE INDEX IF NOT EXISTS jobs_open ON jobs "
+            "(token_address) WHERE status IN ('pending', 'leased', 'done')"
+        )
+        self.db.execute(
+            "CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, id)"
+        )
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS outbox ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, "
+            "job_id INTEGER NOT NULL UNIQUE, "
+            "message TEXT NOT NULL, "
+            "created_ts REAL NOT NULL, "
+            "sent_ts REAL)"
+        )
+
+    def _write(self, sql: str, params: tuple = ()) -> int:
+        with self.lock:
+            return self.db.execute(sql, params).rowcount
+
+    def enqueue(self, pools: Iterable[tuple[str, str, str]]) -> int:
+        now = time.time()
+        with self.lock:
+            self.db.execute("BEGIN IMMEDIATE")
+            try:
+                queued = 0
+                for created_at, pool_address, token_address in pools:
+                    queued += self.db.execute(
+                        "INSERT OR IGNORE INTO jobs (created_at, "
+                        "pool_address, token_address, status, updated_ts) "
+                        "VALUES (?, ?, ?, ?, ?)",
+                        (
+                            created_at,
+                            pool_address,
+                            token_address,
+                            JobStatus.Pending.value,
+                            now,
+                        ),
+                    ).rowcount
+                self.db.execute("COMMIT")
+            except BaseException:
+                self.db.execute("ROLLBACK")
+                raise
+        return queued
+
+    def claim(self, owner: str) -> Job | None:
+        now = time.time()
+        with self.lock:
+            self.db.execute("BEGIN IMMEDIATE")
+            try:
+                # Jobs that lost their worker too often are given up, they
+                # would take every worker that picks them down.
+                self.db.execute(
+                    "UPDATE jobs SET status = ?, updated_ts = ? "
+                    "WHERE status = ? AND lease_expires < ? "
+                    "AND attempts >= ?",
+                    (
+                        JobStatus.Failed.value,
+                        now,
+                        JobStatus.Leased.value,
+                        now,
+                        self.max_attempts,
+                    ),
+                )
+                row = self.db.execute(
+                    "SELECT id, created_at, pool_address, token_address, "
+                    "attempts FROM jobs WHERE status = ? "
+                    "OR (status = ? AND lease_expires < ?) "
+                    "ORDER BY id LIMIT 1",
+                    (JobStatus.Pending.value, JobStatus.Leased.value, now),
+                ).fetchone()
+                if row is not None:
+                    self.db.execute(
+                        "UPDATE jobs SET status = ?, owner = ?, "
+                        "lease_expires = ?, attempts = attempts + 1, "
+                        "updated_ts = ? WHERE id = ?",
+                        (
+                            JobStatus.Leased.value,
+                            owner,
+                            now + self.lease_seconds,
+                            now,
+                            row[0],
+                        ),
+                    )
+                self.db.execute("COMMIT")
+            except BaseException:
+                self.db.execute("ROLLBACK")
+                raise
+        if row is None:
+            return None
+        job_id, created_at, pool_address, token_address, attempts = row
+        return Job(
+            id=job_id,
+            created_at=created_at,
+            pool_address=pool_address,
+            token_address=token_address,
+            attempts=attempts + 1,
+        )
+
+    def renew(self, job_id: int, owner: str) -> bool:
+        return bool(
+            self._write(
+                "UPDATE jobs SET lease_expires = ? "
+                "WHERE id = ? AND owner = ? AND status = ?",
+                (
+                    time.time() + self.lease_seconds,
+                    job_id,
+                    owner,
+                    JobStatus.Leased.value,
+                ),
+            )
+        )
+
+    def complete(self, job_id: int, owner: str, result: str) -> bool:
+        # False when the lease was lost, another worker owns the job now.
+        return bool(
+            self._write(
+                "UPDATE jobs SET status = ?, result = ?, updated_ts = ? "
+                "WHERE id = ? AND owner = ? AND status = ?",
+                (
+                    JobStatus.Done.value,
+                    result,
+                    time.time(),
+                    job_id,
+                    owner,
+                    JobStatus.Leased.value,
+                ),
+            )
+        )
+
+    def release(self, job_id: int, owner: str) -> bool:
+        return bool(
+            self._write(
+                "UPDATE jobs SET status = ?, owner = NULL, "
+                "lease_expires = NULL, updated_ts = ? "
+                "WHERE id = ? AND owner = ? AND status = ?",
+                (
+                    JobStatus.Pending.value,
+                    time.time(),
+                    job_id,
+                    owner,
+                    JobStatus.Leased.value,
+                ),
+            )
+        )
+
+    def finished(self, limit: int = 100) -> list[tuple[Job, str]]:
+        with self.lock:
+            rows = self.db.execute(
+                "SELECT id, created_at, pool_address, token_address, "
+                "attempts, result FROM jobs WHERE status = ? "
+                "ORDER BY id LIMIT ?",
+                (JobStatus.Done.value, limit),
+            ).fetchall()
+        return [
+            (
+                Job(
+                    id=job_id,
+                    created_at=created_at,
+                    pool_address=pool_address,
+                    token_address=token_address,
+                    attempts=attempts,
+                ),
+                result,
+            )
+            for (
+                job_id,
+                created_at,
+                pool_address,
+                token_address,
+                attempts,
+                result,
+            ) in rows
+        ]
+
+    def failed(self, limit: int = 100) -> list[Job]:
+        with self.lock:
+            rows = self.db.execute(
+                "SELECT id, created_at, pool_address, token_address, "
+                "attempts FROM jobs WHERE status = ? ORDER BY id LIMIT ?",
+                (JobStatus.Failed.value, limit),
+            ).fetchall()
+        return [
+            Job(
+                id=job_id,
+                created_at=created_at,
+                pool_address=pool_address,
+                token_address=token_address,
+                attempts=attempts,
+            )
+            for job_id, created_at, pool_address, token_address, attempts in rows
+        ]
+
+    def remove(self, job_ids: list[int]) -> int:
+        with self.lock:
+            return self.db.executemany(
+                "DELETE FROM jobs WHERE id = ?", [(i,) for i in job_ids]
+            ).rowcount
+
+    def apply(self, job_id: int, message: str | None = None) -> bool:
+        # Marks a result as recorded, the message of a good token is
+        # queued for the sender at the same time.
+        now = time.time()
+        with self.lock:
+            self.db.execute("BEGIN IMMEDIATE")
+            try:
+                applied = self.db.execute(
+                    "UPDATE jobs SET status = ?, result = NULL, "
+                    "updated_ts = ? WHERE id = ? AND status = ?",
+                    (
+                        JobStatus.Applied.value,
+                        now,
+                        job_id,
+                        JobStatus.Done.value,
+                    ),
+                ).rowcount
+                if applied and message is not None:
+                    self.db.execute(
+                        "INSERT OR IGNORE INTO outbox "
+                        "(job_id, message, created_ts) VALUES (?, ?, ?)",
+                        (job_id, message, now),
+                    )
+                self.db.execute("COMMIT")
+            except BaseException:
+                self.db.execute("ROLLBACK")
+                raise
+        return bool(applied)
+
+    def pending_messages(self, limit: int = 20) -> list[tuple[int, str]]:
+        with self.lock:
+            return self.db.execute(
+                "SELECT id, message FROM outbox WHERE sent_ts IS NULL "
+                "ORDER BY id LIMIT ?",
+                (limit,),
+            ).fetchall()
+
+    def mark_sent(self, message_id: int) -> None:
+        self._write(
+            "UPDATE outbox SET sent_ts = ? WHERE id = ?",
+            (time.time(), message_id),
+        )
+
+    def counts(self) -> dict[str, int]:
+        with self.lock:
+            rows = self.db.execute(
+                "SELECT status, COUNT(*) FROM jobs GROUP BY status"
+            ).fetchall()
+        return dict(rows)
+
+    def purge(self, older_than: float = 86400.0) -> int:
+        threshold = time.time() - older_than
+        with self.lock:
+            purged = self.db.execute(
+                "DELETE FROM jobs WHERE status IN (?, ?) AND updated_ts < ?",
+                (JobStatus.Applied.value, JobStatus.Failed.value, threshold),
+            ).rowcount
+            self.db.execute(
+                "DELETE FROM outbox WHERE sent_ts < ?", (threshold,)
+            )
+        return purged
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+
+import argparse
+import asyncio
+import logging
+import os
+
+from dotenv import load_dotenv
+
+from cache import ResponseCache
+from classes import AsyncTon
+from clients import AsyncGeckoTerminalClient, AsyncTonViewerClient
+from functions import run_worker
+from rating import RatingEngine, load_rule_set
+from storage import ScanStore
+from work_queue import WorkQueue
+
+load_dotenv()
+
+# Each worker process gets its own TonAPI key and request budget, the
+# coordinator passes them through the environment.
+TON_VIEWER_API_KEY = os.getenv("TON_VIEWER_API_KEY")
+TON_VIEWER_URL = os.getenv("TON_VIEWER_URL", "https://tonapi.io/v2")
+TON_VIEWER_RPS = float(os.getenv("TON_VIEWER_RPS", 1))
+TON_VIEWER_MAX_RPS = float(os.getenv("TON_VIEWER_MAX_RPS", TON_VIEWER_RPS))
+GECKO_TERMINAL_URL = os.getenv(
+    "GECKO_TERMINAL_URL", "https://api.geckoterminal.com/api/v2"
+)
+GECKO_TERMINAL_RPS = float(os.getenv("GECKO_TERMINAL_RPS", 0.5))
+RESPONSE_CACHE_PATH = os.getenv("RESPONSE_CACHE_PATH")
+SCAN_STORE_PATH = os.getenv("SCAN_STORE_PATH", "scanned_tokens.db")
+WORK_QUEUE_PATH = os.getenv("WORK_QUEUE_PATH", "work_queue.db")
+WORK_LEASE_SECONDS = float(os.getenv("WORK_LEASE_SECONDS", 120))
+RATING_RULES_PATH = os.getenv("RATING_RULES_PATH")
+MAX_HOLDERS = int(os.getenv("MAX_HOLDERS", 0))
+# Set when the coordinator keeps scan features, see evaluate_pool.
+FULL_AIRDROP_HISTORY = os.getenv("FULL_AIRDROP_HISTORY") == "1"
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+)
+
+logging.getLogger("httpx").setLevel(logging.ERROR)
+
+
+def build_ton() -> AsyncTon:
+    cache = ResponseCache(path=RESPONSE_CACHE_PATH)
+    tv_client = AsyncTonViewerClient(
+        TON_VIEWER_URL,
+        auth=TON_VIEWER_API_KEY,
+        rate_limit=TON_VIEWER_RPS,
+        max_rate=TON_VIEWER_MAX_RPS,
+        cache=cache,
+    )
+    # Discovery stays with the coordinator, workers only read TonAPI.
+    gt_client = AsyncGeckoTerminalClient(
+        GECKO_TERMINAL_URL, rate_limit=GECKO_TERMINAL_RPS, cache=cache
+    )
+    return AsyncTon(
+        tv_client,
+        gt_client,
+        max_holders=MAX_HOLDERS or None,
+        rating_engine=(
+            RatingEngine(load_rule_set(RATING_RULES_PATH))
+            if RATING_RULES_PATH
+            else RatingEngine()
+        ),
+    )
+
+
+async def run(args: argparse.Namespace) -> None:
+    ton = build_ton()
+    store = ScanStore(SCAN_STORE_PATH)
+    queue = WorkQueue(WORK_QUEUE_PATH, lease_seconds=WORK_LEASE_SECONDS)
+    # A restarted shard must not pass for the process whose leases it
+    # inherits, so the pid is part of the owner.
+    name = f"{args.name}-{os.getpid()}"
+    logging.info(
+        f"Worker {name} scanning up to {args.concurrency} pools at once"
+    )
+    try:
+        await run_worker(
+            ton,
+            store,
+            queue,
+            name,
+            args.concurrency,
+            full_history=FULL_AIRDROP_HISTORY,
+        )
+    finally:
+        await ton.tv_client.aclose()
+        await ton.gt_client.aclose()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Scan pools claimed from the shared work queue"
+    )
+    parser.add_argument(
+        "--name", default="worker", help="Lease owner name prefix"
+    )
+    parser.add_argument(
+        "--concurrency",
+        default=4,
+        type=int,
+        help="Number of pools analysed concurrently",
+    )
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
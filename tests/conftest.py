@@ -0,0 +1,40 @@
+import os
+import sys
+
+import pytest
+
+# The modules import each other by their flat names, as when run from
+# jetton_check.
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.dirname(__file__)), "jetton_check")
+)
+
+import limiter  # noqa: E402
+from mock_api import MockApiServer, MockStreamServer  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def buckets(monkeypatch):
+    # Clients share one bucket per host, every mock server is 127.0.0.1.
+    monkeypatch.setattr(limiter, "_buckets", {})
+
+
+@pytest.fixture
+def api_server():
+    servers = []
+
+    def start(fixtures: dict[str, dict], **kwargs) -> MockApiServer:
+        server = MockApiServer(fixtures, **kwargs).start()
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.stop()
+
+
+@pytest.fixture
+def stream_server():
+    server = MockStreamServer(heartbeat=0.1).start()
+    yield server
+    server.stop()
@@ -0,0 +1,317 @@
+from classes import AsyncTon
+from clients import AsyncGeckoTerminalClient, AsyncTonViewerClient
+from models import (
+    Account,
+    JettonData,
+    JettonMaster,
+    JettonMetadata,
+    LiquidityState,
+    Wallet,
+)
+from recording import fixture_key, normalize_path
+
+TON_VIEWER = "tonapi.io/v2"
+GECKO_TERMINAL = "api.geckoterminal.com/api/v2"
+
+ZERO_ADDRESS = LiquidityState.Burned.value
+MASTER = "0:" + "a" * 64
+CREATOR = "0:" + "c" * 64
+CREATOR_WALLET = "0:" + "d" * 64
+POOL = "0:" + "b" * 64
+OTHER = "0:" + "f" * 64
+EVENTS_QUERY = "initiator=false&subject_only=false&limit=100"
+
+
+def address(n: int) -> str:
+    return f"0:{n:064x}"
+
+
+def api_fixture(
+    service: str,
+    path: str,
+    body: dict,
+    status_code: int = 200,
+    method: str = "GET",
+    data: dict | None = None,
+    headers: dict[str, str] | None = None,
+) -> dict:
+    return {
+        "key": fixture_key(service, method, path, data),
+        "service": service,
+        "method": method,
+        "path": normalize_path(path),
+        "data": data,
+        "status_code": status_code,
+        "headers": headers or {},
+        "body": body,
+    }
+
+
+def api_fixtures(*fixtures: dict) -> dict[str, dict]:
+    return {fixture["key"]: fixture for fixture in fixtures}
+
+
+def account_data(
+    address: str, name: str | None = None, is_wallet: bool = True
+) -> dict:
+    data = {"address": address, "is_scam": False, "is_wallet": is_wallet}
+    if name is not None:
+        data["name"] = name
+    return data
+
+
+def metadata(address: str = MASTER) -> dict:
+    return {
+        "address": address,
+        "name": "Test",
+        "symbol": "TST",
+        "decimals": 9,
+        "description": "Community token https://t.me/test",
+    }
+
+
+def transfer_event(
+    lt: int,
+    recipient: str,
+    amount: int,
+    sender: str = CREATOR,
+    recipient_name: str | None = None,
+    comment: str | None = None,
+) -> dict:
+    return {
+        "event_id": f"event-{lt}",
+        "account": account_data(sender),
+        "timestamp": 1700000000 + lt,
+        "lt": lt,
+        "is_scam": False,
+        "in_progress": False,
+        "actions": [
+            {
+                "type": "JettonTransfer",
+                "status": "ok",
+                "simple_preview": {},
+                "JettonTransfer": {
+                    "sender": account_data(sender),
+                    "recipient": account_data(recipient, recipient_name),
+                    "senders_wallet": address(lt),
+                    "recipients_wallet": address(lt + 1),
+                    "amount": str(amount),
+                    "comment": comment,
+                    "jetton": metadata(),
+                },
+            }
+        ],
+    }
+
+
+def wallet(
+    address: str,
+    balance: int,
+    name: str | None = None,
+    is_wallet: bool = True,
+) -> Wallet:
+    return Wallet(
+        account=Account(address=address, is_wallet=is_wallet, name=name),
+        jetton_wallet=f"{address}-wallet",
+        balance=balance,
+    )
+
+
+def jetton_master(
+    address: str = MASTER,
+    total_supply: int = 10**12,
+    admin_address: str = ZERO_ADDRESS,
+    creator_balance: int = 0,
+    holders: list[Wallet] | None = None,
+    used_cells: int = 50,
+) -> JettonMaster:
+    return JettonMaster(
+        account=Account(address=address, is_wallet=False),
+        admin_address=admin_address,
+        data=JettonData(
+            mintable=False,
+            total_supply=total_supply,
+            metadata=JettonMetadata(**metadata(address)),
+            verification="none",
+            holders_count=len(holders or []),
+        ),
+        used_cells=used_cells,
+        creator=wallet(CREATOR, creator_balance),
+        holders=holders or [],
+    )
+
+
+def creation_event(master: str = MASTER) -> dict:
+    # The mint that find_creator_datas reads the creator from.
+    def execution(contract: str, operation: str) -> dict:
+        return {
+            "type": "SmartContractExec",
+            "status": "ok",
+            "simple_preview": {},
+            "SmartContractExec": {
+                "executor": account_data(CREATOR),
+                "contract": account_data(contract, is_wallet=False),
+                "ton_attached": 1,
+                "operation": operation,
+            },
+        }
+
+    return {
+        "event_id": "event-mint",
+        "account": account_data(master, is_wallet=False),
+        "timestamp": 1700000000,
+        "lt": 1,
+        "is_scam": False,
+        "in_progress": False,
+        "actions": [
+            execution(CREATOR_WALLET, "JettonInternalTransfer"),
+            execution(master, "0x00000015"),
+        ],
+    }
+
+
+def master_fixtures(
+    address: str,
+    total_supply: int,
+    holders: list[tuple[str, int]],
+    events: list[dict],
+) -> list[dict]:
+    holder_datas = [
+        {
+            "address": f"{owner}-wallet",
+            "owner": account_data(owner),
+            "balance": str(balance),
+        }
+        for owner, balance in holders
+    ]
+    data = {
+        "mintable": False,
+        "total_supply": str(total_supply),
+        "metadata": metadata(address),
+        "verification": "none",
+        "holders_count": len(holders),
+    }
+    return [
+        api_fixture(TON_VIEWER, f"/jettons/{address}", data),
+        api_fixture(
+            TON_VIEWER,
+            f"/jettons/{address}/holders?limit=1000&offset=0",
+            {"addresses": holder_datas},
+        ),
+        api_fixture(
+            TON_VIEWER,
+            f"/accounts/{address}/events?{EVENTS_QUERY}",
+            {"events": events, "next_from": 0},
+        ),
+        api_fixture(
+            TON_VIEWER,
+            f"/blockchain/accounts/{address}",
+            {"storage": {"used_cells": 50}},
+        ),
+    ]
+
+
+def token_fixtures(
+    master: str = MASTER,
+    pool: str = POOL,
+    total_supply: int = 10**12,
+    holders: list[tuple[str, int]] | None = None,
+    history: list[dict] | None = None,
+    creator_balance: int = 0,
+    lp_holder: str = ZERO_ADDRESS,
+) -> list[dict]:
+    # TonAPI responses for a full scan of `master` and its pool, by
+    # default a token that passes the default rating.
+    holders = holders or [(address(i + 1), 10**11) for i in range(10)]
+    return [
+        *master_fixtures(master, total_supply, holders, [creation_event()]),
+        *master_fixtures(pool, 10**9, [(lp_holder, 10**9)], []),
+        api_fixture(
+            TON_VIEWER,
+            f"/blockchain/accounts/{master}/methods/get_jetton_data",
+            {"decoded": {"admin_address": ZERO_ADDRESS}},
+        ),
+        api_fixture(
+            TON_VIEWER,
+            f"/accounts/{CREATOR_WALLET}/events?{EVENTS_QUERY}",
+            {"events": [], "next_from": 0},
+        ),
+        api_fixture(
+            TON_VIEWER,
+            f"/blockchain/accounts/{CREATOR_WALLET}/methods/get_wallet_data",
+            {"decoded": {"balance": str(creator_balance)}},
+        ),
+        api_fixture(
+            TON_VIEWER,
+            f"/accounts/{CREATOR}/jettons/{master}/history?{EVENTS_QUERY}",
+            {"events": history or [], "next_from": 0},
+        ),
+        bulk_accounts_fixture(
+            [
+                account_data(master, is_wallet=False),
+                account_data(pool, is_wallet=False),
+                account_data(CREATOR),
+            ]
+        ),
+    ]
+
+
+def bulk_accounts_fixture(accounts: list[dict]) -> dict:
+    # MockApiServer answers any batch of accounts seen in bulk fixtures.
+    return api_fixture(
+        TON_VIEWER,
+        "/accounts/_bulk",
+        {"accounts": accounts},
+        method="POST",
+        data={"account_ids": [account["address"] for account in accounts]},
+    )
+
+
+def pool_data(
+    pool: str,
+    token: str,
+    created_at: str,
+    fdv_usd: str = "5000",
+    reserve_in_usd: str = "1000",
+) -> dict:
+    return {
+        "attributes": {
+            "address": pool,
+            "pool_created_at": created_at,
+            "fdv_usd": fdv_usd,
+            "reserve_in_usd": reserve_in_usd,
+        },
+        "relationships": {"base_token": {"data": {"id": f"ton_{token}"}}},
+    }
+
+
+def new_pools_fixture(pools: list[dict], page: int = 1) -> dict:
+    return api_fixture(
+        GECKO_TERMINAL, f"/networks/ton/new_pools?page={page}", {"data": pools}
+    )
+
+
+def pools_multi_fixture(pools: list[dict]) -> dict:
+    addresses = ",".join(pool["attributes"]["address"] for pool in pools)
+    return api_fixture(
+        GECKO_TERMINAL,
+        f"/networks/ton/pools/multi/{addresses}",
+        {"data": pools},
+    )
+
+
+def make_ton(server, **kwargs) -> AsyncTon:
+    # Clients against a MockApiServer, to be created inside the event loop
+    # and closed with close_ton.
+    tv_client = AsyncTonViewerClient(
+        server.service_url(TON_VIEWER), rate_limit=1000.0
+    )
+    gt_client = AsyncGeckoTerminalClient(
+        server.service_url(GECKO_TERMINAL), rate_limit=1000.0
+    )
+    return AsyncTon(tv_client, gt_client, **kwargs)
+
+
+async def close_ton(ton: AsyncTon) -> None:
+    await ton.tv_client.aclose()
+    await ton.gt_client.aclose()
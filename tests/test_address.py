@@ -0,0 +1,90 @@
+import pytest
+
+from address import (
+    AddressForm,
+    address_key,
+    convert_addresses,
+    is_valid_address,
+    parse_address,
+    to_bounceable,
+    to_non_bounceable,
+    to_raw,
+)
+
+STONFI_ROUTER = "EQB3ncyBUTjZUA5EnFKR5_EnOMI9V1tTEAAPaiU71gc4TiUt"
+STONFI_ROUTER_RAW = (
+    "0:779dcc815138d9500e449c5291e7f12738c23d575b5310000f6a253bd607384e"
+)
+STONFI_ROUTER_NON_BOUNCEABLE = (
+    "UQB3ncyBUTjZUA5EnFKR5_EnOMI9V1tTEAAPaiU71gc4Tnjo"
+)
+
+
+def test_friendly_to_raw():
+    assert to_raw(STONFI_ROUTER) == STONFI_ROUTER_RAW
+    assert to_raw(STONFI_ROUTER_NON_BOUNCEABLE) == STONFI_ROUTER_RAW
+
+
+def test_raw_to_friendly():
+    assert to_bounceable(STONFI_ROUTER_RAW) == STONFI_ROUTER
+    assert to_non_bounceable(STONFI_ROUTER_RAW) == (
+        STONFI_ROUTER_NON_BOUNCEABLE
+    )
+
+
+def test_standard_base64_is_accepted():
+    standard = STONFI_ROUTER.replace("_", "/").replace("-", "+")
+    assert to_raw(standard) == STONFI_ROUTER_RAW
+    assert parse_address(STONFI_ROUTER).to_friendly(url_safe=False) == (
+        standard
+    )
+
+
+def test_flags_and_workchain():
+    address = parse_address(STONFI_ROUTER_NON_BOUNCEABLE)
+    assert address.workchain == 0
+    assert not address.bounceable
+    assert not address.testnet
+
+    masterchain = parse_address(
+        "Ef8AAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAADAU"
+    )
+    assert masterchain.workchain == -1
+    assert masterchain.to_raw() == "-1:" + "0" * 64
+
+    testnet = parse_address(
+        parse_address(STONFI_ROUTER).to_friendly(testnet=True)
+    )
+    assert testnet.testnet
+    assert testnet.to_raw() == STONFI_ROUTER_RAW
+
+
+@pytest.mark.parametrize(
+    "address",
+    [
+        "",
+        "not an address",
+        STONFI_ROUTER[:-1] + "A",
+        "0:" + "0" * 63,
+        "128:" + "0" * 64,
+    ],
+)
+def test_invalid_addresses(address):
+    assert not is_valid_address(address)
+    with pytest.raises(ValueError):
+        parse_address(address)
+
+
+def test_address_key():
+    assert address_key(STONFI_ROUTER) == STONFI_ROUTER_RAW
+    assert address_key(STONFI_ROUTER_NON_BOUNCEABLE) == STONFI_ROUTER_RAW
+    assert address_key("No owners") == "No owners"
+
+
+def test_convert_addresses():
+    addresses = [STONFI_ROUTER_RAW, "invalid", STONFI_ROUTER]
+    assert convert_addresses(
+        addresses, AddressForm.NonBounceable, strict=False
+    ) == [STONFI_ROUTER_NON_BOUNCEABLE, STONFI_ROUTER_NON_BOUNCEABLE]
+    with pytest.raises(ValueError):
+        convert_addresses(addresses, AddressForm.Raw)
@@ -0,0 +1,175 @@
+import asyncio
+
+from airdrops import AirdropAggregator
+from classes import AsyncTon
+from clients import AsyncTonViewerClient
+from models import decode_event
+
+from tests.factories import (
+    CREATOR,
+    MASTER,
+    OTHER,
+    TON_VIEWER,
+    address,
+    api_fixture,
+    api_fixtures,
+    jetton_master,
+    transfer_event,
+    wallet,
+)
+
+TOTAL_SUPPLY = 10**12
+HISTORY = f"/accounts/{CREATOR}/jettons/{MASTER}/history"
+HISTORY_QUERY = "initiator=false&subject_only=false&limit=100"
+
+# Newest first, as TonAPI returns the history.
+history = [
+    transfer_event(110, address(1), 5 * 10**10),
+    transfer_event(109, address(2), 10**10, recipient_name="Dedust Vault"),
+    transfer_event(108, address(1), 5 * 10**10),
+    transfer_event(107, address(3), 10**10, comment="Call: DedustSwap"),
+    transfer_event(106, address(4), 10**10, sender=OTHER),
+    transfer_event(105, address(5), 10**11),
+    transfer_event(104, address(6), 10**11),
+]
+
+
+def holders():
+    return [
+        wallet(address(1), 10**11),
+        wallet(address(5), 10**11),
+        wallet(address(7), 10**11, name="Stonfi Router", is_wallet=False),
+    ]
+
+
+def events(payloads=history):
+    return [decode_event(payload) for payload in payloads]
+
+
+def test_creator_transfers_are_summed():
+    master = jetton_master(total_supply=TOTAL_SUPPLY, holders=holders())
+    aggregator = AirdropAggregator(master).consume(events())
+    receivers, total = aggregator.result()
+
+    assert receivers == {
+        address(1): {"amount": 10**11, "name": None},
+        address(5): {"amount": 10**11, "name": None},
+        address(6): {"amount": 10**11, "name": None},
+    }
+    assert total == 3 * 10**11
+    assert aggregator.percent() == 30.0
+    # Transfers to DEX contracts are kept, only not counted.
+    assert aggregator.receivers[address(2)]["name"] == "Dedust Vault"
+    assert [h.airdrop_amount for h in master.holders] == [
+        10**11,
+        10**11,
+        0,
+    ]
+    assert aggregator.newest_lt == 110
+    assert not aggregator.stopped
+
+
+def test_holder_names_are_used():
+    master = jetton_master(total_supply=TOTAL_SUPPLY, holders=holders())
+    aggregator = AirdropAggregator(master).consume(
+        events([transfer_event(100, address(7), 10**10)])
+    )
+    assert aggregator.result() == ({}, 0)
+    assert master.holders[2].airdrop_amount == 10**10
+
+
+def test_top_ten_sees_airdrop_amounts():
+    master = jetton_master(total_supply=TOTAL_SUPPLY, holders=holders())
+    before = master.build_top_ten_message()
+    AirdropAggregator(master).consume(events())
+    assert master.build_top_ten_message() != before
+    assert "(Airdrop 10.0%)" in master.build_top_ten_message()
+
+
+def test_stop_percent():
+    master = jetton_master(total_supply=TOTAL_SUPPLY)
+    aggregator = AirdropAggregator(master, stop_percent=15.0)
+    aggregator.consume(events())
+    assert aggregator.stopped
+    assert aggregator.events == 6
+    assert aggregator.percent() == 20.0
+
+
+def test_rescan_continues_from_receivers():
+    full = AirdropAggregator(jetton_master(total_supply=TOTAL_SUPPLY))
+    full.consume(events())
+
+    older = AirdropAggregator(jetton_master(total_supply=TOTAL_SUPPLY))
+    older.consume(events(history[3:]))
+    master = jetton_master(total_supply=TOTAL_SUPPLY, holders=holders())
+    rescan = AirdropAggregator(
+        master, older.receivers, after_lt=older.newest_lt
+    )
+    rescan.consume(events())
+
+    assert rescan.events == 3
+    assert rescan.result() == full.result()
+    assert rescan.receivers == full.receivers
+    assert master.holders[0].airdrop_amount == 10**11
+
+
+def history_server(api_server):
+    pages = [history[:4], history[4:]]
+    return api_server(
+        api_fixtures(
+            api_fixture(
+                TON_VIEWER,
+                f"{HISTORY}?{HISTORY_QUERY}",
+                {"events": pages[0], "next_from": pages[0][-1]["lt"]},
+            ),
+            api_fixture(
+                TON_VIEWER,
+                f"{HISTORY}?{HISTORY_QUERY}&before_lt={pages[0][-1]['lt']}",
+                {"events": pages[1], "next_from": 0},
+            ),
+        )
+    )
+
+
+def scan(server, stop_percent=None, **kwargs):
+    async def run():
+        client = AsyncTonViewerClient(
+            server.service_url(TON_VIEWER), rate_limit=100.0
+        )
+        ton = AsyncTon(client, None, **kwargs)
+        master = jetton_master(total_supply=TOTAL_SUPPLY, holders=holders())
+        try:
+            return await ton.scan_airdrops(master, stop_percent=stop_percent)
+        finally:
+            await client.aclose()
+
+    return asyncio.run(run())
+
+
+def test_history_pages_from_the_api(api_server):
+    server = history_server(api_server)
+    aggregator = scan(server)
+    assert (
+        aggregator.result()
+        == AirdropAggregator(jetton_master(total_supply=TOTAL_SUPPLY))
+        .consume(events())
+        .result()
+    )
+    assert server.requests[TON_VIEWER] == 2
+    assert not server.missing
+
+
+def test_early_stop_skips_remaining_pages(api_server):
+    server = history_server(api_server)
+    aggregator = scan(server, stop_percent=5.0)
+    assert aggregator.stopped
+    assert aggregator.percent() == 10.0
+    assert server.requests[TON_VIEWER] == 1
+
+
+def test_page_limit(api_server):
+    server = history_server(api_server)
+    aggregator = scan(server, max_event_pages=1)
+    assert aggregator.events == 4
+    assert aggregator.result()[1] == 10**11
+    assert server.requests[TON_VIEWER] == 1
@@ -0,0 +1,91 @@
+import json
+
+import pytest
+
+from backtest import backtest, load_labels
+from features import FeatureStore, columns
+from models import LiquidityState
+from rating import DEFAULT_RULES, RuleSet, liquidity_codes
+
+BURNED = liquidity_codes[LiquidityState.Burned]
+NOT_SAFE = liquidity_codes[LiquidityState.NotSafe]
+
+
+def passing(token: str, **values) -> dict:
+    # Passes the default rules unless values change that.
+    return {
+        **{name: 0 for name in columns},
+        "token_address": token.encode(),
+        "admin_revoked": True,
+        "liquidity_state": BURNED,
+        **values,
+    }
+
+
+STRICT = RuleSet(
+    name="strict",
+    threshold=DEFAULT_RULES.threshold,
+    rules=[
+        (
+            rule.model_copy(update={"value": 10.0})
+            if rule.feature == "airdrop_percent"
+            else rule
+        )
+        for rule in DEFAULT_RULES.rules
+    ],
+)
+
+
+@pytest.fixture
+def directory(tmp_path):
+    store = FeatureStore(str(tmp_path))
+    store.append(
+        [
+            # A passes on its rescan only, alerts count tokens once.
+            passing("EQa", admin_revoked=False),
+            passing("EQa"),
+            passing("EQa"),
+            passing("EQb", airdrop_percent=15.0),
+            passing("EQc", liquidity_state=NOT_SAFE),
+            passing("EQd", airdrop_percent=5.0, airdrop_stopped=True),
+        ]
+    )
+    store.close()
+    return str(tmp_path)
+
+
+LABELS = {"EQa": True, "EQb": False, "EQc": True}
+
+
+def test_rule_sets_are_compared_to_the_baseline(directory):
+    default, strict = backtest(
+        directory, [DEFAULT_RULES, STRICT], labels=LABELS, workers=2
+    )
+
+    assert (default.rows, default.tokens, default.alerts) == (6, 4, 3)
+    assert (default.labeled_alerts, default.hits) == (2, 1)
+    assert default.hit_rate == 0.5
+    assert default.recall == 0.5
+    assert default.baseline_shared == 3
+    assert default.baseline_added == default.baseline_dropped == 0
+    assert default.lower_bound_passes == 1
+    assert default.rule_matches["admin_revoked"] == 5
+
+    assert strict.name == "strict"
+    assert strict.alerts == 2
+    assert (strict.hits, strict.hit_rate) == (1, 1.0)
+    assert strict.baseline_shared == 2
+    assert (strict.baseline_added, strict.baseline_dropped) == (0, 1)
+
+
+def test_without_labels(directory):
+    [result] = backtest(directory, [DEFAULT_RULES], workers=1)
+    assert result.hit_rate is None
+    assert result.recall is None
+    assert result.labeled_alerts == 0
+
+
+def test_load_labels(tmp_path):
+    path = tmp_path / "labels.json"
+    path.write_text(json.dumps({"EQa": 1, "EQb": 0}))
+    assert load_labels(str(path)) == {"EQa": True, "EQb": False}
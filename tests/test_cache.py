@@ -0,0 +1,151 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+import cache
+from cache import ResponseCache
+from clients import AsyncTonViewerClient
+
+from tests.factories import (
+    MASTER,
+    TON_VIEWER,
+    api_fixture,
+    api_fixtures,
+    metadata,
+)
+
+KEY = "GET https://tonapi.io/v2/jettons/EQtoken"
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = SimpleNamespace(now=1000.0)
+    monkeypatch.setattr(cache, "time", SimpleNamespace(time=lambda: clock.now))
+    return clock
+
+
+def test_hits_are_copies():
+    response_cache = ResponseCache()
+    response = {"decoded": {"admin_address": None}}
+    response_cache.set("method_get_jetton_data", KEY, response)
+    response["decoded"]["admin_address"] = "changed"
+
+    hit = response_cache.get("method_get_jetton_data", KEY)
+    assert hit == {"decoded": {"admin_address": None}}
+    hit["decoded"]["admin_address"] = "changed"
+    assert response_cache.get("method_get_jetton_data", KEY) == {
+        "decoded": {"admin_address": None}
+    }
+
+
+def test_disk_hits_are_copies(tmp_path):
+    path = str(tmp_path / "cache.db")
+    ResponseCache(path=path).set("parse_account", KEY, {"raw_form": "0:a"})
+
+    response_cache = ResponseCache(path=path)
+    response_cache.get("parse_account", KEY)["raw_form"] = "changed"
+    assert response_cache.get("parse_account", KEY) == {"raw_form": "0:a"}
+    assert response_cache.stats()["parse_account"] == {
+        "hits": 1,
+        "disk_hits": 1,
+        "misses": 0,
+    }
+
+
+def test_jetton_data_expires_within_a_minute(clock):
+    response_cache = ResponseCache()
+    response_cache.set("jetton_data", KEY, {"mintable": False})
+    clock.now += 60
+    assert response_cache.get("jetton_data", KEY) is not None
+    clock.now += 1
+    assert response_cache.get("jetton_data", KEY) is None
+
+
+def fetch_twice(server, response_cache, clock=None, wait=0.0):
+    async def run():
+        client = AsyncTonViewerClient(
+            server.service_url(TON_VIEWER),
+            rate_limit=100.0,
+            cache=response_cache,
+        )
+        try:
+            first = await client.get_jetton_data(MASTER)
+            if clock is not None:
+                clock.now += wait
+            await client.get_jetton_data(MASTER)
+            await client.get_jetton_holders(MASTER)
+            await client.get_jetton_holders(MASTER)
+            return first
+        finally:
+            await client.aclose()
+
+    return asyncio.run(run())
+
+
+@pytest.fixture
+def server(api_server):
+    data = {
+        "mintable": False,
+        "total_supply": "1000",
+        "metadata": metadata(),
+        "verification": "none",
+        "holders_count": 1,
+    }
+    return api_server(
+        api_fixtures(
+            api_fixture(TON_VIEWER, f"/jettons/{MASTER}", data),
+            api_fixture(
+                TON_VIEWER,
+                f"/jettons/{MASTER}/holders?limit=1000&offset=0",
+                {"addresses": []},
+            ),
+        )
+    )
+
+
+def test_clients_use_the_cache(server, clock):
+    fetch_twice(server, ResponseCache(), clock, wait=30)
+    # Holders are never cached.
+    assert server.requests[TON_VIEWER] == 3
+
+    server.requests.clear()
+    fetch_twice(server, ResponseCache(), clock, wait=61)
+    assert server.requests[TON_VIEWER] == 4
+
+
+def test_responses_survive_restarts(server, tmp_path):
+    path = str(tmp_path / "cache.db")
+    fetch_twice(server, ResponseCache(path=path))
+    server.requests.clear()
+
+    response_cache = ResponseCache(path=path)
+    data = fetch_twice(server, response_cache)
+    assert data.holders_count == 1
+    assert server.requests[TON_VIEWER] == 2
+    assert response_cache.stats()["jetton_data"] == {
+        "hits": 1,
+        "disk_hits": 1,
+        "misses": 0,
+    }
+
+
+def test_expired_rows_are_dropped_on_open(tmp_path, clock):
+    path = str(tmp_path / "cache.db")
+    ResponseCache(path=path).set("jetton_data", KEY, {"mintable": False})
+    clock.now += 61
+    response_cache = ResponseCache(path=path)
+    assert response_cache.db.execute(
+        "SELECT COUNT(*) FROM responses"
+    ).fetchone() == (0,)
+
+
+def test_admin_ttl_depends_on_revocation(clock):
+    response_cache = ResponseCache()
+    revoked = {"decoded": {"admin_address": cache.ZERO_ADDRESS}}
+    active = {"decoded": {"admin_address": "0:" + "1" * 64}}
+    response_cache.set("method_get_jetton_data", "revoked", revoked)
+    response_cache.set("method_get_jetton_data", "active", active)
+    clock.now += 61
+    assert response_cache.get("method_get_jetton_data", "revoked") == revoked
+    assert response_cache.get("method_get_jetton_data", "active") is None
@@ -0,0 +1,131 @@
+import asyncio
+
+import pytest
+
+from address import to_bounceable
+from clients import AsyncTonViewerClient
+from coalescer import BulkCoalescer
+
+from tests.factories import (
+    TON_VIEWER,
+    account_data,
+    address,
+    api_fixture,
+    api_fixtures,
+    bulk_accounts_fixture,
+)
+
+
+def recording_fetch(batches: list, error: Exception | None = None):
+    async def fetch_many(keys: list[str]) -> dict[str, str]:
+        batches.append(keys)
+        if error is not None:
+            raise error
+        return {key: key.upper() for key in keys if key != "missing"}
+
+    return fetch_many
+
+
+def test_lookups_in_the_window_are_batched():
+    batches = []
+    coalescer = BulkCoalescer(recording_fetch(batches), window=0.01)
+
+    async def run():
+        return await asyncio.gather(
+            *(coalescer.get(key) for key in ["a", "b", "a", "c"])
+        )
+
+    assert asyncio.run(run()) == ["A", "B", "A", "C"]
+    assert batches == [["a", "b", "c"]]
+
+
+def test_full_batches_are_sent_at_once():
+    batches = []
+    coalescer = BulkCoalescer(recording_fetch(batches), window=10, max_batch=2)
+
+    async def run():
+        first = await asyncio.gather(coalescer.get("a"), coalescer.get("b"))
+        coalescer.window = 0.01
+        return first + [await coalescer.get("c")]
+
+    assert asyncio.run(run()) == ["A", "B", "C"]
+    assert batches == [["a", "b"], ["c"]]
+
+
+def test_errors_and_missing_keys():
+    batches = []
+    coalescer = BulkCoalescer(recording_fetch(batches), window=0.01)
+
+    async def run():
+        return await asyncio.gather(
+            coalescer.get("a"),
+            coalescer.get("missing"),
+            return_exceptions=True,
+        )
+
+    found, missing = asyncio.run(run())
+    assert found == "A"
+    assert isinstance(missing, KeyError)
+
+    failing = BulkCoalescer(
+        recording_fetch(batches, ValueError("down")), window=0.01
+    )
+
+    async def run_failing():
+        return await asyncio.gather(
+            failing.get("a"), failing.get("b"), return_exceptions=True
+        )
+
+    assert all(isinstance(e, ValueError) for e in asyncio.run(run_failing()))
+
+
+ACCOUNTS = [account_data(address(n), is_wallet=False) for n in range(3)]
+
+
+def get_accounts(server, addresses, **kwargs):
+    async def run():
+        client = AsyncTonViewerClient(
+            server.service_url(TON_VIEWER), rate_limit=100.0, **kwargs
+        )
+        try:
+            return await asyncio.gather(*map(client.get_account, addresses))
+        finally:
+            await client.aclose()
+
+    return asyncio.run(run())
+
+
+def test_account_lookups_share_a_bulk_request(api_server):
+    server = api_server(api_fixtures(bulk_accounts_fixture(ACCOUNTS)))
+    # Friendly and raw forms of one address are one lookup.
+    addresses = [address(0), to_bounceable(address(0)), address(1)]
+    accounts = get_accounts(server, addresses)
+
+    assert [account.address for account in accounts] == [
+        address(0),
+        address(0),
+        address(1),
+    ]
+    assert accounts[0] is not accounts[1]
+    assert server.requests[TON_VIEWER] == 1
+
+
+def test_coalescing_can_be_turned_off(api_server):
+    server = api_server(
+        api_fixtures(
+            *(
+                api_fixture(
+                    TON_VIEWER, f"/accounts/{account['address']}", account
+                )
+                for account in ACCOUNTS
+            )
+        )
+    )
+    accounts = get_accounts(
+        server, [address(0), address(1)], coalesce_window=None
+    )
+    assert [account.address for account in accounts] == [
+        address(0),
+        address(1),
+    ]
+    assert server.requests[TON_VIEWER] == 2
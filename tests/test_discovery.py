@@ -0,0 +1,134 @@
+import asyncio
+import time
+from datetime import datetime, timedelta, UTC
+
+import pytest
+
+from functions import iter_pools_to_scan
+from models import PoolWatermark, ScanStats
+from storage import ScanStore
+
+from tests.factories import (
+    GECKO_TERMINAL,
+    api_fixtures,
+    close_ton,
+    make_ton,
+    new_pools_fixture,
+    pool_data,
+    pools_multi_fixture,
+)
+
+NOW = datetime.now(UTC)
+
+
+def new_pool(n: int, fdv_usd: str = "5000") -> dict:
+    created_at = (NOW - timedelta(minutes=n)).strftime("%Y-%m-%dT%H:%M:%SZ")
+    return pool_data(f"EQpool{n}", f"EQtoken{n}", created_at, fdv_usd)
+
+
+def pool_key(n: int) -> tuple[str, str, str]:
+    attributes = new_pool(n)["attributes"]
+    return attributes["pool_created_at"], f"EQpool{n}", f"EQtoken{n}"
+
+
+# Three pages of two pools, newest first. Pool 3 fails the fdv prefilter.
+PAGES = [[new_pool(0), new_pool(1)], [new_pool(2), new_pool(3, "100")]]
+PAGES.append([new_pool(4), new_pool(5)])
+
+
+def page_fixtures(pages=PAGES) -> list[dict]:
+    return [
+        new_pools_fixture(pools, page=page)
+        for page, pools in enumerate(pages, start=1)
+    ]
+
+
+@pytest.fixture
+def store(tmp_path):
+    return ScanStore(str(tmp_path / "scanned_tokens.db"))
+
+
+def discover(server, watermark, pages=3):
+    async def run():
+        ton = make_ton(server)
+        rejected = []
+        try:
+            pools = [
+                pool
+                async for pool in ton.iter_new_pools(
+                    pages, watermark, rejected=rejected
+                )
+            ]
+            return pools, rejected
+        finally:
+            await close_ton(ton)
+
+    return asyncio.run(run())
+
+
+def test_paging_stops_at_the_watermark(api_server):
+    server = api_server(api_fixtures(*page_fixtures()))
+    watermark = PoolWatermark()
+    pools, rejected = discover(server, watermark)
+    assert pools == [pool_key(n) for n in (0, 1, 2, 4, 5)]
+    assert rejected == [pool_key(3)]
+    assert watermark.created_at == pool_key(0)[0]
+    assert server.requests[GECKO_TERMINAL] == 3
+
+    # Nothing new, the first page reaches the watermark.
+    assert discover(server, watermark) == ([], [])
+    assert server.requests[GECKO_TERMINAL] == 4
+
+
+def test_only_pools_above_the_watermark_are_new(api_server):
+    watermark = PoolWatermark()
+    watermark.advance(*pool_key(1)[:2])
+    server = api_server(api_fixtures(*page_fixtures()))
+    pools, _ = discover(server, watermark)
+    assert pools == [pool_key(0)]
+    assert server.requests[GECKO_TERMINAL] == 1
+
+
+def test_the_backlog_is_fetched_concurrently(api_server):
+    server = api_server(api_fixtures(*page_fixtures()), latency=0.2)
+    start = time.perf_counter()
+    discover(server, PoolWatermark())
+    # Page 1 alone, then pages 2 and 3 together.
+    assert time.perf_counter() - start < 0.6
+    assert server.requests[GECKO_TERMINAL] == 3
+
+
+def scan_cycle(server, store, watermark, stats):
+    async def run():
+        ton = make_ton(server)
+        try:
+            return [
+                pool
+                async for pool in iter_pools_to_scan(
+                    ton, 3, store, watermark, stats
+                )
+            ]
+        finally:
+            await close_ton(ton)
+
+    return asyncio.run(run())
+
+
+def test_rejected_pools_are_checked_again(api_server, store):
+    grown = new_pool(3, "5000")
+    server = api_server(
+        api_fixtures(*page_fixtures(), pools_multi_fixture([grown]))
+    )
+    watermark = PoolWatermark()
+    stats = ScanStats()
+    assert pool_key(3) not in scan_cycle(server, store, watermark, stats)
+    assert store.pending_candidates() == [pool_key(3)]
+
+    # Not due before the recheck interval.
+    stats = ScanStats()
+    assert scan_cycle(server, store, watermark, stats) == []
+
+    store.recheck_interval = timedelta(0)
+    stats = ScanStats()
+    assert scan_cycle(server, store, watermark, stats) == [pool_key(3)]
+    assert stats.candidates == 1
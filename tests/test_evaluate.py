@@ -0,0 +1,108 @@
+import asyncio
+
+import pytest
+
+from functions import evaluate_pool
+from storage import ScanStore
+
+from tests.factories import (
+    MASTER,
+    POOL,
+    address,
+    api_fixtures,
+    close_ton,
+    make_ton,
+    token_fixtures,
+    transfer_event,
+)
+
+CREATED_AT = "2024-05-01T10:00:00Z"
+
+# Four creator transfers of 10% each, newest first.
+history = [transfer_event(100 - i, address(20 + i), 10**11) for i in range(4)]
+
+
+@pytest.fixture
+def store(tmp_path):
+    return ScanStore(str(tmp_path / "scanned_tokens.db"))
+
+
+def evaluate(server, store=None, **kwargs):
+    async def run():
+        ton = make_ton(server)
+        try:
+            return await evaluate_pool(
+                ton, CREATED_AT, POOL, MASTER, store, **kwargs
+            )
+        finally:
+            await close_ton(ton)
+
+    return asyncio.run(run())
+
+
+def test_airdrop_stops_at_the_rating_bound(api_server):
+    server = api_server(api_fixtures(*token_fixtures(history=history)))
+    scan = evaluate(server)
+    assert scan.error is None
+    assert not server.missing
+    # Past the 20% bound of the default rules the token cannot pass.
+    assert scan.airdrop_stopped
+    assert scan.total_airdrop_percent == 30.0
+
+
+def test_full_history_reads_every_transfer(api_server):
+    server = api_server(api_fixtures(*token_fixtures(history=history)))
+    scan = evaluate(server, full_history=True)
+    assert not scan.airdrop_stopped
+    assert scan.total_airdrop_percent == 40.0
+    assert scan.features["airdrop_percent"] == 40.0
+
+
+def test_stopped_snapshots_are_not_continued_for_full_history(
+    api_server, store
+):
+    server = api_server(api_fixtures(*token_fixtures(history=history)))
+    store.save_snapshot(MASTER, CREATED_AT, evaluate(server).snapshot)
+
+    rescan = evaluate(server, store)
+    assert rescan.incremental
+    assert rescan.airdrop_stopped
+
+    full = evaluate(server, store, full_history=True)
+    assert not full.incremental
+    assert full.total_airdrop_percent == 40.0
+
+
+def test_rescans_apply_changes_to_the_snapshot(api_server, store):
+    first = api_server(api_fixtures(*token_fixtures(history=history[2:])))
+    store.save_snapshot(MASTER, CREATED_AT, evaluate(first).snapshot)
+
+    # Two newer transfers and a holder that sold since the first scan.
+    holders = [(address(i + 1), 10**11) for i in range(10)]
+    holders[0] = (address(1), 5 * 10**10)
+    changed = api_fixtures(*token_fixtures(holders=holders, history=history))
+    rescan_server = api_server(changed)
+    rescan = evaluate(rescan_server, store, full_history=True)
+    full_server = api_server(changed)
+    full = evaluate(full_server, full_history=True)
+
+    assert rescan.incremental
+    assert rescan.total_airdrop_percent == full.total_airdrop_percent == 40.0
+    assert rescan.features == full.features
+    assert rescan.snapshot.history_lt == 100
+    assert rescan.jetton_master.holders == full.jetton_master.holders
+    assert not rescan_server.missing
+    # No creator lookup, events of the masters or contract sizes.
+    assert (
+        sum(rescan_server.requests.values())
+        < sum(full_server.requests.values()) / 2
+    )
+
+
+def test_snapshots_of_another_pool_are_not_used(api_server, store):
+    server = api_server(api_fixtures(*token_fixtures()))
+    snapshot = evaluate(server).snapshot
+    store.save_snapshot(
+        MASTER, CREATED_AT, snapshot.model_copy(update={"pool_address": "x"})
+    )
+    assert not evaluate(server, store).incremental
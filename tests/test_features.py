@@ -0,0 +1,138 @@
+import asyncio
+import json
+import os
+from datetime import datetime, UTC
+
+import numpy as np
+import pytest
+
+from features import FeatureStore, column_path, columns, load_features
+from functions import process_new_pools
+from storage import ScanStore
+
+from tests.factories import (
+    MASTER,
+    POOL,
+    address,
+    api_fixtures,
+    close_ton,
+    make_ton,
+    new_pools_fixture,
+    pool_data,
+    token_fixtures,
+    transfer_event,
+)
+
+
+def row(token: str = "EQtoken", **values) -> dict:
+    return {
+        **{name: 0 for name in columns},
+        "token_address": token.encode(),
+        **values,
+    }
+
+
+def test_rows_round_trip(tmp_path):
+    store = FeatureStore(str(tmp_path))
+    assert store.append([row("EQa", rating=4.0), row("EQb", rating=2.0)]) == 2
+    assert store.append([]) == 0
+    store.close()
+
+    features = load_features(str(tmp_path), ["token_address", "rating"])
+    assert features["token_address"].tolist() == [b"EQa", b"EQb"]
+    assert features["rating"].tolist() == [4.0, 2.0]
+    assert isinstance(features["rating"], np.memmap)
+    assert len(FeatureStore(str(tmp_path))) == 2
+
+
+def test_empty_stores_load(tmp_path):
+    FeatureStore(str(tmp_path)).close()
+    assert load_features(str(tmp_path))["rating"].shape == (0,)
+
+
+def test_torn_appends_are_cut_off(tmp_path):
+    store = FeatureStore(str(tmp_path))
+    store.append([row()])
+    store.close()
+    # A crash after writing some of the columns of a second row.
+    with open(column_path(str(tmp_path), "rating"), "ab") as f:
+        f.write(np.float64(5).tobytes())
+
+    assert len(load_features(str(tmp_path))["rating"]) == 1
+    store = FeatureStore(str(tmp_path))
+    assert len(store) == 1
+    store.append([row(rating=3.0)])
+    store.close()
+    assert load_features(str(tmp_path))["rating"].tolist() == [0.0, 3.0]
+
+
+def test_new_columns_are_zero_filled(tmp_path):
+    store = FeatureStore(str(tmp_path))
+    store.append([row(incremental=True)] * 2)
+    store.close()
+    schema_path = os.path.join(str(tmp_path), "schema.json")
+    with open(schema_path) as f:
+        schema = json.load(f)
+    del schema["incremental"]
+    with open(schema_path, "w") as f:
+        json.dump(schema, f)
+    os.remove(column_path(str(tmp_path), "incremental"))
+
+    FeatureStore(str(tmp_path)).close()
+    assert load_features(str(tmp_path))["incremental"].tolist() == [
+        False,
+        False,
+    ]
+
+
+def test_changed_columns_are_refused(tmp_path):
+    FeatureStore(str(tmp_path)).close()
+    with open(os.path.join(str(tmp_path), "schema.json"), "w") as f:
+        json.dump({**columns, "rating": "float32"}, f)
+    with pytest.raises(ValueError):
+        FeatureStore(str(tmp_path))
+
+
+def test_scans_are_stored_with_the_full_airdrop(api_server, tmp_path):
+    created_at = datetime.now(UTC).strftime("%Y-%m-%dT%H:%M:%SZ")
+    history = [
+        transfer_event(100 - i, address(20 + i), 10**11) for i in range(4)
+    ]
+    server = api_server(
+        api_fixtures(
+            new_pools_fixture([pool_data(POOL, MASTER, created_at)]),
+            *token_fixtures(history=history),
+        )
+    )
+    features = FeatureStore(str(tmp_path / "features"))
+
+    async def run():
+        ton = make_ton(server)
+        try:
+            return await process_new_pools(
+                ton,
+                None,
+                None,
+                1,
+                ScanStore(str(tmp_path / "scanned_tokens.db")),
+                features=features,
+            )
+        finally:
+            await close_ton(ton)
+
+    stats = asyncio.run(run())
+    features.close()
+    assert stats.analysed == 1
+    stored = load_features(str(tmp_path / "features"))
+    assert stored["token_address"].tolist() == [MASTER.encode()]
+    assert stored["airdrop_percent"].tolist() == [40.0]
+    assert stored["airdrop_receivers"].tolist() == [4]
+    assert not stored["airdrop_stopped"][0]
+    assert stored["holders_count"].tolist() == [10]
+    assert stored["rating"].tolist() == [3.0]
+    assert (
+        stored["created_ts"][0]
+        == datetime.strptime(created_at, "%Y-%m-%dT%H:%M:%SZ")
+        .replace(tzinfo=UTC)
+        .timestamp()
+    )
@@ -0,0 +1,92 @@
+import asyncio
+
+from classes import AsyncTon
+from clients import AsyncTonViewerClient
+
+from tests.factories import (
+    MASTER,
+    TON_VIEWER,
+    address,
+    api_fixture,
+    api_fixtures,
+    metadata,
+)
+
+TOTAL_SUPPLY = 10**12
+
+
+def holder_pages(balances: list[int], page_size: int = 1000) -> list[dict]:
+    holders = [
+        {
+            "address": address(10**6 + i),
+            "owner": {
+                "address": address(i),
+                "is_scam": False,
+                "is_wallet": True,
+            },
+            "balance": str(balance),
+        }
+        for i, balance in enumerate(balances)
+    ]
+    fixtures = [
+        api_fixture(
+            TON_VIEWER,
+            f"/jettons/{MASTER}/holders?limit={page_size}&offset={offset}",
+            {"addresses": holders[offset : offset + page_size]},
+        )
+        for offset in range(0, len(holders) + 1, page_size)
+    ]
+    jetton = {
+        "mintable": False,
+        "total_supply": str(TOTAL_SUPPLY),
+        "metadata": metadata(),
+        "verification": "none",
+        "holders_count": len(holders),
+    }
+    return fixtures + [api_fixture(TON_VIEWER, f"/jettons/{MASTER}", jetton)]
+
+
+def read_holders(server, **kwargs):
+    async def run():
+        client = AsyncTonViewerClient(
+            server.service_url(TON_VIEWER), rate_limit=100.0
+        )
+        ton = AsyncTon(client, None, **kwargs)
+        try:
+            data = asyncio.ensure_future(client.get_jetton_data(MASTER))
+            return await ton.get_holders(MASTER, jetton_data=data)
+        finally:
+            await client.aclose()
+
+    return asyncio.run(run())
+
+
+def holder_requests(server) -> int:
+    # One request of the total goes to the jetton data.
+    return server.requests[TON_VIEWER] - 1
+
+
+def test_paging_stops_once_the_top_ten_is_settled(api_server):
+    # Ten holders own 90%, the other 2490 share the rest.
+    balances = [9 * 10**10] * 10 + [TOTAL_SUPPLY // 10 // 2490] * 2490
+    server = api_server(api_fixtures(*holder_pages(balances)))
+    holders = read_holders(server)
+    assert len(holders) == 1000
+    assert holder_requests(server) == 1
+
+
+def test_flat_distributions_are_read_in_full(api_server):
+    balances = [TOTAL_SUPPLY // 2500] * 2500
+    server = api_server(api_fixtures(*holder_pages(balances)))
+    holders = read_holders(server)
+    assert len(holders) == 2500
+    assert holder_requests(server) == 3
+    assert not server.missing
+
+
+def test_max_holders_caps_paging(api_server):
+    balances = [TOTAL_SUPPLY // 2500] * 2500
+    server = api_server(api_fixtures(*holder_pages(balances)))
+    holders = read_holders(server, max_holders=1000)
+    assert len(holders) == 1000
+    assert holder_requests(server) == 1
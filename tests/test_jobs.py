@@ -0,0 +1,105 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from jobs import BotProxy, JobQueue
+
+from tests.factories import (
+    CREATOR,
+    MASTER,
+    api_fixtures,
+    close_ton,
+    make_ton,
+    token_fixtures,
+)
+
+
+@pytest.fixture
+def jobs():
+    queue = JobQueue(lambda: threading.current_thread().name, workers=2)
+    yield queue.start()
+    queue.stop()
+
+
+def test_jobs_run_on_the_queue_loop(jobs):
+    async def job(context):
+        return context, threading.current_thread().name
+
+    assert asyncio.run(jobs.run(job)) == ("jobs", "jobs")
+
+
+def test_workers_bound_concurrent_jobs(jobs):
+    running = []
+    peak = []
+
+    async def job(context, n):
+        running.append(n)
+        peak.append(len(running))
+        await asyncio.sleep(0.02)
+        running.remove(n)
+        return n
+
+    async def run():
+        return await asyncio.gather(*(jobs.run(job, n) for n in range(6)))
+
+    assert asyncio.run(run()) == list(range(6))
+    assert max(peak) == 2
+
+
+def test_blocking_jobs_leave_the_caller_loop_free(jobs):
+    async def job(context):
+        time.sleep(0.2)
+
+    async def run():
+        ticks = 0
+        pending = asyncio.ensure_future(jobs.run(job))
+        while not pending.done():
+            ticks += 1
+            await asyncio.sleep(0.01)
+        return ticks
+
+    assert asyncio.run(run()) > 5
+
+
+def test_errors_reach_the_caller(jobs):
+    async def job(context):
+        raise ValueError("bad address")
+
+    with pytest.raises(ValueError, match="bad address"):
+        asyncio.run(jobs.run(job))
+
+
+def test_bot_proxy_sends_on_the_bot_loop(jobs):
+    class Bot:
+        async def send_message(self, chat_id, text):
+            return chat_id, text, asyncio.get_running_loop()
+
+    async def job(context, bot):
+        return await bot.send_message("chat", "hello")
+
+    async def run():
+        loop = asyncio.get_running_loop()
+        result = await jobs.run(job, BotProxy(Bot(), loop))
+        return result, loop
+
+    (chat_id, text, loop), bot_loop = asyncio.run(run())
+    assert (chat_id, text) == ("chat", "hello")
+    assert loop is bot_loop
+
+
+def test_analyses_run_with_the_queue_context(api_server):
+    server = api_server(api_fixtures(*token_fixtures()))
+    jobs = JobQueue(lambda: make_ton(server), name="chat").start()
+
+    async def analyse(ton, address):
+        return await ton.get_jetton_master(address)
+
+    try:
+        master = asyncio.run(jobs.run(analyse, MASTER))
+    finally:
+        jobs.stop(close_ton)
+    assert master.account.address == MASTER
+    assert master.creator.account.address == CREATOR
+    assert jobs.context.tv_client.client.is_closed
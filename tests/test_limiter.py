@@ -0,0 +1,120 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+import limiter
+from clients import AsyncTonViewerClient
+from limiter import TokenBucket, get_bucket
+
+from tests.factories import TON_VIEWER, api_fixture, api_fixtures, metadata
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = SimpleNamespace(now=100.0)
+    monkeypatch.setattr(
+        limiter, "time", SimpleNamespace(monotonic=lambda: clock.now)
+    )
+    return clock
+
+
+def test_burst_then_rate(clock):
+    bucket = TokenBucket(2.0, capacity=2.0)
+    assert bucket.reserve() == 0.0
+    assert bucket.reserve() == 0.0
+    assert bucket.reserve() == pytest.approx(0.5)
+    assert not bucket.try_acquire()
+
+    clock.now += 1.0
+    assert bucket.try_acquire()
+    assert not bucket.try_acquire()
+    assert bucket.retry_after() == pytest.approx(0.5)
+
+
+def test_tokens_do_not_exceed_capacity(clock):
+    bucket = TokenBucket(1.0, capacity=3.0)
+    clock.now += 60
+    for _ in range(3):
+        assert bucket.try_acquire()
+    assert not bucket.try_acquire()
+
+
+def test_additive_increase_is_capped(clock):
+    bucket = TokenBucket(1.0, max_rate=2.0)
+    bucket.on_success()
+    assert bucket.rate == pytest.approx(1.5)
+    for _ in range(10):
+        bucket.on_success()
+    assert bucket.rate == 2.0
+
+
+def test_multiplicative_decrease_once_per_window(clock):
+    bucket = TokenBucket(4.0, max_rate=8.0)
+    bucket.on_throttle()
+    assert bucket.rate == 2.0
+    # Requests in flight get throttled in the same window.
+    bucket.on_throttle()
+    assert bucket.rate == 2.0
+
+    clock.now += 1.0
+    bucket.on_throttle()
+    assert bucket.rate == 1.0
+    for _ in range(5):
+        clock.now += 1.0
+        bucket.on_throttle()
+    assert bucket.rate == bucket.min_rate == pytest.approx(0.4)
+
+
+def test_retry_after_pauses_every_caller(clock):
+    bucket = TokenBucket(2.0, capacity=2.0)
+    bucket.on_throttle(3.0)
+    assert bucket.rate == 1.0
+    assert bucket.pauses == 1
+    # Three seconds of debt plus the token being reserved.
+    assert bucket.reserve() == pytest.approx(4.0)
+
+    # The reservation above is paid after the pause as well.
+    clock.now += 5.0
+    assert bucket.reserve() == 0.0
+
+
+def test_buckets_are_shared_per_host():
+    bucket = get_bucket("tonapi.io", 1.0)
+    assert get_bucket("tonapi.io", 5.0) is bucket
+    assert get_bucket("api.geckoterminal.com", 1.0) is not bucket
+
+
+def test_client_backs_off_on_throttling(api_server):
+    master = "0:" + "a" * 64
+    jetton = {
+        "mintable": False,
+        "total_supply": "1000",
+        "metadata": metadata(master),
+        "verification": "none",
+        "holders_count": 1,
+    }
+    server = api_server(
+        api_fixtures(api_fixture(TON_VIEWER, f"/jettons/{master}", jetton)),
+        rate_limit=1.0,
+        burst=1.0,
+    )
+
+    async def scan():
+        client = AsyncTonViewerClient(
+            server.service_url(TON_VIEWER), rate_limit=10.0, max_rate=20.0
+        )
+        try:
+            first = await client.get_jetton_data(master)
+            rate = client.bucket.rate
+            second = await client.get_jetton_data(master)
+        finally:
+            await client.aclose()
+        return first, second, rate, client.bucket
+
+    first, second, rate, bucket = asyncio.run(scan())
+    assert first == second
+    assert server.throttled[TON_VIEWER] == 1
+    assert server.requests[TON_VIEWER] == 3
+    assert bucket.pauses == 1
+    assert bucket.rate < rate
@@ -0,0 +1,130 @@
+import asyncio
+from datetime import datetime, timedelta, UTC
+
+import pytest
+
+from address import to_bounceable
+from functions import process_new_pools
+from models import TokenReport
+from storage import ScanStore
+
+from tests.factories import (
+    GECKO_TERMINAL,
+    OTHER,
+    account_data,
+    address,
+    api_fixtures,
+    bulk_accounts_fixture,
+    close_ton,
+    make_ton,
+    new_pools_fixture,
+    pool_data,
+    token_fixtures,
+)
+
+# Newest first as on GeckoTerminal: two good tokens around one with
+# unlocked liquidity and one whose TonAPI data is missing.
+GOOD, BAD, BROKEN, LATE = range(4)
+
+
+def master(n: int) -> str:
+    return address(1000 + n)
+
+
+def pool(n: int) -> str:
+    return address(2000 + n)
+
+
+def created_at(n: int) -> str:
+    created = datetime.now(UTC) - timedelta(minutes=n)
+    return created.strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+class Bot:
+    def __init__(self, fail_for: str | None = None):
+        self.fail_for = fail_for
+        self.sent: list[str] = []
+
+    async def send_message(self, chat_id: str, **kwargs):
+        if self.fail_for is not None and self.fail_for in kwargs["text"]:
+            raise RuntimeError("Telegram is down")
+        self.sent.append(kwargs["text"])
+
+
+def pipeline_fixtures() -> dict[str, dict]:
+    return api_fixtures(
+        new_pools_fixture(
+            [pool_data(pool(n), master(n), created_at(n)) for n in range(4)]
+        ),
+        *token_fixtures(master(GOOD), pool(GOOD)),
+        *token_fixtures(master(BAD), pool(BAD), lp_holder=OTHER),
+        *token_fixtures(master(LATE), pool(LATE)),
+        bulk_accounts_fixture(
+            [
+                account_data(master(BROKEN), is_wallet=False),
+                account_data(pool(BROKEN), is_wallet=False),
+            ]
+        ),
+    )
+
+
+@pytest.fixture
+def store(tmp_path):
+    return ScanStore(str(tmp_path / "scanned_tokens.db"))
+
+
+def run_cycle(server, store, bot, workers=4):
+    async def run():
+        ton = make_ton(server)
+        try:
+            return await process_new_pools(
+                ton,
+                bot,
+                "chat",
+                1,
+                store,
+                TokenReport.TelegramMessage,
+                workers=workers,
+            )
+        finally:
+            await close_ton(ton)
+
+    return asyncio.run(run())
+
+
+def stored_tokens(store) -> list[tuple[str, int]]:
+    return store.db.execute(
+        "SELECT token_address, is_good FROM scanned_tokens ORDER BY rowid"
+    ).fetchall()
+
+
+def test_results_are_written_in_discovery_order(api_server, store):
+    # Random latency finishes the analyses in any order.
+    server = api_server(pipeline_fixtures(), jitter=0.05)
+    bot = Bot()
+    stats = run_cycle(server, store, bot)
+
+    assert stored_tokens(store) == [
+        (master(GOOD), 1),
+        (master(BAD), 0),
+        (master(BROKEN), 0),
+        (master(LATE), 1),
+    ]
+    assert len(bot.sent) == 2
+    assert to_bounceable(pool(GOOD)) in bot.sent[0]
+    assert to_bounceable(pool(LATE)) in bot.sent[1]
+    assert (stats.discovered, stats.queued, stats.analysed) == (4, 4, 3)
+    assert (stats.good, stats.reported, stats.analysis_errors) == (2, 2, 1)
+    assert stats.deferred == stats.report_errors == 0
+    assert len(stats.durations) == 4
+    assert server.requests[GECKO_TERMINAL] == 1
+
+
+def test_failed_reports_are_counted_and_scanned_again(api_server, store):
+    server = api_server(pipeline_fixtures())
+    stats = run_cycle(server, store, Bot(fail_for="Test"), workers=1)
+
+    assert (stats.good, stats.reported, stats.report_errors) == (2, 0, 2)
+    # Not stored as good, so the next cycle reports the token again.
+    assert store.is_token_to_process(master(GOOD))
+    assert store.load_snapshot(master(GOOD)) is not None
@@ -0,0 +1,149 @@
+import itertools
+
+import numpy as np
+import pytest
+
+from airdrops import MAX_AIRDROP_PERCENT
+from classes import AsyncTon
+from models import JettonMaster, LiquidityState
+from rating import (
+    Condition,
+    RatingEngine,
+    Rule,
+    RuleSet,
+    extract_features,
+    liquidity_codes,
+    stack_features,
+)
+
+from tests.factories import OTHER, ZERO_ADDRESS, address, jetton_master, wallet
+
+TOTAL_SUPPLY = 10**12
+
+liquidity_holders = {
+    "burned": [wallet(LiquidityState.Burned.value, 9 * 10**11)],
+    "ton_inu": [wallet(LiquidityState.TonInuLocked.value, 8 * 10**11)],
+    "burned_minority": [
+        wallet(LiquidityState.Burned.value, 5 * 10**11),
+        wallet(address(1), 4 * 10**11),
+    ],
+    "not_safe": [wallet(address(2), 9 * 10**11)],
+    "no_holders": [],
+}
+
+
+def scalar_rating(
+    ton: AsyncTon,
+    jetton_master: JettonMaster,
+    liquidity_master: JettonMaster,
+    total_airdrop: float,
+) -> int:
+    # The rules rate_jetton applied one token at a time before the
+    # rating engine.
+    rating = 0
+    if jetton_master.admin_address == ZERO_ADDRESS:
+        rating += 1
+    if ton.check_liquidity_state(liquidity_master) in [
+        LiquidityState.Burned,
+        LiquidityState.TonInuLocked,
+        LiquidityState.Undefined,
+    ]:
+        rating += 1
+    if jetton_master.creator.balance / jetton_master.data.total_supply <= 0.1:
+        rating += 1
+    if total_airdrop <= MAX_AIRDROP_PERCENT:
+        rating += 1
+    return rating
+
+
+def cases():
+    for admin, holders, creator_share, airdrop in itertools.product(
+        [ZERO_ADDRESS, OTHER],
+        liquidity_holders,
+        [0, 0.05, 0.1, 0.3],
+        [0.0, MAX_AIRDROP_PERCENT, MAX_AIRDROP_PERCENT + 0.01, 90.0],
+    ):
+        master = jetton_master(
+            admin_address=admin,
+            total_supply=TOTAL_SUPPLY,
+            creator_balance=int(TOTAL_SUPPLY * creator_share),
+        )
+        liquidity = jetton_master(
+            address=address(3), holders=liquidity_holders[holders]
+        )
+        yield master, liquidity, airdrop
+
+
+def test_engine_matches_scalar_rules():
+    ton = AsyncTon(None, None)
+    rows, expected = [], []
+    for master, liquidity, airdrop in cases():
+        rating = scalar_rating(ton, master, liquidity, airdrop)
+        assert ton.rate_jetton(master, liquidity, airdrop) == rating
+        rows.append(ton.jetton_features(master, liquidity, airdrop))
+        expected.append(rating)
+
+    result = ton.rating_engine.score(stack_features(rows))
+    np.testing.assert_array_equal(result.scores, expected)
+    np.testing.assert_array_equal(result.passed, np.array(expected) >= 4)
+    assert sum(result.breakdown.values()).tolist() == expected
+
+
+def test_liquidity_features():
+    holders = liquidity_holders["burned_minority"]
+    liquidity = jetton_master(address=address(3), holders=holders)
+    features = extract_features(
+        jetton_master(), liquidity, LiquidityState.NotSafe, 0.0
+    )
+    # The largest LP holder is burned but holds too little to count.
+    assert features["liquidity_state"] == (
+        liquidity_codes[LiquidityState.NotSafe]
+    )
+    assert features["liquidity_holder"] == (
+        liquidity_codes[LiquidityState.Burned]
+    )
+    assert features["liquidity_share"] == pytest.approx(0.5)
+
+
+def test_weights_and_conditions():
+    engine = RatingEngine(
+        RuleSet(
+            name="weighted",
+            threshold=2,
+            rules=[
+                Rule(
+                    name="small",
+                    feature="used_cells",
+                    op="lt",
+                    value=100,
+                    weight=2,
+                    also=[
+                        Condition(feature="admin_revoked", op="eq", value=1)
+                    ],
+                ),
+                Rule(
+                    name="airdrop",
+                    feature="airdrop_percent",
+                    op="gt",
+                    value=50,
+                    weight=-1,
+                ),
+            ],
+        )
+    )
+    features = {
+        "used_cells": np.array([50.0, 50.0, 500.0, 50.0]),
+        "admin_revoked": np.array([1.0, 0.0, 1.0, 1.0]),
+        "airdrop_percent": np.array([0.0, 0.0, 0.0, 60.0]),
+    }
+    result = engine.score(features)
+    assert result.scores.tolist() == [2.0, 0.0, 0.0, 1.0]
+    assert result.passed.tolist() == [True, False, False, False]
+    assert result.breakdown["airdrop"].tolist() == [0.0, 0.0, 0.0, -1.0]
+
+
+def test_airdrop_stop_percent():
+    assert RatingEngine().stop_airdrop_percent() == MAX_AIRDROP_PERCENT
+    # With one point to spare a large airdrop no longer decides the rating.
+    lenient = RatingEngine().rule_set.model_copy(update={"threshold": 3})
+    assert RatingEngine(lenient).stop_airdrop_percent() is None
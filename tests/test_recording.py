@@ -0,0 +1,60 @@
+import asyncio
+
+import httpx
+import pytest
+
+from clients import ApiError, AsyncTonViewerClient
+from recording import Recorder, fixture_key, load_fixtures
+
+from tests.factories import MASTER, TON_VIEWER
+
+BASE_URL = f"https://{TON_VIEWER}"
+
+
+def record(recorder: Recorder, path: str, response: httpx.Response) -> str:
+    return recorder.record_response(
+        BASE_URL, "GET", f"{BASE_URL}{path}", None, response
+    )
+
+
+def test_fixture_keys_ignore_volatile_params():
+    assert fixture_key(
+        TON_VIEWER, "get", "/events?limit=100&end_date=1&initiator=false"
+    ) == fixture_key(
+        TON_VIEWER, "GET", "/events?initiator=false&end_date=2&limit=100"
+    )
+
+
+def test_recorded_responses_are_replayed(tmp_path, api_server):
+    recorder = Recorder(str(tmp_path))
+    body = {"balances": [{"balance": "1"}]}
+    record(
+        recorder,
+        f"/accounts/{MASTER}/jettons",
+        httpx.Response(200, json=body),
+    )
+    record(
+        recorder,
+        f"/blockchain/accounts/{MASTER}",
+        httpx.Response(502, text="Bad Gateway", headers={"Retry-After": "7"}),
+    )
+    server = api_server(load_fixtures(str(tmp_path)), rate_limit=None)
+
+    async def replay():
+        client = AsyncTonViewerClient(
+            server.service_url(TON_VIEWER), rate_limit=100.0, max_retries=0
+        )
+        try:
+            balances = await client.get_account_jettons(MASTER)
+            with pytest.raises(ApiError) as error:
+                await client.low_level_account_info(MASTER)
+        finally:
+            await client.aclose()
+        return balances, error.value
+
+    balances, error = asyncio.run(replay())
+    assert balances == body["balances"]
+    # Bodies that are not JSON are recorded as text.
+    assert error.status_code == 502
+    assert error.payload == {"text": "Bad Gateway"}
+    assert error.retry_after == 7.0
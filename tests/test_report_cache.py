@@ -0,0 +1,94 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+import report_cache
+from report_cache import ReportCache, report_size, with_age
+
+from tests.factories import address, jetton_master, wallet
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = SimpleNamespace(now=1000.0)
+    monkeypatch.setattr(
+        report_cache, "time", SimpleNamespace(time=lambda: clock.now)
+    )
+    return clock
+
+
+def message(text: str = "Report") -> dict:
+    return {"text": text, "entities": []}
+
+
+def test_size_follows_the_report():
+    small = jetton_master(holders=[wallet(address(1), 10**9)])
+    large = jetton_master(
+        holders=[wallet(address(i), 10**9) for i in range(100)]
+    )
+    assert report_size({"text": "Report"}, "") == len("textReport")
+    assert report_size(message(), (small, {})) < report_size(
+        message(), (large, {})
+    )
+    receivers = {address(1): {"amount": 10**9, "name": None}}
+    assert report_size(message(), (small, receivers)) > report_size(
+        message(), (small, {})
+    )
+
+
+def test_least_recently_used_reports_are_evicted():
+    cache = ReportCache(max_bytes=100)
+    cache.set("a", message(), None, 40)
+    cache.set("b", message(), None, 40)
+    cache.get("a")
+    cache.set("c", message(), None, 40)
+
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+    assert cache.get("c") is not None
+    assert cache.stats()["bytes"] == 80
+    assert cache.stats()["evictions"] == 1
+
+
+def test_reports_larger_than_the_cache_are_not_kept():
+    cache = ReportCache(max_bytes=100)
+    cache.set("a", message(), None, 40)
+    report = cache.set("b", message(), None, 200)
+    assert report.size == 200
+    assert cache.get("b") is None
+    assert cache.stats()["entries"] == 1
+
+
+def test_age_staleness_and_expiry(clock):
+    cache = ReportCache(stale_after=300, max_age=3600)
+    report = cache.set("a", message(), None, 10)
+    assert with_age(report)["text"] == "Report\n\nData from just now"
+
+    clock.now += 301
+    report = cache.get("a")
+    assert cache.is_stale(report)
+    assert with_age(report)["text"] == "Report\n\nData from 5 min ago"
+
+    clock.now += 3300
+    assert cache.get("a") is None
+
+
+def test_refresh_runs_once_per_key():
+    cache = ReportCache()
+    renders = []
+
+    async def render():
+        renders.append(1)
+        await asyncio.sleep(0)
+        return message("Fresh"), None, 10
+
+    async def run():
+        first = cache.refresh("a", render)
+        assert cache.refresh("a", render) is first
+        await first
+
+    asyncio.run(run())
+    assert renders == [1]
+    assert cache.get("a").kwargs["text"] == "Fresh"
+    assert cache.refreshing == {}
@@ -0,0 +1,150 @@
+import asyncio
+from datetime import datetime, UTC
+
+import pytest
+
+from address import to_bounceable
+from functions import (
+    apply_results,
+    distribute_new_pools,
+    run_worker,
+    send_messages,
+)
+from storage import ScanStore
+from work_queue import WorkQueue
+
+from tests.factories import (
+    OTHER,
+    address,
+    api_fixtures,
+    close_ton,
+    make_ton,
+    new_pools_fixture,
+    pool_data,
+    token_fixtures,
+)
+
+GOOD_MASTER, GOOD_POOL = address(1000), address(2000)
+BAD_MASTER, BAD_POOL = address(1001), address(2001)
+
+
+def now() -> str:
+    return datetime.now(UTC).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+class Bot:
+    def __init__(self):
+        self.sent: list[tuple[str, dict]] = []
+
+    async def send_message(self, chat_id: str, **kwargs):
+        self.sent.append((chat_id, kwargs))
+
+
+@pytest.fixture
+def store(tmp_path):
+    return ScanStore(str(tmp_path / "scanned_tokens.db"))
+
+
+@pytest.fixture
+def queue(tmp_path):
+    return WorkQueue(str(tmp_path / "work_queue.db"), lease_seconds=30)
+
+
+@pytest.fixture
+def server(api_server):
+    created_at = now()
+    return api_server(
+        api_fixtures(
+            new_pools_fixture(
+                [
+                    pool_data(GOOD_POOL, GOOD_MASTER, created_at),
+                    pool_data(BAD_POOL, BAD_MASTER, created_at),
+                ]
+            ),
+            *token_fixtures(GOOD_MASTER, GOOD_POOL),
+            *token_fixtures(BAD_MASTER, BAD_POOL, lp_holder=OTHER),
+        ),
+        latency=0.01,
+    )
+
+
+async def work_until_done(ton, store, queue, jobs: int):
+    worker = asyncio.create_task(
+        run_worker(ton, store, queue, "worker", 2, poll_interval=0.01)
+    )
+    try:
+        while queue.counts().get("done", 0) < jobs:
+            await asyncio.sleep(0.01)
+    finally:
+        worker.cancel()
+        await asyncio.gather(worker, return_exceptions=True)
+
+
+def test_sharded_cycle(server, store, queue):
+    bot = Bot()
+
+    async def run():
+        ton = make_ton(server)
+        try:
+            distributed = await distribute_new_pools(ton, 1, store, queue)
+            assert distributed.queued == 2
+            await work_until_done(ton, store, queue, 2)
+            applied = await apply_results(ton, store, queue)
+            sent = await send_messages(bot, "chat", queue)
+            # The bad token comes back as a rescan inside the window.
+            again = await distribute_new_pools(ton, 1, store, queue)
+            return applied, sent, again
+        finally:
+            await close_ton(ton)
+
+    applied, sent, again = asyncio.run(run())
+    assert (applied.analysed, applied.good, applied.reported) == (2, 1, 1)
+    assert not store.is_token_to_process(GOOD_MASTER)
+    assert store.load_snapshot(BAD_MASTER) is not None
+    assert sent == 1
+    [(chat_id, message)] = bot.sent
+    assert chat_id == "chat"
+    assert to_bounceable(GOOD_POOL) in message["text"]
+    assert message["entities"]
+    assert queue.pending_messages() == []
+    assert (again.queued, again.rescans) == (1, 1)
+
+
+def test_cancelled_workers_release_their_jobs(api_server, store, queue):
+    server = api_server(
+        api_fixtures(*token_fixtures(GOOD_MASTER, GOOD_POOL)), latency=0.5
+    )
+    queue.enqueue([(now(), GOOD_POOL, GOOD_MASTER)])
+
+    async def run():
+        ton = make_ton(server)
+        worker = asyncio.create_task(
+            run_worker(ton, store, queue, "worker", 1, poll_interval=0.01)
+        )
+        try:
+            while not queue.counts().get("leased"):
+                await asyncio.sleep(0.01)
+        finally:
+            worker.cancel()
+            await asyncio.gather(worker, return_exceptions=True)
+            await close_ton(ton)
+
+    asyncio.run(run())
+    assert queue.counts() == {"pending": 1}
+
+
+def test_failed_jobs_become_candidates(tmp_path, store):
+    queue = WorkQueue(
+        str(tmp_path / "work_queue.db"), lease_seconds=0, max_attempts=1
+    )
+    created_at = now()
+    queue.enqueue([(created_at, "EQpool", "EQtoken")])
+    queue.claim("worker")
+    # The expired lease of the last attempt fails the job.
+    assert queue.claim("worker") is None
+
+    stats = asyncio.run(apply_results(None, store, queue))
+    assert stats.analysis_errors == 1
+    assert store.pending_candidates() == [(created_at, "EQpool", "EQtoken")]
+    assert queue.failed() == []
+    assert queue.counts() == {}
@@ -0,0 +1,149 @@
+import asyncio
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+import singleflight
+from singleflight import SingleFlight
+
+from tests.factories import (
+    MASTER,
+    TON_VIEWER,
+    api_fixtures,
+    close_ton,
+    make_ton,
+    token_fixtures,
+)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = SimpleNamespace(now=1000.0)
+    monkeypatch.setattr(
+        singleflight, "time", SimpleNamespace(monotonic=lambda: clock.now)
+    )
+    return clock
+
+
+def counted_call(calls: list, result="result", error=None):
+    async def call():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        if error is not None:
+            raise error
+        return result
+
+    return call
+
+
+def test_concurrent_callers_share_one_call():
+    flights = SingleFlight()
+    calls = []
+
+    async def run():
+        return await asyncio.gather(
+            *(flights.do("key", counted_call(calls)) for _ in range(5))
+        )
+
+    assert asyncio.run(run()) == ["result"] * 5
+    assert calls == [1]
+    assert flights.stats() == {"hits": 4, "misses": 1, "entries": 1}
+
+
+def test_results_are_kept_for_the_ttl(clock):
+    flights = SingleFlight(ttl=30)
+    calls = []
+    asyncio.run(flights.do("key", counted_call(calls)))
+    clock.now += 29
+    asyncio.run(flights.do("key", counted_call(calls)))
+    assert calls == [1]
+    clock.now += 1
+    asyncio.run(flights.do("key", counted_call(calls)))
+    assert calls == [1, 1]
+
+
+def test_failures_are_shared_but_not_kept():
+    flights = SingleFlight()
+    calls = []
+
+    async def run():
+        return await asyncio.gather(
+            *(
+                flights.do("key", counted_call(calls, error=ValueError()))
+                for _ in range(3)
+            ),
+            return_exceptions=True,
+        )
+
+    assert all(isinstance(e, ValueError) for e in asyncio.run(run()))
+    assert calls == [1]
+    assert asyncio.run(flights.do("key", counted_call(calls))) == "result"
+    assert calls == [1, 1]
+
+
+def test_a_cancelled_leader_hands_over():
+    flights = SingleFlight()
+    calls = []
+
+    async def run():
+        leader = asyncio.create_task(flights.do("key", counted_call(calls)))
+        await asyncio.sleep(0)
+        follower = asyncio.create_task(
+            flights.do("key", counted_call(calls, "follower"))
+        )
+        await asyncio.sleep(0)
+        leader.cancel()
+        return await follower
+
+    assert asyncio.run(run()) == "follower"
+    assert calls == [1, 1]
+
+
+def test_flights_are_shared_across_loops():
+    flights = SingleFlight()
+    calls = []
+    started = threading.Event()
+    results = []
+
+    async def slow():
+        calls.append(1)
+        started.set()
+        await asyncio.sleep(0.1)
+        return "result"
+
+    def follow():
+        started.wait()
+        results.append(asyncio.run(flights.do("key", slow)))
+
+    thread = threading.Thread(target=follow)
+    thread.start()
+    results.append(asyncio.run(flights.do("key", slow)))
+    thread.join()
+    assert results == ["result", "result"]
+    assert calls == [1]
+
+
+def test_analyses_of_one_jetton_share_requests(api_server):
+    server = api_server(api_fixtures(*token_fixtures()))
+
+    async def run(ton, callers):
+        try:
+            return await asyncio.gather(
+                *(ton.get_jetton_master(MASTER) for _ in range(callers))
+            )
+        finally:
+            await close_ton(ton)
+
+    [alone] = asyncio.run(run(make_ton(server), 1))
+    requests = server.requests[TON_VIEWER]
+    server.requests.clear()
+
+    first, second = asyncio.run(
+        run(make_ton(server, flights=SingleFlight()), 2)
+    )
+    assert server.requests[TON_VIEWER] == requests
+    assert first == second == alone
+    # Callers get their own copies to set airdrop amounts on.
+    first.holders[0].airdrop_amount = 1
+    assert second.holders[0].airdrop_amount == 0
@@ -0,0 +1,138 @@
+import sqlite3
+from datetime import datetime, timedelta, UTC
+
+import pytest
+
+from models import JettonSnapshot
+from storage import ScanStore
+
+from tests.factories import address, jetton_master, wallet
+
+CREATED_AT = "2024-05-01T10:00:00Z"
+
+
+@pytest.fixture
+def store(tmp_path):
+    return ScanStore(str(tmp_path / "scanned_tokens.db"))
+
+
+def make_snapshot() -> JettonSnapshot:
+    holders = [
+        wallet(
+            address(i),
+            10**10 * (10 - i),
+            name="Stonfi Pool" if i == 0 else None,
+        )
+        for i in range(10)
+    ]
+    holders[3].airdrop_amount = 5 * 10**9
+    master = jetton_master(creator_balance=10**9, holders=holders)
+    liquidity = jetton_master(
+        address=address(100), holders=[wallet(address(101), 10**6)]
+    )
+    return JettonSnapshot(
+        pool_address="EQpool",
+        jetton_master=master,
+        liquidity_master=liquidity,
+        airdrop_receivers={
+            address(3): {"amount": 5 * 10**9, "name": None},
+            address(200): {"amount": 10**9, "name": "Dedust Vault"},
+        },
+        history_lt=123456,
+        airdrop_stopped=True,
+    )
+
+
+def test_snapshot_round_trip(store):
+    snapshot = make_snapshot()
+    store.save_snapshot("EQtoken", CREATED_AT, snapshot)
+    loaded = store.load_snapshot("EQtoken")
+
+    assert loaded.model_dump() == snapshot.model_dump()
+    # Socials parsed on the first validation are not added again.
+    assert loaded.jetton_master.data.metadata.socials == ["https://t.me/test"]
+    assert loaded.jetton_master.build_top_ten_message() == (
+        snapshot.jetton_master.build_top_ten_message()
+    )
+
+
+def test_snapshot_is_replaced(store):
+    snapshot = make_snapshot()
+    store.save_snapshot("EQtoken", CREATED_AT, snapshot)
+    newer = snapshot.model_copy(update={"history_lt": 999999})
+    store.save_snapshot("EQtoken", CREATED_AT, newer)
+    assert store.load_snapshot("EQtoken").history_lt == 999999
+
+
+def test_missing_and_deleted_snapshots(store):
+    assert store.load_snapshot("EQtoken") is None
+    store.save_snapshot("EQtoken", CREATED_AT, make_snapshot())
+    store.delete_snapshot("EQtoken")
+    assert store.load_snapshot("EQtoken") is None
+
+
+def test_expire_keeps_scanned_tokens(store):
+    store.upsert(CREATED_AT, "EQpool", "EQtoken", 1)
+    store.add_candidates([(CREATED_AT, "EQpool2", "EQtoken2")])
+    store.save_snapshot("EQtoken2", CREATED_AT, make_snapshot())
+
+    assert store.expire() == 2
+    assert store.load_snapshot("EQtoken2") is None
+    assert store.pending_candidates() == []
+    # An expired token is never scanned and alerted again.
+    assert not store.is_token_to_process("EQtoken")
+
+
+def test_import_csv_skips_bad_rows(store, tmp_path):
+    path = tmp_path / "scanned_tokens.csv"
+    path.write_text(
+        f"{CREATED_AT},EQpool1,EQtoken1,1\n"
+        "not a date,EQpool2,EQtoken2,0\n"
+        f"{CREATED_AT},EQpool3\n"
+        f"{CREATED_AT},EQpool4,EQtoken4,0\n"
+    )
+    assert store.import_csv(str(path)) == 2
+    assert not store.is_token_to_process("EQtoken1")
+    assert store.is_token_to_process("EQtoken2")
+    assert not store.is_token_to_process("EQtoken4")
+
+
+def test_candidates_are_rechecked_in_turns(tmp_path):
+    store = ScanStore(str(tmp_path / "scanned_tokens.db"), recheck_limit=1)
+    now = datetime.now(UTC)
+    pools = [
+        (
+            (now - timedelta(minutes=i)).strftime("%Y-%m-%dT%H:%M:%SZ"),
+            f"EQpool{i}",
+            f"EQtoken{i}",
+        )
+        for i in range(2)
+    ]
+    store.add_candidates(pools)
+    # Just rejected by the prefilter, not due before the interval.
+    assert store.due_candidates() == []
+
+    store.recheck_interval = timedelta(0)
+    assert store.due_candidates() == pools[:1]
+    assert store.due_candidates() == pools[1:]
+    assert store.due_candidates() == pools[:1]
+
+
+def test_candidates_table_is_migrated(tmp_path):
+    path = str(tmp_path / "scanned_tokens.db")
+    db = sqlite3.connect(path)
+    db.execute(
+        "CREATE TABLE candidates (pool_address TEXT PRIMARY KEY, "
+        "created_at TEXT NOT NULL, created_ts REAL NOT NULL, "
+        "token_address TEXT NOT NULL)"
+    )
+    created_at = datetime.now(UTC).strftime("%Y-%m-%dT%H:%M:%SZ")
+    db.execute(
+        "INSERT INTO candidates VALUES (?, ?, ?, ?)",
+        ("EQpool", created_at, datetime.now(UTC).timestamp(), "EQtoken"),
+    )
+    db.commit()
+    db.close()
+
+    store = ScanStore(path)
+    assert store.due_candidates() == [(created_at, "EQpool", "EQtoken")]
@@ -0,0 +1,133 @@
+import asyncio
+
+import pytest
+
+from address import is_valid_address, to_bounceable, to_raw
+from models import AccountTransaction, ScanStats
+from streaming import (
+    DEX_ACCOUNTS,
+    StreamScanner,
+    TransactionStream,
+    iter_sse,
+)
+
+from tests.factories import MASTER, OTHER
+
+
+async def lines(*values: str):
+    for value in values:
+        yield value
+
+
+async def collect(source) -> list:
+    return [item async for item in source]
+
+
+def test_sse_events():
+    events = asyncio.run(
+        collect(
+            iter_sse(
+                lines(
+                    ": heartbeat",
+                    "",
+                    "data: first",
+                    "",
+                    "event: heartbeat",
+                    "data:no space",
+                    "",
+                    "id: 3",
+                    "data: line one",
+                    "data: line two",
+                    "",
+                    "",
+                    "data: not terminated",
+                )
+            )
+        )
+    )
+    assert events == [
+        ("message", "first"),
+        ("heartbeat", "no space"),
+        ("message", "line one\nline two"),
+    ]
+
+
+def test_event_name_resets_after_dispatch():
+    events = asyncio.run(
+        collect(iter_sse(lines("event: custom", "", "data: x", "")))
+    )
+    assert events == [("message", "x")]
+
+
+async def next_transaction(server, transactions, publish):
+    waiter = asyncio.ensure_future(anext(transactions))
+    while not server.subscribers:
+        await asyncio.sleep(0.01)
+    publish()
+    return await asyncio.wait_for(waiter, 5)
+
+
+def test_stream_delivers_watched_transactions(stream_server):
+    async def run():
+        stream = TransactionStream(stream_server.url)
+        transactions = stream.subscribe([MASTER])
+        try:
+            # Any form of a watched address is matched.
+            transaction = await next_transaction(
+                stream_server,
+                transactions,
+                lambda: (
+                    stream_server.publish(OTHER, 1, "skipped"),
+                    stream_server.publish(to_bounceable(MASTER), 2, "hash"),
+                ),
+            )
+            stream_server.disconnect()
+            rest = await asyncio.wait_for(collect(transactions), 5)
+        finally:
+            await stream.aclose()
+        return transaction, rest
+
+    transaction, rest = asyncio.run(run())
+    assert transaction == AccountTransaction(
+        account_id=to_bounceable(MASTER), lt=2, tx_hash="hash"
+    )
+    assert rest == []
+    assert stream_server.connections == 1
+
+
+@pytest.mark.parametrize("account", DEX_ACCOUNTS)
+def test_dex_accounts_are_valid(account):
+    assert is_valid_address(account)
+
+
+def test_transactions_are_routed_to_the_scanner(stream_server):
+    pool = "0:" + "b" * 64
+
+    async def run():
+        stream = TransactionStream(stream_server.url)
+        scanner = StreamScanner(
+            stream,
+            run_cycle=lambda rescans: ScanStats(),
+            load_watched=lambda: {to_bounceable(pool): MASTER},
+        )
+        scanner.refresh_watched()
+        listener = asyncio.create_task(scanner.listen())
+        try:
+            while not stream_server.subscribers:
+                await asyncio.sleep(0.01)
+            routed = []
+            # TonAPI sends raw account ids.
+            for account in DEX_ACCOUNTS + [pool]:
+                scanner.discover = False
+                scanner.wake.clear()
+                assert stream_server.publish(to_raw(account), 1, "hash") == 1
+                await asyncio.wait_for(scanner.wake.wait(), 5)
+                routed.append(scanner.discover)
+        finally:
+            listener.cancel()
+            await stream.aclose()
+        return routed, scanner.rescans
+
+    routed, rescans = asyncio.run(run())
+    assert routed == [True] * len(DEX_ACCOUNTS) + [False]
+    assert rescans == {MASTER}
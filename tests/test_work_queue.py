@@ -0,0 +1,138 @@
+from types import SimpleNamespace
+
+import pytest
+
+import work_queue
+from work_queue import JobStatus, WorkQueue
+
+POOLS = [
+    ("2024-05-01T10:00:00Z", "EQpool1", "EQtoken1"),
+    ("2024-05-01T10:01:00Z", "EQpool2", "EQtoken2"),
+]
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = SimpleNamespace(now=1000.0)
+    monkeypatch.setattr(
+        work_queue, "time", SimpleNamespace(time=lambda: clock.now)
+    )
+    return clock
+
+
+@pytest.fixture
+def queue(tmp_path, clock):
+    return WorkQueue(
+        str(tmp_path / "work_queue.db"), lease_seconds=60, max_attempts=2
+    )
+
+
+def test_claims_in_order(queue):
+    assert queue.enqueue(POOLS) == 2
+    first = queue.claim("a")
+    second = queue.claim("b")
+    assert (first.pool_address, first.attempts) == ("EQpool1", 1)
+    assert second.pool_address == "EQpool2"
+    assert queue.claim("c") is None
+    assert queue.counts() == {JobStatus.Leased: 2}
+
+
+def test_open_jobs_are_not_queued_twice(queue):
+    queue.enqueue(POOLS)
+    assert queue.enqueue(POOLS) == 0
+
+    job = queue.claim("a")
+    assert queue.complete(job.id, "a", "{}")
+    # A result waiting for the coordinator still blocks the token.
+    assert queue.enqueue(POOLS[:1]) == 0
+    assert queue.apply(job.id)
+    assert queue.enqueue(POOLS[:1]) == 1
+
+
+def test_only_the_owner_renews(queue, clock):
+    queue.enqueue(POOLS[:1])
+    job = queue.claim("a")
+    clock.now += 50
+    assert not queue.renew(job.id, "b")
+    assert queue.renew(job.id, "a")
+    clock.now += 50
+    # Renewed at 1050, the lease runs until 1110.
+    assert queue.claim("b") is None
+
+
+def test_expired_lease_moves_to_another_worker(queue, clock):
+    queue.enqueue(POOLS[:1])
+    job = queue.claim("a")
+    clock.now += 61
+    retry = queue.claim("b")
+    assert retry.id == job.id
+    assert retry.attempts == 2
+
+    assert not queue.renew(job.id, "a")
+    assert not queue.complete(job.id, "a", "stale")
+    assert queue.complete(job.id, "b", "fresh")
+    assert queue.finished() == [(retry, "fresh")]
+
+
+def test_job_fails_after_max_attempts(queue, clock):
+    queue.enqueue(POOLS[:1])
+    queue.claim("a")
+    clock.now += 61
+    queue.claim("b")
+    clock.now += 61
+    assert queue.claim("c") is None
+    assert queue.counts() == {JobStatus.Failed: 1}
+
+
+def test_release_returns_the_job(queue):
+    queue.enqueue(POOLS[:1])
+    job = queue.claim("a")
+    assert not queue.release(job.id, "b")
+    assert queue.release(job.id, "a")
+    assert not queue.complete(job.id, "a", "{}")
+
+    again = queue.claim("b")
+    assert again.id == job.id
+    assert again.attempts == 2
+
+
+def test_apply_queues_the_message_once(queue):
+    queue.enqueue(POOLS)
+    good, bad = queue.claim("a"), queue.claim("a")
+    queue.complete(good.id, "a", "{}")
+    queue.complete(bad.id, "a", "{}")
+
+    assert queue.apply(good.id, "good token")
+    assert queue.apply(bad.id)
+    assert not queue.apply(good.id, "good token")
+    assert queue.finished() == []
+
+    [(message_id, message)] = queue.pending_messages()
+    assert message == "good token"
+    queue.mark_sent(message_id)
+    assert queue.pending_messages() == []
+
+
+def test_purge_keeps_open_jobs(queue, clock):
+    queue.enqueue(POOLS)
+    job = queue.claim("a")
+    queue.complete(job.id, "a", "{}")
+    queue.apply(job.id)
+    clock.now += 86401
+    assert queue.purge() == 1
+    assert queue.counts() == {JobStatus.Pending: 1}
+
+
+def test_failed_jobs_are_handed_back(queue, clock):
+    queue.enqueue(POOLS)
+    for owner in ("a", "b"):
+        queue.claim(owner)
+        clock.now += 61
+    queue.claim("c")
+
+    [failed] = queue.failed()
+    assert (failed.pool_address, failed.attempts) == ("EQpool1", 2)
+    assert queue.remove([failed.id]) == 1
+    assert queue.failed() == []
+    # The token can be queued again once its failed job is removed.
+    assert queue.enqueue(POOLS[:1]) == 1